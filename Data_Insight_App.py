@@ -1,5 +1,7 @@
 import streamlit as st
-import os
+from llmclient import prediction_stats, get_response_cache, flight_stats, get_scheduler, webhook_stats
+import pandas as pd
+import metrics
 
 # App title
 st.set_page_config(page_title="Hackathon - The Future of AI is Open",
@@ -10,7 +12,6 @@ st.set_page_config(page_title="Hackathon - The Future of AI is Open",
 
 if 'REPLICATE_API_TOKEN' in st.session_state:  
     api_token = st.session_state['REPLICATE_API_TOKEN']
-    os.environ["REPLICATE_API_TOKEN"] = st.session_state['REPLICATE_API_TOKEN']
 
 else:  
     api_token = "Enter the token"
@@ -55,9 +56,43 @@ with st.sidebar:
     if token:
         api_token = token
         st.session_state['REPLICATE_API_TOKEN'] = token
-        os.environ["REPLICATE_API_TOKEN"] = token
 
     try:
         st.image('images/logo.jpg', use_column_width="always", caption="Hackathon - The Future of AI is Open")
     except:
-        st.error('Image logo.jpg not found', icon="🚨")
\ No newline at end of file
+        st.error('Image logo.jpg not found', icon="🚨")
+
+    # Predictions of every session since the server started
+    with st.expander("LLM predictions"):
+        stats = prediction_stats()
+        st.metric("Finished predictions", stats["predictions"])
+        st.metric("Latency saved by adaptive polling", f"{stats['latency_saved']:.1f}s")
+        st.metric("Orphaned predictions avoided", stats["orphans_avoided"])
+        st.caption(f"Canceled at the deadline: {stats['canceled_deadline']}, "
+                   f"once abandoned: {stats['canceled_abandoned']}, polls: {stats['polls']}")
+        cache_stats = get_response_cache().stats()
+        st.metric("Response cache hits", cache_stats["hits"], help=f"Misses: {cache_stats['misses']}")
+        st.caption(f"Cached responses: {cache_stats['entries']}, {cache_stats['bytes'] / 2**20:.1f} MB")
+        flights = flight_stats()
+        st.metric("Requests joining a running prediction", flights["coalesced"],
+                  help=f"Predictions started: {flights['flights']}, running: {flights['running']}")
+        scheduler_stats = get_scheduler().stats()
+        st.metric("Predictions queued", scheduler_stats["queued"],
+                  help=f"Running: {scheduler_stats['running']}, mean wait: {scheduler_stats['mean_wait']:.1f}s")
+        webhooks = webhook_stats()
+        st.caption(f"Waiting for their webhook: {webhooks['pending']}, received: {webhooks['received']}, "
+                   f"missed: {webhooks['missed']}")
+
+    # Metrics of this server process, also exported to Prometheus
+    if metrics.ENABLED:
+        with st.expander("Metrics"):
+            counters, histograms = metrics.snapshot()
+            st.dataframe(pd.DataFrame([
+                {"metric": name, **dict(labels), "count": sum(counts), "mean": total / max(sum(counts), 1),
+                 "p50": metrics.quantile(counts, 0.5), "p95": metrics.quantile(counts, 0.95)}
+                for (name, labels), (counts, total) in sorted(histograms.items())
+            ]), hide_index=True)
+            st.dataframe(pd.DataFrame([
+                {"metric": name, **dict(labels), "value": value}
+                for (name, labels), value in sorted(counters.items())
+            ]), hide_index=True)
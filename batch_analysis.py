@@ -0,0 +1,334 @@
+"""Headless analysis of a directory of data files.
+
+Every CSV, Parquet, JSON and JSON Lines file under a directory gets the
+same three section analysis as the "Analysing data files with LLM" page,
+written as a Markdown, PDF and JSON report per file. Files are parsed,
+profiled and scanned in a pool of processes while the LLM requests of the
+parsed ones are sent through a bounded pool of threads, at batch priority
+so the interactive sessions of the app go first.
+
+The run can be interrupted and started again: a file whose JSON report
+matches its content is skipped, sections already generated come from the
+analysis and response caches shared with the app, and a file whose every
+section is cached is not parsed again.
+
+Run from the repository root:
+
+    python batch_analysis.py data/ --output reports --workers 4 --concurrency 4
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from dataprep import SECTIONS, AnalysisCache, analysis_key, file_format, generate_pdf, load_sections, report_markdown
+from llmclient import BATCH, DEADLINE, generate_llm_data
+from llmclient.scheduler import MAX_CONCURRENT
+
+REPORTS = ("md", "pdf")
+# Session of the batch requests in the scheduler, fair with the app sessions
+BATCH_SESSION = "batch"
+
+
+def find_files(directory, output=None):
+    """
+    Data files under a directory, in a stable order. The reports are left
+    out, so an output directory inside the directory isn't analysed.
+        :param directory: Directory to walk
+        :type directory: str
+        :param output: Directory of the reports, skipped when under ``directory``
+        :type output: str
+        :return: Paths and formats of the supported files
+        :rtype: list
+    """
+    output = os.path.realpath(output) if output is not None else None
+    files = []
+    for root, dirs, names in os.walk(directory):
+        dirs[:] = sorted(name for name in dirs if os.path.realpath(os.path.join(root, name)) != output)
+        for name in sorted(names):
+            option_format = file_format(name)
+            # e.g. "sales.csv.json", the JSON report of "sales.csv"
+            is_report = name.endswith(".json") and file_format(name[:-len(".json")]) is not None
+            if option_format is not None and not is_report:
+                files.append((os.path.join(root, name), option_format))
+    return files
+
+
+def report_path(output, directory, path):
+    """
+    Path of the reports of a file without their extension, mirroring its place in the directory
+        :rtype: str
+    """
+    return os.path.join(output, os.path.relpath(path, directory))
+
+
+def write_atomic(path, data):
+    """
+    Write a file through a temporary one, an interrupted run never leaves a partial report
+        :param data: Content of the file
+        :type data: bytes
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def prepare_file(path, option_format, header, compact, base_path):
+    """
+    Load a file and build the input of its sections, in a worker process
+        :param path: Path of the data file
+        :type path: str
+        :param option_format: Format of the file
+        :type option_format: str
+        :param header: Whether a CSV file has a header
+        :type header: bool
+        :param compact: Compact the data types before profiling
+        :type compact: bool
+        :param base_path: Path of its reports without extension
+        :type base_path: str
+        :return: Job of the file, "skipped" when its report is up to date and
+            "analysis" with every section when they are all cached
+        :rtype: dict
+    """
+    start = time.perf_counter()
+    with open(path, "rb") as f:
+        bytes_data = f.read()
+    key = analysis_key(bytes_data, option_format, header, compact)
+    job = {"path": path, "format": option_format, "key": key, "bytes": len(bytes_data),
+           "base_path": base_path, "skipped": False, "rows": None}
+
+    try:
+        with open(base_path + ".json", "r", encoding="utf-8") as f:
+            job["skipped"] = json.load(f).get("key") == key
+    except (OSError, ValueError):
+        pass
+    if job["skipped"]:
+        return job
+
+    job["analysis"] = AnalysisCache().get(key) or {}
+    if not all(section in job["analysis"] for section in SECTIONS):
+        job["inputs"], job["prompt_tokens"], job["rows"] = load_sections(bytes_data, option_format, header, compact)
+    job["parse_seconds"] = time.perf_counter() - start
+    return job
+
+
+def write_reports(job, reports):
+    """
+    Write the reports of an analysed file, in a worker process
+        :param job: Job of the file with the text of every section
+        :type job: dict
+        :param reports: Reports to write besides the JSON one, among "md" and "pdf"
+        :type reports: list
+        :return: Seconds spent
+        :rtype: float
+    """
+    start = time.perf_counter()
+    os.makedirs(os.path.dirname(job["base_path"]) or ".", exist_ok=True)
+    text_md = report_markdown(job["format"], job["analysis"])
+    if "md" in reports:
+        write_atomic(job["base_path"] + ".md", text_md.encode("utf-8"))
+    if "pdf" in reports:
+        write_atomic(job["base_path"] + ".pdf", generate_pdf(os.path.basename(job["path"]), text_md))
+    # Written last, its key marks the file as done for the next runs
+    report = {key: job.get(key) for key in ("path", "format", "key", "bytes", "rows", "prompt_tokens")}
+    report["sections"] = {section: job["analysis"][section] for section in SECTIONS}
+    write_atomic(job["base_path"] + ".json", json.dumps(report, indent=2).encode("utf-8"))
+    return time.perf_counter() - start
+
+
+def generate_section(input, api_token, deadline, stop):
+    """
+    Text of a section, at batch priority
+        :return: Status, text (None unless "succeeded") and seconds waited
+        :rtype: tuple
+    """
+    start = time.perf_counter()
+    status, data = generate_llm_data(input, api_token, deadline, stop.is_set, BATCH, BATCH_SESSION)
+    text = "".join(data) if status == "succeeded" else None
+    return status, text, time.perf_counter() - start
+
+
+class BatchStats:
+    """
+    Counters of a batch run, printed at its end
+    """
+    def __init__(self, total):
+        self.start = time.perf_counter()
+        self.total = total
+        self.done = 0
+        self.skipped = 0
+        self.cached = 0
+        self.failed = 0
+        self.bytes = 0
+        self.rows = 0
+        self.parse_seconds = 0.0
+        self.report_seconds = 0.0
+        self.llm_requests = 0
+        self.llm_seconds = 0.0
+        self.interrupted = False
+
+    def summary(self):
+        """
+        Throughput of the run
+            :rtype: str
+        """
+        elapsed = time.perf_counter() - self.start
+        analysed = self.done - self.skipped
+        lines = [
+            f"Files: {self.done}/{self.total} ({self.skipped} up to date, {self.cached} from the cache, "
+            f"{self.failed} failed) in {elapsed:.1f}s",
+            f"Throughput: {analysed / elapsed if elapsed else 0:.2f} files/s, "
+            f"{self.bytes / 2**20 / elapsed if elapsed else 0:.2f} MB/s, {self.rows} rows",
+            f"Parsing: {self.parse_seconds:.1f}s, reports: {self.report_seconds:.1f}s of worker time",
+            f"LLM requests: {self.llm_requests}, "
+            f"mean {self.llm_seconds / self.llm_requests if self.llm_requests else 0:.1f}s each",
+        ]
+        return "\n".join(lines)
+
+
+def run(files, directory, output, reports, workers, concurrency, header=True, compact=True,
+        api_token=None, deadline=DEADLINE, stop=None):
+    """
+    Analyse files and write their reports
+        :param files: Paths and formats, see ``find_files``
+        :type files: list
+        :param directory: Directory of the files
+        :type directory: str
+        :param output: Directory of the reports
+        :type output: str
+        :param reports: Reports to write besides the JSON one, among "md" and "pdf"
+        :type reports: list
+        :param workers: Processes parsing the files and rendering the reports
+        :type workers: int
+        :param concurrency: LLM requests sent at the same time
+        :type concurrency: int
+        :param header: Whether the CSV files have a header
+        :type header: bool
+        :param compact: Compact the data types before profiling
+        :type compact: bool
+        :param api_token: Replicate API token, None for the REPLICATE_API_TOKEN variable
+        :type api_token: str
+        :param deadline: Seconds after which a prediction is canceled
+        :type deadline: float
+        :param stop: Set to cancel the run
+        :type stop: threading.Event
+        :rtype: BatchStats
+    """
+    stop = stop or threading.Event()
+    stats = BatchStats(len(files))
+    # Spawned rather than forked, the parent runs the LLM threads
+    processes = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+    threads = ThreadPoolExecutor(concurrency, thread_name_prefix="batch-llm")
+    pending = {}
+
+    def finish(job, failed=False):
+        stats.done += 1
+        stats.failed += failed
+        status = "failed" if failed else "skipped" if job.get("skipped") else "done"
+        print(f"[{stats.done}/{stats.total}] {status:7s} {job['path']}", flush=True)
+
+    def complete(job):
+        analysis = job["analysis"]
+        analysis.update((section, input) for section, input in job.get("inputs", {}).items()
+                        if isinstance(input, str))
+        if all(section in analysis for section in SECTIONS):
+            AnalysisCache().set(job["key"], analysis)
+            pending[processes.submit(write_reports, job, reports)] = ("reports", job, None)
+        else:
+            finish(job, failed=True)
+
+    try:
+        for path, option_format in files:
+            base_path = report_path(output, directory, path)
+            future = processes.submit(prepare_file, path, option_format,
+                                      header or option_format != "CSV", compact, base_path)
+            pending[future] = ("prepare", {"path": path}, None)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                kind, job, section = pending.pop(future)
+                if kind == "prepare":
+                    try:
+                        job = future.result()
+                    except Exception as e:
+                        print(f"Cannot analyse {job['path']}: {e}", file=sys.stderr)
+                        finish(job, failed=True)
+                        continue
+                    stats.bytes += job["bytes"]
+                    if job["skipped"]:
+                        stats.skipped += 1
+                        finish(job)
+                        continue
+                    stats.rows += job["rows"] or 0
+                    stats.parse_seconds += job["parse_seconds"]
+                    job["waiting"] = {section for section, input in job.get("inputs", {}).items()
+                                      if not isinstance(input, str) and section not in job["analysis"]}
+                    if not job["waiting"]:
+                        stats.cached += 1
+                        complete(job)
+                    for section in job["waiting"]:
+                        stats.llm_requests += 1
+                        section_future = threads.submit(generate_section, job["inputs"][section],
+                                                        api_token, deadline, stop)
+                        pending[section_future] = ("section", job, section)
+                elif kind == "section":
+                    status, text, seconds = future.result()
+                    stats.llm_seconds += seconds
+                    job["waiting"].discard(section)
+                    if text is not None:
+                        job["analysis"][section] = text
+                    if not job["waiting"]:
+                        complete(job)
+                else:
+                    try:
+                        stats.report_seconds += future.result()
+                    except Exception as e:
+                        print(f"Cannot write the reports of {job['path']}: {e}", file=sys.stderr)
+                        finish(job, failed=True)
+                        continue
+                    finish(job)
+    except KeyboardInterrupt:
+        stats.interrupted = True
+    finally:
+        # Interrupted: the running predictions are canceled, the finished
+        # sections stay in the caches for the next run
+        stop.set()
+        threads.shutdown(cancel_futures=True)
+        processes.shutdown(cancel_futures=True)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("directory", help="Directory of the data files")
+    parser.add_argument("--output", default="reports", help="Directory of the reports")
+    parser.add_argument("--reports", nargs="*", choices=REPORTS, default=list(REPORTS),
+                        help="Reports written besides the JSON one")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="Processes parsing the files and rendering the reports")
+    parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENT,
+                        help="LLM requests sent at the same time")
+    parser.add_argument("--no-header", action="store_true", help="The CSV files have no header")
+    parser.add_argument("--no-compact", action="store_true", help="Keep the data types as parsed")
+    parser.add_argument("--deadline", type=float, default=DEADLINE,
+                        help="Seconds after which a prediction is canceled")
+    args = parser.parse_args()
+
+    files = find_files(args.directory, args.output)
+    stats = run(files, args.directory, args.output, args.reports, args.workers, args.concurrency,
+                header=not args.no_header, compact=not args.no_compact, deadline=args.deadline)
+    print(stats.summary())
+    if stats.interrupted:
+        print("Interrupted, run the same command again to resume.", file=sys.stderr)
+        sys.exit(130)
+    sys.exit(1 if stats.failed else 0)
+
+
+if __name__ == "__main__":
+    main()
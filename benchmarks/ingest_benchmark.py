@@ -0,0 +1,102 @@
+"""Parity and throughput of the ``dataprep.ingest`` engines.
+
+The parity on the sample files is also asserted by ``tests/test_ingest.py``.
+
+Run from the repository root:
+
+    python benchmarks/ingest_benchmark.py --sizes 1 10 50
+"""
+import argparse
+import os
+import sys
+import time
+from io import StringIO
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dataprep import ENGINES, read_data, read_data_file
+
+SAMPLES = {
+    "CSV": "data/country_codes.csv",
+    "Apache Parquet": "data/house_price.parquet",
+    "JSON": "data/sample_data.json",
+}
+
+
+def legacy_read(bytes_data, option_format, header=True):
+    """Parsing path used by the page before the ingestion layer"""
+    if option_format == "CSV":
+        data = StringIO(str(bytes_data, 'utf-8'))
+        return pd.read_csv(data) if header else pd.read_csv(data, header=None)
+    return pd.read_json(StringIO(str(bytes_data, 'utf-8')))
+
+
+def same_values(left, right):
+    try:
+        pd.testing.assert_frame_equal(
+            left.convert_dtypes(dtype_backend="numpy_nullable"),
+            right.convert_dtypes(dtype_backend="numpy_nullable"),
+            check_dtype=False, check_column_type=False,
+        )
+    except AssertionError:
+        return False
+    return True
+
+
+def make_frame(megabytes):
+    rows = megabytes * 2**20 // 30
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "id": np.arange(rows),
+        "price": rng.normal(500000, 120000, rows).round(2),
+        "rooms": rng.integers(1, 8, rows),
+        "city": rng.choice(["Madrid", "Lisbon", "Paris", "Berlin"], rows),
+        "country": rng.choice(["ES", "PT", "FR", "DE"], rows),
+    })
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 50],
+                        help="generated file sizes in MB")
+    args = parser.parse_args()
+
+    print("Parity with the legacy pandas path")
+    for option_format, path in SAMPLES.items():
+        for engine in ENGINES:
+            df = read_data_file(path, option_format, engine=engine)
+            if option_format == "Apache Parquet":
+                expected = pd.read_parquet(path)
+            else:
+                with open(path, "rb") as f:
+                    expected = legacy_read(f.read(), option_format)
+            print(f"  sample {option_format:<15} {engine:<8} {same_values(df, expected)}")
+
+    print("\nThroughput (MB/s)")
+    for megabytes in args.sizes:
+        df = make_frame(megabytes)
+        payloads = {
+            "CSV": df.to_csv(index=False).encode("utf-8"),
+            "JSON": df.to_json().encode("utf-8"),
+        }
+        for option_format, bytes_data in payloads.items():
+            size = len(bytes_data) / 2**20
+            expected, legacy_time = timed(lambda: legacy_read(bytes_data, option_format))
+            line = f"  {option_format:<5} {size:>6.1f}MB legacy {size / legacy_time:>7.1f}"
+            for engine in ENGINES:
+                parsed, elapsed = timed(lambda: read_data(bytes_data, option_format, engine=engine))
+                line += f" | {engine} {size / elapsed:>7.1f} parity {same_values(parsed, expected)}"
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Peak memory of chunked JSON Lines reading against ``pd.read_json``.
+
+Run from the repository root:
+
+    python benchmarks/jsonl_benchmark.py --rows 1000000 --chunk-mb 1 4 16
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from io import BytesIO, StringIO
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dataprep import read_json_lines
+
+
+def make_payload(rows):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "timestamp": pd.date_range("2019-01-01", periods=rows, freq="s").astype(str),
+        "user_id": rng.integers(0, 5000, rows),
+        "event": rng.choice(["click", "view", "purchase", "logout"], rows),
+        "duration_ms": rng.exponential(300, rows).round(1),
+    })
+    return df.to_json(orient="records", lines=True).encode("utf-8")
+
+
+def measure(func):
+    """Elapsed time and peak of Python plus Arrow allocations"""
+    pool = pa.default_memory_pool()
+    arrow_start = pool.bytes_allocated()
+    pool.release_unused()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    _, python_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    arrow_peak = max(0, pool.max_memory() - arrow_start)
+    return result, elapsed, python_peak / 2**20, arrow_peak / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--chunk-mb", type=float, nargs="+", default=[1, 4, 16])
+    args = parser.parse_args()
+
+    payload = make_payload(args.rows)
+    print(f"payload {len(payload) / 2**20:.1f}MB, {args.rows} lines")
+
+    for chunk_mb in args.chunk_mb:
+        (df, _), elapsed, python_peak, arrow_peak = measure(
+            lambda: read_json_lines(BytesIO(payload), chunk_bytes=int(chunk_mb * 2**20)))
+        print(f"chunked {chunk_mb:>5}MB chunks {elapsed:>6.2f}s | python peak {python_peak:>7.1f}MB "
+              f"| arrow peak {arrow_peak:>7.1f}MB | result {df.memory_usage(deep=True).sum() / 2**20:>6.1f}MB")
+
+    df, elapsed, python_peak, _ = measure(
+        lambda: pd.read_json(StringIO(str(payload, "utf-8")), lines=True))
+    print(f"pd.read_json          {elapsed:>6.2f}s | python peak {python_peak:>7.1f}MB "
+          f"|                     | result {df.memory_usage(deep=True).sum() / 2**20:>6.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""End to end latency of every page against the offline Replicate backend.
+
+Each page is driven through Streamlit's ``AppTest``: it is loaded, the
+request is made (sample file or Generate button), and the run answering
+it is timed. The response cache and the analysis cache are emptied before
+every repetition, so every run reaches the backend. p50/p95 latencies and
+backend calls per run are printed and appended to ``--results`` with the
+commit and configuration, next to the previous run of the same
+configuration for comparison. The default file, under benchmarks/results,
+is kept out of git.
+
+Run from the repository root:
+
+    python benchmarks/pages_benchmark.py --repeat 10 --latency lognormal:0,0.3
+"""
+import argparse
+import datetime
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def use_sample_file(at):
+    at.toggle[0].set_value(True)
+
+
+def click_generate(at):
+    at.button[0].click()
+
+
+def click_analyse_all(at):
+    at.button(key="analyse_all").click()
+
+
+PAGES = {
+    "analysing_data_files": ("pages/01_Analysing_data_files_with_LLM.py", use_sample_file),
+    "dissecting_the_code": ("pages/02_Dissecting_the_code.py", click_analyse_all),
+    "sql_or_nosql": ("pages/03_SQL_or_NoSQL.py", click_generate),
+    "unstructured_text_to_json": ("pages/04_Unstructured_text_to_JSON.py", click_generate),
+}
+
+
+def git_commit():
+    """Commit of the working tree, None outside of a git checkout"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def previous_run(path, config):
+    """Last stored run of the same configuration"""
+    if not os.path.exists(path):
+        return None
+    previous = None
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            run = json.loads(line)
+            if run["config"] == config:
+                previous = run
+    return previous
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--latency", default="lognormal:0,0.3")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--timeout-rate", type=float, default=0.0)
+    parser.add_argument("--pages", nargs="+", choices=list(PAGES), default=list(PAGES))
+    parser.add_argument("--results", default=os.path.join(ROOT, "benchmarks", "results", "pages_benchmark.jsonl"))
+    args = parser.parse_args()
+
+    # Read by llmclient and dataprep when they are imported
+    directory = tempfile.mkdtemp()
+    os.environ.update({
+        "DATA_INSIGHT_LLM_BACKEND": "fake",
+        "DATA_INSIGHT_FAKE_LATENCY": args.latency,
+        "DATA_INSIGHT_FAKE_FAILURE_RATE": str(args.failure_rate),
+        "DATA_INSIGHT_FAKE_TIMEOUT_RATE": str(args.timeout_rate),
+        "DATA_INSIGHT_LLM_CACHE": os.path.join(directory, "llm_responses.sqlite3"),
+        "DATA_INSIGHT_LLM_LOCKS": os.path.join(directory, "locks"),
+        "DATA_INSIGHT_CACHE_DIR": os.path.join(directory, "analysis"),
+    })
+    os.chdir(ROOT)
+
+    from streamlit.testing.v1 import AppTest
+    from dataprep import get_tokenizer
+    from llmclient import get_fake_backend, get_response_cache
+
+    # Loaded once per process, keep it out of the measured runs
+    get_tokenizer()
+    backend = get_fake_backend()
+    config = {"latency": args.latency, "failure_rate": args.failure_rate,
+              "timeout_rate": args.timeout_rate, "repeat": args.repeat}
+
+    results = {}
+    for name in args.pages:
+        path, make_request = PAGES[name]
+        latencies, calls, failures = [], [], 0
+        for _ in range(args.repeat):
+            get_response_cache().clear()
+            shutil.rmtree(os.environ["DATA_INSIGHT_CACHE_DIR"], ignore_errors=True)
+            os.makedirs(os.environ["DATA_INSIGHT_CACHE_DIR"])
+            backend.reset()
+
+            at = AppTest.from_file(path, default_timeout=300)
+            at.run()
+            make_request(at)
+            start = time.perf_counter()
+            at.run()
+            latencies.append(time.perf_counter() - start)
+            calls.append(backend.calls["create"])
+            failures += bool(at.exception) or any("failed" in error.value for error in at.error)
+
+        results[name] = {
+            "p50": float(np.percentile(latencies, 50)),
+            "p95": float(np.percentile(latencies, 95)),
+            "backend_calls": float(np.mean(calls)),
+            "failures": failures,
+        }
+
+    run = {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "config": config,
+        "pages": results,
+    }
+    previous = previous_run(args.results, config)
+
+    for name, result in results.items():
+        line = (f"{name:28s} p50 {result['p50']:6.2f}s  p95 {result['p95']:6.2f}s  "
+                f"backend calls {result['backend_calls']:4.1f}  failures {result['failures']}")
+        if previous and name in previous["pages"]:
+            before = previous["pages"][name]
+            line += f"  (was p50 {before['p50']:.2f}s p95 {before['p95']:.2f}s at {previous['commit']})"
+        print(line)
+
+    os.makedirs(os.path.dirname(args.results), exist_ok=True)
+    with open(args.results, "a", encoding="utf-8") as f:
+        f.write(json.dumps(run) + "\n")
+
+
+if __name__ == "__main__":
+    main()
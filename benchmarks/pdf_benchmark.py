@@ -0,0 +1,49 @@
+"""Render time and peak memory of ``dataprep.report.generate_pdf``.
+
+Run from the repository root:
+
+    python benchmarks/pdf_benchmark.py --sections 10 100 500
+"""
+import argparse
+import os
+import resource
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dataprep import generate_pdf
+
+PARAGRAPH = (
+    "The **price** column is skewed to the right and a few outliers could "
+    "distort the mean. Consider a log scale before plotting it against `area`.\n\n"
+    "* Missing values: none\n* Potential uses: pricing models, market analysis\n\n"
+)
+
+
+def make_report(sections):
+    return "".join(f"## Section {i}\n{PARAGRAPH * 3}" for i in range(sections))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sections", type=int, nargs="+", default=[10, 100, 500])
+    args = parser.parse_args()
+
+    for sections in args.sections:
+        text_md = make_report(sections)
+        tracemalloc.start()
+        start = time.perf_counter()
+        pdf = generate_pdf("benchmark.csv", text_md)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        # ru_maxrss also counts the MuPDF allocations, in KB on Linux
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(f"{len(text_md) / 1024:>8.1f}KB markdown -> {len(pdf) / 1024:>8.1f}KB PDF "
+              f"in {elapsed:>6.2f}s | python peak {peak / 2**20:>6.1f}MB | process max RSS {max_rss:>6.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Compare the full ``to_string`` prompt preview with ``dataprep.preview``.
+
+Run from the repository root:
+
+    python benchmarks/preview_benchmark.py --rows 500000
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dataprep import PREVIEW_CHARS, text_preview, frame_preview
+
+
+def make_frame(rows):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "id": np.arange(rows),
+        "price": rng.normal(500000, 120000, rows).round(2),
+        "rooms": rng.integers(1, 8, rows),
+        "city": rng.choice(["Madrid", "Lisbon", "Paris", "Berlin"], rows),
+        "date": pd.date_range("2019-01-01", periods=rows, freq="min").astype(str),
+    })
+
+
+def measure(func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def report(label, size, old, new):
+    (old_text, old_time, old_peak), (new_text, new_time, new_peak) = old, new
+    print(f"{label:<8} {size / 2**20:>8.1f}MB "
+          f"old {old_time:>8.3f}s {old_peak / 2**20:>8.1f}MB | "
+          f"new {new_time:>8.4f}s {new_peak / 2**20:>6.2f}MB | "
+          f"same text: {old_text == new_text}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=500000)
+    args = parser.parse_args()
+
+    df = make_frame(args.rows)
+
+    csv_bytes = df.to_csv(index=False).encode("utf-8")
+    report("CSV", len(csv_bytes),
+           measure(lambda: str(csv_bytes, "utf-8")[0:PREVIEW_CHARS]),
+           measure(lambda: text_preview(csv_bytes)))
+
+    json_bytes = df.to_json(orient="records").encode("utf-8")
+    report("JSON", len(json_bytes),
+           measure(lambda: str(json_bytes, "utf-8")[0:PREVIEW_CHARS]),
+           measure(lambda: text_preview(json_bytes)))
+
+    buffer = BytesIO()
+    df.to_parquet(buffer)
+    parquet_df = pd.read_parquet(BytesIO(buffer.getvalue()))
+    report("Parquet", buffer.tell(),
+           measure(lambda: parquet_df.to_string(index=False)[0:PREVIEW_CHARS]),
+           measure(lambda: frame_preview(parquet_df)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Scaling of ``dataprep.profile`` on multi-million-row frames.
+
+Run from the repository root:
+
+    python benchmarks/profile_benchmark.py --rows 1000000 2000000 4000000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dataprep import profile_frame, format_profile
+
+
+def make_frame(rows):
+    rng = np.random.default_rng(0)
+    price = rng.normal(500000, 120000, rows)
+    price[rng.random(rows) < 0.01] = np.nan
+    return pd.DataFrame({
+        "id": np.arange(rows),
+        "price": price,
+        "rooms": rng.integers(1, 8, rows),
+        "city": rng.choice(["Madrid", "Lisbon", "Paris", "Berlin"], rows),
+        "customer": rng.integers(0, rows // 10, rows).astype(str),
+        "date": pd.Timestamp("2019-01-01") + pd.to_timedelta(rng.integers(0, 10**8, rows), unit="s"),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000000, 2000000, 4000000])
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        df = make_frame(rows)
+        start = time.perf_counter()
+        profile = profile_frame(df)
+        elapsed = time.perf_counter() - start
+        exact = df["customer"].nunique()
+        approx = next(c["distinct"] for c in profile if c["column"] == "customer")
+        text = format_profile(profile, len(df))
+        print(f"{rows:>9} rows {elapsed:>7.2f}s {elapsed / rows * 1e9:>7.1f}ns/row | "
+              f"customer distinct exact {exact} ~{approx} | profile {len(text)} chars")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Tokenizer load time and prompt packing cost of ``dataprep.prompt``.
+
+Run from the repository root:
+
+    python benchmarks/prompt_benchmark.py --repeat 100
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dataprep import (
+    PREVIEW_CHARS, SECTION_BUDGETS, build_prompt, complete_lines, format_profile,
+    frame_preview, get_tokenizer, profile_frame, read_data_file,
+)
+
+SAMPLES = {
+    "CSV": "data/country_codes.csv",
+    "Apache Parquet": "data/house_price.parquet",
+    "JSON": "data/sample_data.json",
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=100)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    tokenizer = get_tokenizer()
+    print(f"tokenizer load {time.perf_counter() - start:.2f}s "
+          f"({'Arctic tokenizer' if tokenizer is not None else 'character estimate'})")
+
+    for option_format, path in SAMPLES.items():
+        df = read_data_file(path, option_format)
+        profile_lines = format_profile(profile_frame(df), len(df)).splitlines()
+        preview_lines = complete_lines(frame_preview(df), PREVIEW_CHARS)
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            _, analysis_tokens = build_prompt("Explain this file:\n", profile_lines, SECTION_BUDGETS["analysis"])
+            _, preview_tokens = build_prompt("Discuss:\n", preview_lines, SECTION_BUDGETS["visualization"])
+        elapsed = (time.perf_counter() - start) / args.repeat
+        print(f"{option_format:<15} packing {elapsed * 1000:>6.2f}ms per page | "
+              f"analysis {analysis_tokens} tokens, visualization {preview_tokens} tokens")
+
+
+if __name__ == "__main__":
+    main()
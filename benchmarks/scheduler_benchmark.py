@@ -0,0 +1,69 @@
+"""Order and waits of a burst of predictions through ``llmclient.Scheduler``.
+
+One session queues a batch job of many predictions, then other sessions
+send one interactive request each. The interactive requests should be
+served first, one per session, and never more than ``--concurrency``
+predictions should run at once.
+
+Run from the repository root:
+
+    python benchmarks/scheduler_benchmark.py --batch 20 --sessions 5
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llmclient import BATCH, INTERACTIVE, Scheduler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch", type=int, default=20)
+    parser.add_argument("--sessions", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=2)
+    parser.add_argument("--rate", type=float, default=50.0)
+    parser.add_argument("--latency", type=float, default=0.1)
+    args = parser.parse_args()
+
+    scheduler = Scheduler(max_concurrent=args.concurrency, rate=args.rate, burst=args.concurrency)
+    order = []
+    running = [0, 0]
+    lock = threading.Lock()
+
+    def predict(name, session, priority):
+        with scheduler.slot("token", session, priority) as granted:
+            assert granted
+            with lock:
+                order.append(name)
+                running[0] += 1
+                running[1] = max(running)
+            time.sleep(args.latency)
+            with lock:
+                running[0] -= 1
+
+    threads = [threading.Thread(target=predict, args=(f"batch-{i}", "batch", BATCH)) for i in range(args.batch)]
+    for thread in threads:
+        thread.start()
+    # The batch job fills the slots and the queue before the users arrive
+    time.sleep(args.latency / 2)
+    print(f"queue before the users: {scheduler.queue_status('token')}")
+    users = [threading.Thread(target=predict, args=(f"user-{i}", f"session-{i}", INTERACTIVE))
+             for i in range(args.sessions)]
+    for thread in users:
+        thread.start()
+    for thread in threads + users:
+        thread.join()
+
+    positions = [order.index(f"user-{i}") for i in range(args.sessions)]
+    print(f"interactive requests served at positions {positions} of {len(order)}, "
+          f"max running {running[1]}, {scheduler.stats()}")
+    assert running[1] <= args.concurrency, "too many predictions at once"
+    assert max(positions) < args.concurrency * 2 + args.sessions, "interactive requests waited for the batch"
+
+
+if __name__ == "__main__":
+    main()
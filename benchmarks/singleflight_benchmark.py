@@ -0,0 +1,126 @@
+"""Backend calls of identical LLM requests sent at the same time.
+
+Every process starts ``--threads`` threads, all asking for the same input
+against a mocked Replicate backend, half of them streaming. With request
+coalescing the backend is called once, whatever the number of callers.
+With ``--webhook-port-taken`` the predictions are completed by webhook on a
+port already in use, so they fall back to polling and streaming.
+
+Run from the repository root:
+
+    python benchmarks/singleflight_benchmark.py --processes 3 --threads 10
+"""
+import argparse
+import multiprocessing
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+import replicate.model
+from replicate.stream import ServerSentEvent
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+INPUT = {"prompt": "Your task is to explain the provided SQL code snippet.", "temperature": 0.2}
+
+
+class FakePrediction:
+    """
+    Prediction that takes ``latency`` seconds, counting its creations across
+    processes. Like a streamed prediction, it has no metrics.
+    """
+    latency = 1.0
+    calls = None
+
+    def __init__(self, input):
+        self.status = "starting"
+        self.output = None
+        self.created = time.monotonic()
+        with FakePrediction.calls.get_lock():
+            FakePrediction.calls.value += 1
+
+    def reload(self):
+        if time.monotonic() - self.created >= self.latency:
+            self.status = "succeeded"
+            self.output = ["Generated ", "text"]
+
+    def cancel(self):
+        self.status = "canceled"
+
+    def stream(self):
+        for i, token in enumerate(["Generated ", "text"]):
+            time.sleep(self.latency / 2)
+            yield ServerSentEvent(event="output", data=token, id=str(i), retry=None)
+        yield ServerSentEvent(event="done", data="{}", id="done", retry=None)
+
+
+def run_callers(threads, results):
+    """Send the same request from every thread of a process"""
+    from llmclient import LLMStream, generate_llm_data
+
+    def call(i):
+        if i % 2:
+            llm_stream = LLMStream(INPUT, "token")
+            text = "".join(llm_stream)
+            results.put(llm_stream.status == "succeeded" and text == "Generated text")
+        else:
+            status, output = generate_llm_data(INPUT, "token")
+            results.put(status == "succeeded" and "".join(output) == "Generated text")
+
+    workers = [threading.Thread(target=call, args=(i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--processes", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=1.0)
+    parser.add_argument("--webhook-port-taken", action="store_true")
+    args = parser.parse_args()
+
+    # Fresh response cache and lock files, shared by the forked processes
+    directory = tempfile.mkdtemp()
+    os.environ["DATA_INSIGHT_LLM_CACHE"] = os.path.join(directory, "llm_responses.sqlite3")
+    os.environ["DATA_INSIGHT_LLM_LOCKS"] = os.path.join(directory, "locks")
+    if args.webhook_port_taken:
+        # Read by llmclient when the processes import it
+        taken = socket.socket()
+        taken.bind(("127.0.0.1", 0))
+        taken.listen()
+        os.environ["DATA_INSIGHT_LLM_COMPLETION"] = "webhook"
+        os.environ["DATA_INSIGHT_WEBHOOK_PORT"] = str(taken.getsockname()[1])
+        # Webhooks are only used with the Replicate API when it can reach and sign them
+        os.environ["DATA_INSIGHT_WEBHOOK_URL"] = "https://example.com/webhook"
+        os.environ["DATA_INSIGHT_WEBHOOK_SECRET"] = "whsec_c2VjcmV0"
+
+    context = multiprocessing.get_context("fork")
+    FakePrediction.latency = args.latency
+    FakePrediction.calls = context.Value("i", 0)
+    replicate.model.ModelsPredictions.create = lambda self, *a, input, **kw: FakePrediction(input)
+
+    results = context.Queue()
+    start = time.perf_counter()
+    processes = [context.Process(target=run_callers, args=(args.threads, results)) for _ in range(args.processes)]
+    for process in processes:
+        process.start()
+    succeeded = sum(results.get() for _ in range(args.processes * args.threads))
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - start
+
+    callers = args.processes * args.threads
+    print(f"callers {callers}, succeeded {succeeded}, backend calls {FakePrediction.calls.value}, "
+          f"{elapsed:.2f}s for a {args.latency:.2f}s prediction")
+    assert succeeded == callers, "some callers didn't get the response"
+    assert FakePrediction.calls.value == 1, "identical requests were not coalesced"
+
+
+if __name__ == "__main__":
+    main()
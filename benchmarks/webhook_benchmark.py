@@ -0,0 +1,72 @@
+"""Threads held by pending predictions, streamed versus completed by webhook.
+
+``--predictions`` different prompts are sent at once to the offline
+Replicate backend, first streamed, then completed by webhook through the
+local receiver. The driver threads of the flights are counted while the
+predictions run: one per prediction when streaming, none once they are
+created when completed by webhook.
+
+Run from the repository root:
+
+    python benchmarks/webhook_benchmark.py --predictions 50 --latency fixed:2
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def run(mode, predictions, prefix):
+    """Peak and mean driver threads, and wall time, of a burst of predictions"""
+    import llmclient.client
+    from llmclient import LLMStream
+
+    llmclient.client.COMPLETION = mode
+    streams = [LLMStream({"prompt": f"{prefix} {i}"}) for i in range(predictions)]
+    callers = [threading.Thread(target=lambda stream=stream: list(stream)) for stream in streams]
+    start = time.perf_counter()
+    for caller in callers:
+        caller.start()
+    samples = []
+    while any(caller.is_alive() for caller in callers):
+        samples.append(sum(thread.name.startswith("llm-") for thread in threading.enumerate()))
+        time.sleep(0.05)
+    elapsed = time.perf_counter() - start
+    statuses = [stream.status for stream in streams]
+    return max(samples, default=0), sum(samples) / max(len(samples), 1), elapsed, statuses.count("succeeded")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--predictions", type=int, default=50)
+    parser.add_argument("--latency", default="fixed:2")
+    args = parser.parse_args()
+
+    # Read by llmclient when it is imported
+    directory = tempfile.mkdtemp()
+    os.environ.update({
+        "DATA_INSIGHT_LLM_BACKEND": "fake",
+        "DATA_INSIGHT_FAKE_LATENCY": args.latency,
+        "DATA_INSIGHT_LLM_CACHE": os.path.join(directory, "llm_responses.sqlite3"),
+        "DATA_INSIGHT_LLM_LOCKS": os.path.join(directory, "locks"),
+        "DATA_INSIGHT_WEBHOOK_PORT": "0",
+    })
+    import llmclient.scheduler
+    from llmclient import Scheduler, webhook_stats
+
+    # Every prediction is sent at once, the scheduler doesn't hold any back
+    llmclient.scheduler._scheduler = Scheduler(max_concurrent=args.predictions, rate=1000,
+                                               burst=args.predictions)
+    for mode in ("stream", "webhook"):
+        peak, mean, elapsed, succeeded = run(mode, args.predictions, mode)
+        print(f"{mode:8s} driver threads peak {peak:3d} mean {mean:5.1f}  "
+              f"{elapsed:5.2f}s  {succeeded}/{args.predictions} succeeded")
+    print(f"webhooks: {webhook_stats()}")
+
+
+if __name__ == "__main__":
+    main()
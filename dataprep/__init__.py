@@ -0,0 +1,12 @@
+from dataprep.preview import PREVIEW_CHARS, text_preview, frame_preview, preview_shape
+from dataprep.ingest import DEFAULT_ENGINE, ENGINES, read_data, read_data_file
+from dataprep.parquet import ParquetReader
+from dataprep.profile import HyperLogLog, StreamingProfile, is_nested, hashable_values, profile_column, profile_frame, format_profile
+from dataprep.cache import AnalysisCache, content_key
+from dataprep.report import generate_pdf
+from dataprep.jsonl import CHUNK_BYTES, iter_line_blocks, read_json_lines
+from dataprep.compact import compact_column, compact_frame, frame_memory, narrowest_int_type
+from dataprep.pii import DETECTORS, scan_column, scan_columns, scan_frame, format_findings
+from dataprep.prompt import SECTION_BUDGETS, get_tokenizer, count_tokens, complete_lines, build_prompt
+from dataprep.sample import SAMPLE_ROWS, SAMPLE_SEED, reservoir_sample, detect_strata_column, sample_rows
+from dataprep.analysis import SECTIONS, EXTENSIONS, file_format, analysis_key, section_key, section_inputs, load_sections, report_markdown
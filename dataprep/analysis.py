@@ -0,0 +1,183 @@
+"""Prompts and report of the LLM analysis of a data file.
+
+The analysis has three sections: the data analysis from the column
+profile, the security issues from the personal data scan, and the data
+visualization techniques from a sample of the rows. The prompts are built
+here, outside of Streamlit, so the app page and the batch command line
+send the same requests and share their cached answers.
+"""
+import os
+from io import BytesIO
+
+from dataprep.cache import content_key
+from dataprep.compact import compact_frame
+from dataprep.ingest import read_data
+from dataprep.jsonl import read_json_lines
+from dataprep.parquet import ParquetReader
+from dataprep.pii import scan_columns, scan_frame, format_findings
+from dataprep.preview import PREVIEW_CHARS, frame_preview
+from dataprep.profile import profile_frame, format_profile
+from dataprep.prompt import SECTION_BUDGETS, build_prompt, complete_lines
+from dataprep.sample import reservoir_sample, detect_strata_column, sample_rows
+
+SECTIONS = ("analysis", "security", "visualization")
+EXTENSIONS = {
+    ".csv": "CSV",
+    ".parquet": "Apache Parquet",
+    ".js": "JSON",
+    ".json": "JSON",
+    ".jsonl": "JSON Lines",
+    ".ndjson": "JSON Lines",
+}
+NO_PERSONAL_DATA = ("A local pattern scan of every row matched no emails, phone numbers, card numbers, "
+                    "IBANs, US SSNs, Spanish DNI/NIE or IP addresses in any column. Other personal data "
+                    "(names, addresses, birth dates, free text...) isn't covered by the scan and "
+                    "should still be reviewed.")
+
+
+def file_format(path):
+    """
+    Format of a data file from its extension
+        :param path: Path or name of the file
+        :type path: str
+        :return: "CSV", "Apache Parquet", "JSON" or "JSON Lines", None when not supported
+        :rtype: str
+    """
+    return EXTENSIONS.get(os.path.splitext(path)[1].lower())
+
+
+def analysis_key(bytes_data, option_format, header=True, compact=True):
+    """
+    Key of the analysis of a file in the analysis cache
+        :param bytes_data: Content of the file
+        :type bytes_data: bytes
+        :param option_format: Format of the file
+        :type option_format: str
+        :param header: Whether a CSV file has a header
+        :type header: bool
+        :param compact: Whether the data types are compacted before profiling,
+            which changes the profile of the CSV and JSON files only
+        :type compact: bool
+        :rtype: str
+    """
+    return content_key(bytes_data, option_format, header, compact and option_format in ("CSV", "JSON"))
+
+
+def section_key(section, strata=None):
+    """
+    Name of a section in the cached analysis of a file. The sample of rows
+    of the visualization section changes with the column it's stratified
+    on, a column chosen instead of the automatic one gets its own entry.
+        :param section: Value of ``SECTIONS``
+        :type section: str
+        :param strata: Choice of the column to stratify the sample on, None
+            for the automatic one
+        :type strata: str
+        :rtype: str
+    """
+    if section == "visualization" and strata is not None:
+        return f"{section}:{strata}"
+    return section
+
+
+def section_inputs(option_format, data_profile, pii_findings, string_data, header=True):
+    """
+    Input to LLM of every section of the analysis
+        :param option_format: Format of the file
+        :type option_format: str
+        :param data_profile: Text profile of every column
+        :type data_profile: str
+        :param pii_findings: Result of ``scan_frame`` or ``scan_columns``
+        :type pii_findings: pandas.DataFrame
+        :param string_data: Text preview of a sample of the rows
+        :type string_data: str
+        :param header: Whether a CSV file has a header
+        :type header: bool
+        :return: Input of every section, or its final text when it is
+            answered without the LLM, and the number of tokens of every prompt
+        :rtype: tuple
+    """
+    if header:
+        prompt = f"Explains this {option_format} file and all its columns from the following column profile, indicates the potential uses of this data and which columns could cause problems:"
+    else:
+        prompt = f"Explains this {option_format} file. Indicates what the data can be used for and what might cause problems:"
+    prompt, prompt_tokens = build_prompt(prompt + "\n", data_profile.splitlines(), SECTION_BUDGETS["analysis"])
+    inputs = {"analysis": {"prompt": prompt, "temperature": 0.2}}
+    tokens = {"analysis": prompt_tokens}
+
+    # Only the columns flagged by the local scan are sent to the LLM
+    if pii_findings.empty:
+        inputs["security"] = NO_PERSONAL_DATA
+    else:
+        prompt_sec = f"Look for any leaks of sensitive personal data. Discuss the security issues in this {option_format} file in Python. Select only the ones you think are relevant."
+        prompt_sec += " A scan of every row flagged these columns:\n"
+        prompt_sec, prompt_tokens = build_prompt(prompt_sec, format_findings(pii_findings).splitlines(), SECTION_BUDGETS["security"])
+        inputs["security"] = {"prompt": prompt_sec, "temperature": 0.4}
+        tokens["security"] = prompt_tokens
+
+    prompt_vis = f"Discuss the pros and cons of different data visualization techniques for data analysis of this {option_format} file in Python. Select only the ones you think are relevant."
+    prompt_vis, prompt_tokens = build_prompt(prompt_vis + "\n", complete_lines(string_data, PREVIEW_CHARS), SECTION_BUDGETS["visualization"])
+    inputs["visualization"] = {"prompt": prompt_vis, "temperature": 0.9}
+    tokens["visualization"] = prompt_tokens
+    return inputs, tokens
+
+
+def load_sections(bytes_data, option_format, header=True, compact=True):
+    """
+    Parse, profile, scan and sample a data file as the app page does with
+    its default options, and build the input of every section
+        :param bytes_data: Content of the file
+        :type bytes_data: bytes
+        :param option_format: Format of the file
+        :type option_format: str
+        :param header: Whether a CSV file has a header, True for the other formats
+        :type header: bool
+        :param compact: Compact the data types before profiling
+        :type compact: bool
+        :return: Same as ``section_inputs``, and the number of rows
+        :rtype: tuple
+    """
+    if option_format == "Apache Parquet":
+        # Read one column or row group at a time
+        parquet_data = ParquetReader(bytes_data)
+        n_rows = parquet_data.num_rows
+        data_profile = format_profile(parquet_data.profile(), n_rows)
+        pii_findings = scan_columns(parquet_data.iter_columns())
+        string_data = frame_preview(reservoir_sample(parquet_data.iter_row_groups()))
+    else:
+        if option_format == "JSON Lines":
+            df, streaming_profile = read_json_lines(BytesIO(bytes_data))
+            data_profile = format_profile(streaming_profile.profile(), streaming_profile.n_rows)
+        else:
+            df = read_data(bytes_data, option_format, header=header)
+        if compact and option_format != "JSON Lines":
+            # JSON Lines frames are already compacted while they are read
+            df = compact_frame(df)
+        if option_format != "JSON Lines":
+            data_profile = format_profile(profile_frame(df), len(df))
+        n_rows = len(df)
+        pii_findings = scan_frame(df)
+        string_data = frame_preview(sample_rows(df, strata=detect_strata_column(df)))
+    inputs, tokens = section_inputs(option_format, data_profile, pii_findings, string_data, header)
+    return inputs, tokens, n_rows
+
+
+def report_markdown(option_format, analysis):
+    """
+    Markdown report joining the text of every section
+        :param option_format: Format of the file
+        :type option_format: str
+        :param analysis: Text of every section
+        :type analysis: dict
+        :rtype: str
+    """
+    all_generated_data = ""
+    all_generated_data += f"## {option_format} file data analysis\n"
+    all_generated_data += analysis["analysis"]
+    all_generated_data += "\n\n"
+    all_generated_data += "## Security issues\n"
+    all_generated_data += analysis["security"]
+    all_generated_data += "\n\n"
+    all_generated_data += "## Data visualization techniques\n"
+    all_generated_data += analysis["visualization"]
+    return all_generated_data
@@ -0,0 +1,118 @@
+"""Disk cache of the LLM analyses of data files.
+
+Analyses are keyed by a hash of the file content and of the options that
+change the prompt, so renaming a file keeps its analysis and two files
+with the same name never share one. Entries are JSON files in a local
+directory shared by every session of the server, with a time to live and
+least recently used eviction once the directory exceeds its size limit.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+import metrics
+
+CACHE_DIR = os.environ.get("DATA_INSIGHT_CACHE_DIR", os.path.join(".cache", "analysis"))
+CACHE_MAX_BYTES = 100 * 2**20
+CACHE_TTL = 7 * 24 * 3600
+
+
+def content_key(bytes_data, *options):
+    """
+    Cache key of a data file
+        :param bytes_data: Content of the file
+        :type bytes_data: bytes
+        :param options: Format, header flag or any option used in the prompt
+        :return: Hexadecimal digest
+        :rtype: str
+    """
+    digest = hashlib.blake2b(bytes_data, digest_size=16)
+    for option in options:
+        digest.update(b"\0" + str(option).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class AnalysisCache:
+    """
+    Size-bounded LRU cache of analyses stored as JSON files
+    """
+    def __init__(self, directory=CACHE_DIR, max_bytes=CACHE_MAX_BYTES, ttl=CACHE_TTL):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        """
+        Cached value of a key
+            :param key: Result of ``content_key``
+            :type key: str
+            :return: Stored value, None when missing or expired
+        """
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            metrics.inc("cache_requests_total", cache="analysis", result="miss")
+            return None
+
+        if time.time() - entry["created"] > self.ttl:
+            self._remove(path)
+            metrics.inc("cache_requests_total", cache="analysis", result="miss")
+            return None
+        metrics.inc("cache_requests_total", cache="analysis", result="hit")
+
+        # The modification time of an entry is its last access for LRU
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry["value"]
+
+    def set(self, key, value):
+        """
+        Store a JSON serializable value
+            :param key: Result of ``content_key``
+            :type key: str
+            :param value: Value to store
+        """
+        entry = {"created": time.time(), "value": value}
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        # Atomic replacement, readers never see a partial entry
+        os.replace(tmp_path, self._path(key))
+        self.evict()
+
+    def evict(self):
+        """Remove expired entries, then the least recently used ones above the size limit"""
+        entries = []
+        now = time.time()
+        with os.scandir(self.directory) as it:
+            for item in it:
+                if not item.name.endswith(".json"):
+                    continue
+                try:
+                    stat = item.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, item.path))
+
+        total = 0
+        for mtime, size, path in sorted(entries, reverse=True):
+            total += size
+            # Entries are never read more than ``ttl`` after their creation
+            if total > self.max_bytes or now - mtime > self.ttl:
+                self._remove(path)
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
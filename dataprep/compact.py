@@ -0,0 +1,92 @@
+"""Compaction of the dtypes of loaded DataFrames.
+
+Uploaded frames stay in memory for the whole session and are sent to the
+browser on every rerun. Integer columns are narrowed to the smallest type
+holding their values, float columns to float32 when no value changes, and
+low-cardinality strings become categoricals. Columns of nested values
+(JSON arrays and objects) can't be hashed and are left as they are.
+"""
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from dataprep.profile import is_nested
+
+CATEGORY_RATIO = 0.5
+INT_TYPES = (np.int8, np.int16, np.int32)
+
+
+def narrowest_int_type(minimum, maximum):
+    """
+    Smallest signed integer type holding a range of values
+        :return: numpy integer type, None when int64 is needed
+    """
+    for int_type in INT_TYPES:
+        info = np.iinfo(int_type)
+        if info.min <= minimum and maximum <= info.max:
+            return int_type
+    return None
+
+
+def compact_column(series, category_ratio=CATEGORY_RATIO):
+    """
+    Column with the most compact dtype that keeps all its values
+        :param series: Column to compact
+        :type series: pandas.Series
+        :param category_ratio: Maximum ratio of distinct values to rows for categoricals
+        :type category_ratio: float
+        :rtype: pandas.Series
+    """
+    dtype = series.dtype
+    values = series.dropna()
+    if values.empty:
+        return series
+
+    is_arrow = isinstance(dtype, pd.ArrowDtype)
+    if pd.api.types.is_integer_dtype(dtype):
+        int_type = narrowest_int_type(values.min(), values.max())
+        if int_type is None or np.dtype(int_type).itemsize >= _itemsize(dtype):
+            return series
+        if is_arrow:
+            return series.astype(pd.ArrowDtype(pa.from_numpy_dtype(int_type)))
+        if series.hasnans:
+            return series
+        return series.astype(int_type)
+
+    if pd.api.types.is_float_dtype(dtype) and _itemsize(dtype) > 4:
+        narrowed = values.astype(pd.ArrowDtype(pa.float32()) if is_arrow else np.float32)
+        # Only when every value is exactly representable in float32
+        if (narrowed.astype(dtype) == values).all():
+            return series.astype(narrowed.dtype)
+        return series
+
+    if pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype):
+        if is_nested(values):
+            return series
+        if values.nunique() <= category_ratio * len(series):
+            return series.astype("category")
+    return series
+
+
+def compact_frame(df, category_ratio=CATEGORY_RATIO):
+    """
+    DataFrame with every column compacted by ``compact_column``
+        :param df: Data to compact
+        :type df: pandas.DataFrame
+        :rtype: pandas.DataFrame
+    """
+    return pd.DataFrame(
+        {name: compact_column(df[name], category_ratio) for name in df.columns},
+        index=df.index
+    )
+
+
+def frame_memory(df):
+    """Memory footprint of a DataFrame in bytes, strings included"""
+    return int(df.memory_usage(deep=True).sum())
+
+
+def _itemsize(dtype):
+    if isinstance(dtype, pd.ArrowDtype):
+        return dtype.pyarrow_dtype.bit_width // 8
+    return np.dtype(dtype).itemsize
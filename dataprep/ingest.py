@@ -0,0 +1,118 @@
+"""Parsing of uploaded data files into DataFrames.
+
+Files are parsed straight from their byte buffer. The ``pyarrow`` engine
+reads CSV files with the multithreaded Arrow parser and keeps the columns
+as Arrow-backed dtypes. The ``pandas`` engine reproduces the original
+behaviour of the app and is used when pyarrow is not installed. CSV files
+the Arrow parser reads differently (repeated column names, rows of
+different lengths, text that isn't UTF-8) are parsed by pandas instead.
+"""
+from io import BytesIO
+
+import pandas as pd
+
+import metrics
+
+try:
+    import pyarrow  # noqa: F401
+except ImportError:
+    DEFAULT_ENGINE = "pandas"
+else:
+    DEFAULT_ENGINE = "pyarrow"
+
+
+def _read_csv_pandas(buffer, header, **options):
+    try:
+        return pd.read_csv(buffer, header=0 if header else None, **options)
+    except UnicodeDecodeError:
+        # Not UTF-8, Latin-1 decodes any byte
+        buffer.seek(0)
+        return pd.read_csv(buffer, header=0 if header else None, encoding="latin-1", **options)
+
+
+def _read_csv_pyarrow(buffer, header):
+    try:
+        df = pd.read_csv(buffer, header=0 if header else None,
+                         engine="pyarrow", dtype_backend="pyarrow")
+    except ValueError:
+        # Parse errors, e.g. a row with fewer fields, and column names that aren't UTF-8
+        df = None
+    # Repeated names are kept as they are, and values that aren't UTF-8 become bytes
+    if df is None or df.columns.duplicated().any() or any(
+            pyarrow.types.is_binary(dtype.pyarrow_dtype) for dtype in df.dtypes):
+        buffer.seek(0)
+        return _read_csv_pandas(buffer, header, dtype_backend="pyarrow")
+    return df
+
+
+def _read_parquet_pandas(buffer, header):
+    return pd.read_parquet(buffer)
+
+
+def _read_parquet_pyarrow(buffer, header):
+    return pd.read_parquet(buffer, dtype_backend="pyarrow")
+
+
+def _read_json_pandas(buffer, header):
+    return pd.read_json(buffer)
+
+
+def _read_json_pyarrow(buffer, header):
+    # The Arrow JSON reader only accepts line-delimited JSON, so JSON
+    # documents are parsed by pandas directly into Arrow-backed dtypes
+    return pd.read_json(buffer, dtype_backend="pyarrow")
+
+
+def _read_json_lines_pandas(buffer, header):
+    return pd.read_json(buffer, lines=True)
+
+
+def _read_json_lines_pyarrow(buffer, header):
+    return pd.read_json(buffer, lines=True, engine="pyarrow", dtype_backend="pyarrow")
+
+
+ENGINES = {
+    "pandas": {
+        "CSV": _read_csv_pandas,
+        "Apache Parquet": _read_parquet_pandas,
+        "JSON": _read_json_pandas,
+        "JSON Lines": _read_json_lines_pandas,
+    },
+    "pyarrow": {
+        "CSV": _read_csv_pyarrow,
+        "Apache Parquet": _read_parquet_pyarrow,
+        "JSON": _read_json_pyarrow,
+        "JSON Lines": _read_json_lines_pyarrow,
+    },
+}
+
+
+def read_data(bytes_data, option_format, header=True, engine=DEFAULT_ENGINE):
+    """Parse the content of a data file
+
+    Parameters
+    ----------
+    bytes_data : bytes
+        Raw content of the file
+    option_format : str
+        One of "CSV", "Apache Parquet", "JSON" or "JSON Lines"
+    header : bool
+        Whether the first row of a CSV file contains the column names
+    engine : str
+        Name of a registered engine in ``ENGINES``
+
+    Returns
+    -------
+    pandas.DataFrame
+        Parsed data
+    """
+    reader = ENGINES[engine][option_format]
+    metrics.inc("bytes_ingested_total", len(bytes_data), format=option_format)
+    with metrics.timer("read_data_seconds", format=option_format, engine=engine):
+        return reader(BytesIO(bytes_data), header)
+
+
+def read_data_file(path, option_format, header=True, engine=DEFAULT_ENGINE):
+    """Parse a data file from disk with ``read_data``"""
+    with open(path, "rb") as f:
+        return read_data(f.read(), option_format, header, engine)
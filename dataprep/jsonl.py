@@ -0,0 +1,152 @@
+"""Chunked reading of JSON Lines (NDJSON) files.
+
+The file is read in blocks of complete lines. Every block updates the
+column profile, and is stored as a compact Arrow table, so the memory used
+besides the result is bounded by the block size and not by the file size.
+A field typed differently across blocks or inside a block (e.g. numbers,
+then strings) is stored as text.
+"""
+import json
+from io import BytesIO
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.json as pa_json
+
+import metrics
+from dataprep.compact import narrowest_int_type
+from dataprep.profile import StreamingProfile
+
+CHUNK_BYTES = 4 * 2**20
+
+
+def iter_line_blocks(stream, chunk_bytes=CHUNK_BYTES):
+    """
+    Read a binary stream in blocks that end on a line boundary
+        :param stream: File object opened in binary mode
+        :param chunk_bytes: Number of bytes read at a time
+        :type chunk_bytes: int
+        :return: Generator of blocks of complete lines
+    """
+    rest = b""
+    while True:
+        chunk = stream.read(chunk_bytes)
+        if not chunk:
+            break
+        block = rest + chunk
+        end = block.rfind(b"\n") + 1
+        rest = block[end:]
+        if end:
+            metrics.inc("bytes_ingested_total", end, format="JSON Lines")
+            yield block[:end]
+    if rest.strip():
+        metrics.inc("bytes_ingested_total", len(rest), format="JSON Lines")
+        yield rest
+
+
+@metrics.timed("read_data_seconds", format="JSON Lines", engine="chunked")
+def read_json_lines(stream, chunk_bytes=CHUNK_BYTES):
+    """
+    Read a JSON Lines stream in chunks
+        :param stream: File object opened in binary mode
+        :param chunk_bytes: Number of bytes read at a time
+        :type chunk_bytes: int
+        :return: Compacted DataFrame and its StreamingProfile
+        :rtype: tuple
+    """
+    data_profile = StreamingProfile()
+    tables = []
+
+    for block in iter_line_blocks(stream, chunk_bytes):
+        table = _read_block(block)
+        data_profile.update(table.to_pandas(types_mapper=pd.ArrowDtype))
+        tables.append(_encode_strings(table))
+
+    if not tables:
+        return pd.DataFrame(), data_profile
+
+    # Columns missing from a block or typed differently are unified here
+    table = pa.concat_tables(_unify_types(tables), promote_options="permissive")
+    del tables
+    table = _downcast_integers(table, data_profile)
+    return table.to_pandas(types_mapper=_arrow_dtype), data_profile
+
+
+def _arrow_dtype(arrow_type):
+    """Arrow-backed dtypes, except dictionaries that become categoricals"""
+    if pa.types.is_dictionary(arrow_type):
+        return None
+    return pd.ArrowDtype(arrow_type)
+
+
+def _encode_strings(table):
+    """Dictionary-encode the string columns of a block"""
+    for i, field in enumerate(table.schema):
+        if pa.types.is_string(field.type) or pa.types.is_large_string(field.type):
+            table = table.set_column(i, field.name, table.column(i).dictionary_encode())
+    return table
+
+
+def _read_block(block):
+    """Arrow table of a block of lines"""
+    try:
+        return pa_json.read_json(BytesIO(block))
+    except pa.ArrowInvalid:
+        # e.g. "Column(/a) changed from number to string", rare enough to parse it in Python
+        rows = [json.loads(line) for line in block.splitlines() if line.strip()]
+    columns = {}
+    for name in dict.fromkeys(name for row in rows for name in row):
+        values = [row.get(name) for row in rows]
+        try:
+            columns[name] = pa.array(values)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            columns[name] = pa.array([_text(value) for value in values], pa.string())
+    return pa.table(columns)
+
+
+def _text(value):
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value, sort_keys=True, default=str)
+
+
+def _unify_types(tables):
+    """Blocks with the fields that can't be promoted to a common type as text"""
+    types = {}
+    for table in tables:
+        for field in table.schema:
+            types.setdefault(field.name, []).append(field)
+    conflicts = set()
+    for name, fields in types.items():
+        try:
+            pa.unify_schemas([pa.schema([field]) for field in fields], promote_options="permissive")
+        except (pa.ArrowTypeError, pa.ArrowInvalid):
+            conflicts.add(name)
+    if not conflicts:
+        return tables
+    return [_as_text(table, conflicts) for table in tables]
+
+
+def _as_text(table, names):
+    """Columns of a block as text, nested values as their JSON"""
+    for i, field in enumerate(table.schema):
+        if field.name not in names:
+            continue
+        if pa.types.is_nested(field.type):
+            column = pa.array([_text(value) for value in table.column(i).to_pylist()], pa.string())
+        else:
+            column = table.column(i).cast(pa.string())
+        table = table.set_column(i, field.name, column.dictionary_encode())
+    return table
+
+
+def _downcast_integers(table, data_profile):
+    """Cast integer columns to the narrowest type holding their min and max"""
+    for i, field in enumerate(table.schema):
+        column = data_profile.columns.get(field.name, {})
+        if not pa.types.is_integer(field.type) or column.get("min") is None:
+            continue
+        int_type = narrowest_int_type(column["min"], column["max"])
+        if int_type is not None:
+            table = table.set_column(i, field.name, table.column(i).cast(pa.from_numpy_dtype(int_type)))
+    return table
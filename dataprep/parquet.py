@@ -0,0 +1,128 @@
+"""Metadata-first access to Apache Parquet files.
+
+The footer of a Parquet file already holds the schema, the number of rows
+and the min/max/null statistics of every column chunk. ``ParquetReader``
+answers those questions from the footer alone and only decodes the row
+groups needed for the rows that are actually displayed.
+"""
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import metrics
+from dataprep.profile import TOP_K, profile_column
+
+
+class ParquetReader:
+    """
+    Lazy reader over the content of a Parquet file
+    """
+    def __init__(self, bytes_data):
+        metrics.inc("bytes_ingested_total", len(bytes_data), format="Apache Parquet")
+        # Read in place, and safely from several threads at once
+        self.parquet_file = pq.ParquetFile(pa.BufferReader(bytes_data))
+        self.metadata = self.parquet_file.metadata
+        self.num_rows = self.metadata.num_rows
+        self.num_columns = self.metadata.num_columns
+
+        # First row of every row group, plus the total as end marker
+        self.row_group_offsets = [0]
+        for i in range(self.metadata.num_row_groups):
+            rows = self.metadata.row_group(i).num_rows
+            self.row_group_offsets.append(self.row_group_offsets[-1] + rows)
+
+    def column_statistics(self):
+        """
+        Schema and column statistics read from the file footer
+            :return: One row per column with type, min, max and null count
+            :rtype: pandas.DataFrame
+        """
+        schema = self.parquet_file.schema_arrow
+        stats = []
+        for i, field in enumerate(schema):
+            minimum = maximum = None
+            null_count = 0
+            for rg in range(self.metadata.num_row_groups):
+                chunk_stats = self.metadata.row_group(rg).column(i).statistics
+                if chunk_stats is None:
+                    null_count = None
+                    continue
+                if chunk_stats.has_min_max:
+                    minimum = chunk_stats.min if minimum is None else min(minimum, chunk_stats.min)
+                    maximum = chunk_stats.max if maximum is None else max(maximum, chunk_stats.max)
+                if null_count is not None and chunk_stats.has_null_count:
+                    null_count += chunk_stats.null_count
+            stats.append({
+                "column": field.name,
+                "type": str(field.type),
+                "min": None if minimum is None else str(minimum),
+                "max": None if maximum is None else str(maximum),
+                "null_count": null_count,
+            })
+        return pd.DataFrame(stats)
+
+    @metrics.timed("parquet_read_rows_seconds")
+    def read_rows(self, start, stop, columns=None):
+        """
+        Read a slice of rows, decoding only the row groups that hold it
+            :param start: First row
+            :type start: int
+            :param stop: Row after the last one
+            :type stop: int
+            :param columns: Names of the columns to read, all by default
+            :type columns: list
+            :return: Rows ``start`` to ``stop``
+            :rtype: pandas.DataFrame
+        """
+        start = max(0, start)
+        stop = min(self.num_rows, stop)
+        row_groups = [
+            i for i in range(self.metadata.num_row_groups)
+            if self.row_group_offsets[i] < stop and self.row_group_offsets[i + 1] > start
+        ]
+        if not row_groups:
+            table = self.parquet_file.schema_arrow.empty_table()
+            if columns is not None:
+                table = table.select(columns)
+        else:
+            table = self.parquet_file.read_row_groups(row_groups, columns=columns)
+            first_row = self.row_group_offsets[row_groups[0]]
+            table = table.slice(start - first_row, stop - start)
+        return table.to_pandas(types_mapper=pd.ArrowDtype)
+
+    def profile(self, top_k=TOP_K):
+        """
+        Column profiles, reading a single column of the file at a time
+            :return: One dict per column, as ``profile_frame``
+            :rtype: list
+        """
+        return [profile_column(column, top_k) for column in self.iter_columns()]
+
+    def iter_row_groups(self):
+        """
+        Read the whole file one row group at a time
+            :return: Generator of ``pandas.DataFrame``
+        """
+        for i in range(self.metadata.num_row_groups):
+            yield self.parquet_file.read_row_group(i).to_pandas(types_mapper=pd.ArrowDtype)
+
+    def iter_columns(self):
+        """
+        Read the whole file one column at a time
+            :return: Generator of ``pandas.Series``
+        """
+        for name in self.parquet_file.schema_arrow.names:
+            # The index written by pandas is a column too, except an unnamed one
+            if name.startswith("__index_level_"):
+                continue
+            table = self.parquet_file.read(columns=[name], use_pandas_metadata=False)
+            yield table.column(0).to_pandas(types_mapper=pd.ArrowDtype).rename(name)
+
+    def num_pages(self, page_size):
+        """Number of pages of ``page_size`` rows"""
+        return max(1, -(-self.num_rows // page_size))
+
+    def page(self, number, page_size):
+        """Page ``number`` (starting at 1) of ``page_size`` rows"""
+        start = (number - 1) * page_size
+        return self.read_rows(start, start + page_size)
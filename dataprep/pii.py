@@ -0,0 +1,162 @@
+"""Local scan of personal data in every column of a DataFrame.
+
+Each detector runs on its own over a column and keeps every match of a
+cell, so a number that fails a checksum or looks like a phone doesn't hide
+a card number or an email next to it. Card numbers, IBANs and Spanish
+DNI/NIE candidates are then validated with their checksum, so only real
+hits are counted. Categorical columns are scanned on their categories only.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+import metrics
+
+DETECTORS = {
+    "email": r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}",
+    "iban": r"\b[A-Z]{2}\d{2}(?: ?[A-Z0-9]{4}){2,7}(?: ?[A-Z0-9]{1,3})?\b",
+    "card_number": r"\b\d(?:[ -]?\d){12,18}\b",
+    "us_ssn": r"\b\d{3}-\d{2}-\d{4}\b",
+    "es_dni_nie": r"\b[XYZ]?\d{7,8}-?[A-Z]\b",
+    "ipv4": r"\b(?:(?:25[0-5]|2[0-4]\d|1?\d?\d)\.){3}(?:25[0-5]|2[0-4]\d|1?\d?\d)\b",
+    "ipv6": r"\b(?:[0-9A-Fa-f]{1,4}:){7}[0-9A-Fa-f]{1,4}\b",
+    "phone": r"(?<![\w.+-])(?:\+\d{1,3}[ .-]?)?(?:\(\d{2,4}\)[ .-]?|\d{3}[ .-]?)\d{3}[ .-]?\d{3,4}(?![\w.-])",
+}
+# ASCII digits only: the checksums can't read other Unicode digits, e.g. full-width ones
+PATTERNS = {name: re.compile(f"({regex})", re.ASCII) for name, regex in DETECTORS.items()}
+SAMPLES = 3
+DNI_LETTERS = "TRWAGMYFPDXBNJZSQVHLCKE"
+
+
+def luhn_valid(candidates):
+    """
+    Vectorized Luhn checksum of card number candidates
+        :param candidates: Card numbers, spaces and dashes allowed
+        :type candidates: pandas.Series
+        :return: True for every valid number
+        :rtype: numpy.ndarray
+    """
+    digits = candidates.str.replace(r"[^0-9]", "", regex=True)
+    # Left padding with zeros does not change the checksum
+    padded = digits.str.zfill(19).to_numpy(dtype=str).astype("S19")
+    matrix = np.frombuffer(padded.tobytes(), dtype=np.uint8).reshape(-1, 19) - ord("0")
+    doubled = matrix[:, -2::-2] * 2
+    doubled = np.where(doubled > 9, doubled - 9, doubled)
+    total = matrix[:, ::-2].sum(axis=1) + doubled.sum(axis=1)
+    return (total % 10 == 0) & (digits.str.len().to_numpy() >= 13)
+
+
+def iban_valid(candidates):
+    """ISO 13616 mod-97 checksum of IBAN candidates"""
+    def valid(iban):
+        iban = iban.replace(" ", "")
+        rearranged = iban[4:] + iban[:4]
+        return int("".join(str(int(char, 36)) for char in rearranged)) % 97 == 1
+    return candidates.map(valid).to_numpy(dtype=bool)
+
+
+def dni_valid(candidates):
+    """Control letter of Spanish DNI and NIE candidates"""
+    def valid(dni):
+        dni = dni.replace("-", "")
+        number = dni[:-1].replace("X", "0").replace("Y", "1").replace("Z", "2")
+        return DNI_LETTERS[int(number) % 23] == dni[-1]
+    return candidates.map(valid).to_numpy(dtype=bool)
+
+
+VALIDATORS = {
+    "card_number": luhn_valid,
+    "iban": iban_valid,
+    "es_dni_nie": dni_valid,
+}
+
+
+def mask(value):
+    """Hide all but the first and last characters of a sample"""
+    if len(value) <= 4:
+        return "*" * len(value)
+    return value[:2] + "*" * (len(value) - 4) + value[-2:]
+
+
+def scan_column(series, samples=SAMPLES):
+    """
+    Personal data found in a single column
+        :param series: Column to scan
+        :type series: pandas.Series
+        :param samples: Number of masked samples kept per detector
+        :type samples: int
+        :return: One dict per detector with hits
+        :rtype: list
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # Scan every category once, weighted by its number of rows
+        weights = series.value_counts(sort=False)
+        values = weights.index.astype(str).to_series(index=weights.index)
+        weights = weights.to_numpy()
+    elif pd.api.types.is_integer_dtype(series.dtype):
+        values = series.dropna()
+        # Only integers long enough to be card numbers, IDs or phones
+        if values.empty or len(str(abs(int(values.max())))) < 9:
+            return []
+        values = values.astype(str)
+        weights = None
+    elif pd.api.types.is_object_dtype(series.dtype) or pd.api.types.is_string_dtype(series.dtype):
+        values = series.dropna().astype(str)
+        weights = None
+    else:
+        return []
+    if values.empty:
+        return []
+
+    # Positional index, the rows of every match are counted once
+    values = values.reset_index(drop=True)
+    findings = []
+    for detector, pattern in PATTERNS.items():
+        candidates = values.str.extractall(pattern)[0]
+        if detector in VALIDATORS and not candidates.empty:
+            candidates = candidates[VALIDATORS[detector](candidates)]
+        if candidates.empty:
+            continue
+        rows = candidates.index.get_level_values(0).unique().to_numpy()
+        hits = int(weights[rows].sum()) if weights is not None else len(rows)
+        findings.append({
+            "column": str(series.name),
+            "detector": detector,
+            "hits": hits,
+            "samples": ", ".join(mask(value) for value in candidates.unique()[:samples]),
+        })
+    return findings
+
+
+@metrics.timed("pii_scan_seconds")
+def scan_frame(df, samples=SAMPLES):
+    """
+    Personal data found in every column of a DataFrame
+        :param df: Data to scan
+        :type df: pandas.DataFrame
+        :return: One row per column and detector with hits and masked samples
+        :rtype: pandas.DataFrame
+    """
+    return scan_columns((df[name] for name in df.columns), samples)
+
+
+def scan_columns(columns, samples=SAMPLES):
+    """Same as ``scan_frame`` over an iterable of columns"""
+    findings = []
+    for series in columns:
+        findings.extend(scan_column(series, samples))
+    return pd.DataFrame(findings, columns=["column", "detector", "hits", "samples"])
+
+
+def format_findings(findings):
+    """
+    Compact text version of the findings for the LLM prompt
+        :param findings: Result of ``scan_frame``
+        :type findings: pandas.DataFrame
+        :rtype: str
+    """
+    return "\n".join(
+        f"- column {row.column}: {row.hits} {row.detector} values (masked samples: {row.samples})"
+        for row in findings.itertuples()
+    )
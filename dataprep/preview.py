@@ -0,0 +1,88 @@
+"""Prompt previews of uploaded data files.
+
+The prompts sent to the LLM only keep the first characters of the file
+content, so there is no need to render the whole file to a string first.
+"""
+
+import metrics
+
+# Enough text for the largest token budget of a prompt section
+PREVIEW_CHARS = 4000
+
+
+@metrics.timed("decode_seconds")
+def text_preview(bytes_data, max_chars=PREVIEW_CHARS):
+    """Decode only the head of a text file
+
+    Parameters
+    ----------
+    bytes_data : bytes
+        Raw content of the uploaded file
+    max_chars : int
+        Number of characters to keep
+
+    Returns
+    -------
+    str
+        Same text as ``str(bytes_data, 'utf-8')[0:max_chars]``
+    """
+    # A UTF-8 character takes at most 4 bytes
+    head = bytes(bytes_data[:max_chars * 4])
+    return head.decode("utf-8", errors="ignore")[0:max_chars]
+
+
+@metrics.timed("to_string_seconds")
+def frame_preview(df, max_chars=PREVIEW_CHARS):
+    """Render only the part of a DataFrame that fits in the prompt
+
+    ``df.to_string(index=False)`` is applied to the rows and columns that
+    can appear in the first ``max_chars`` characters. Column widths are
+    computed over those rows only, so long columns further down the file
+    no longer change the padding of the preview.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        Data to preview
+    max_chars : int
+        Number of characters to keep
+
+    Returns
+    -------
+    str
+        Text preview of at most ``max_chars`` characters
+    """
+    n_rows, n_cols = preview_shape(df.columns, max_chars)
+    if n_cols == 0:
+        return df.head(0).to_string(index=False)[0:max_chars]
+
+    head = df.iloc[:n_rows, :n_cols]
+    return head.to_string(index=False)[0:max_chars]
+
+
+def preview_shape(columns, max_chars=PREVIEW_CHARS):
+    """Rows and leading columns that can appear in a text preview
+
+    Parameters
+    ----------
+    columns : list
+        Column names of the data
+    max_chars : int
+        Number of characters to keep
+
+    Returns
+    -------
+    tuple
+        Number of rows and number of leading columns to format
+    """
+    n_cols = len(columns)
+    width = 0
+    for i, name in enumerate(columns):
+        width += len(str(name)) + 1
+        if width > max_chars:
+            n_cols = i + 1
+            break
+
+    # Every line takes at least one character plus one separator per column
+    n_rows = max_chars // (2 * max(n_cols, 1)) + 1
+    return n_rows, n_cols
@@ -0,0 +1,315 @@
+"""Column profiles of a DataFrame for the LLM prompt.
+
+Every column is summarised with vectorized reductions: dtype, null ratio,
+min/max, mean/std, the most frequent values and an approximate number of
+distinct values from a HyperLogLog sketch. The text profile covers all
+the columns of the file in far fewer characters than a dump of its rows.
+Nested values (JSON arrays and objects) are profiled as their JSON text.
+"""
+import json
+
+import numpy as np
+import pandas as pd
+
+import metrics
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+HLL_PRECISION = 12
+TOP_K = 3
+# Values of nested JSON, and of Arrow list columns converted to NumPy
+NESTED_TYPES = (list, dict, tuple, set, np.ndarray)
+
+
+def _json_default(value):
+    # NumPy arrays and scalars of the nested values
+    if isinstance(value, (np.ndarray, np.generic)):
+        return value.tolist()
+    return str(value)
+
+
+def is_nested(series):
+    """
+    Whether a column holds nested values, which can't be hashed: lists or
+    dicts of an object column, or an Arrow list, struct or map column
+        :param series: Column to check
+        :type series: pandas.Series
+        :rtype: bool
+    """
+    if isinstance(series.dtype, pd.ArrowDtype):
+        return pa.types.is_nested(series.dtype.pyarrow_dtype)
+    if not pd.api.types.is_object_dtype(series.dtype):
+        return False
+    # Columns of strings or numbers only are found without a Python loop
+    if not pd.api.types.infer_dtype(series, skipna=True).startswith("mixed"):
+        return False
+    return bool(series.map(lambda value: isinstance(value, NESTED_TYPES)).any())
+
+
+def hashable_values(series):
+    """
+    Column with its nested values as JSON text, so they can be hashed and counted
+        :param series: Column
+        :type series: pandas.Series
+        :rtype: pandas.Series
+    """
+    if not is_nested(series):
+        return series
+    if isinstance(series.dtype, pd.ArrowDtype):
+        # Lists become NumPy arrays and structs dicts
+        series = series.astype(object)
+    return series.map(lambda value: json.dumps(value, sort_keys=True, default=_json_default)
+                      if isinstance(value, NESTED_TYPES) else value)
+
+
+class HyperLogLog:
+    """
+    HyperLogLog sketch of the distinct values of a column
+    """
+    def __init__(self, precision=HLL_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def add(self, series):
+        """
+        Add the values of a Series to the sketch, ignoring nulls
+            :param series: Values to count
+            :type series: pandas.Series
+        """
+        series = series.dropna()
+        if series.empty:
+            return
+        hashes = pd.util.hash_pandas_object(series, index=False).to_numpy()
+        self.add_hashes(hashes)
+
+    def add_hashes(self, hashes):
+        """
+        Add 64 bits hashes to the sketch
+            :param hashes: Hashed values
+            :type hashes: numpy.ndarray of uint64
+        """
+        p = self.precision
+        index = (hashes >> np.uint64(64 - p)).astype(np.intp)
+        rest = hashes << np.uint64(p)
+        # Position of the first set bit, 65 - p when the remaining bits are zero
+        bit_length = np.zeros(len(rest), dtype=np.int64)
+        nonzero = rest != 0
+        bit_length[nonzero] = np.frexp(rest[nonzero].astype(np.float64))[1]
+        bit_length = np.minimum(bit_length, 64)
+        rank = np.where(nonzero, 65 - bit_length, 65 - p).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other):
+        """Merge another sketch with the same precision into this one"""
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def count(self):
+        """
+        Estimated number of distinct values
+            :rtype: int
+        """
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = np.count_nonzero(self.registers == 0)
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting for small cardinalities
+            estimate = m * np.log(m / zeros)
+        return int(round(estimate))
+
+
+def profile_column(series, top_k=TOP_K):
+    """
+    Statistics of a single column
+        :param series: Column to profile
+        :type series: pandas.Series
+        :param top_k: Number of most frequent values to keep
+        :type top_k: int
+        :return: Column statistics
+        :rtype: dict
+    """
+    n_rows = len(series)
+    null_count = int(series.isna().sum())
+    profile = {
+        "column": str(series.name),
+        "dtype": str(series.dtype),
+        "null_ratio": null_count / n_rows if n_rows else 0.0,
+    }
+
+    values = hashable_values(series.dropna())
+    if values.empty:
+        return profile
+
+    is_bool = pd.api.types.is_bool_dtype(series.dtype)
+    is_numeric = pd.api.types.is_numeric_dtype(series.dtype) and not is_bool
+    if is_numeric or pd.api.types.is_datetime64_any_dtype(series.dtype):
+        profile["min"] = values.min()
+        profile["max"] = values.max()
+    if is_numeric:
+        profile["mean"] = float(values.mean())
+        profile["std"] = float(values.std()) if len(values) > 1 else 0.0
+
+    sketch = HyperLogLog()
+    sketch.add(values)
+    profile["distinct"] = min(sketch.count(), len(values))
+
+    if not pd.api.types.is_float_dtype(series.dtype):
+        counts = values.value_counts(sort=False).nlargest(top_k)
+        if len(counts) and counts.iloc[0] > 1:
+            profile["top"] = list(zip(counts.index.tolist(), counts.tolist()))
+    return profile
+
+
+@metrics.timed("profile_seconds")
+def profile_frame(df, top_k=TOP_K):
+    """
+    Statistics of every column of a DataFrame
+        :param df: Data to profile
+        :type df: pandas.DataFrame
+        :return: One dict per column
+        :rtype: list
+    """
+    return [profile_column(df[name], top_k) for name in df.columns]
+
+
+def format_profile(profile, n_rows):
+    """
+    Compact text version of a profile for the LLM prompt
+        :param profile: Result of ``profile_frame``
+        :type profile: list
+        :param n_rows: Number of rows of the data
+        :type n_rows: int
+        :rtype: str
+    """
+    lines = [f"{n_rows} rows, {len(profile)} columns:"]
+    for column in profile:
+        parts = [f"nulls {column['null_ratio']:.1%}"]
+        if "min" in column:
+            parts.append(f"min {_format_value(column['min'])}")
+            parts.append(f"max {_format_value(column['max'])}")
+        if "mean" in column:
+            parts.append(f"mean {_format_value(column['mean'])}")
+            parts.append(f"std {_format_value(column['std'])}")
+        if "distinct" in column:
+            parts.append(f"~{column['distinct']} distinct")
+        if column.get("top"):
+            top = ", ".join(f"{_format_value(value)} ({count})" for value, count in column["top"])
+            parts.append(f"top {top}")
+        lines.append(f"- {column['column']} ({column['dtype']}): " + "; ".join(parts))
+    return "\n".join(lines)
+
+
+def _format_value(value, max_chars=40):
+    if isinstance(value, float):
+        text = f"{value:.6g}"
+    else:
+        text = str(value)
+    if len(text) > max_chars:
+        text = text[:max_chars - 3] + "..."
+    return text
+
+
+class StreamingProfile:
+    """
+    Column profiles of data read in chunks, as returned by ``profile_frame``.
+    Means and standard deviations are merged exactly, top values are kept
+    for the ``max_counts`` most frequent values of every column.
+    """
+    def __init__(self, top_k=TOP_K, max_counts=1000):
+        self.top_k = top_k
+        self.max_counts = max_counts
+        self.n_rows = 0
+        self.columns = {}
+
+    def update(self, df):
+        """
+        Add a chunk of rows to the profile
+            :param df: Chunk of data
+            :type df: pandas.DataFrame
+        """
+        for name in df.columns:
+            column = self.columns.get(name)
+            if column is None:
+                column = self.columns[name] = {
+                    "count": 0, "mean": 0.0, "m2": 0.0,
+                    "sketch": HyperLogLog(), "counts": None,
+                }
+            self._update_column(column, df[name])
+        self.n_rows += len(df)
+
+    def _update_column(self, column, series):
+        values = hashable_values(series.dropna())
+        n = len(values)
+        if not n:
+            column.setdefault("dtype", str(series.dtype))
+            return
+        column["dtype"] = str(series.dtype)
+
+        is_bool = pd.api.types.is_bool_dtype(series.dtype)
+        is_numeric = pd.api.types.is_numeric_dtype(series.dtype) and not is_bool
+        if column.setdefault("numeric", is_numeric) != is_numeric:
+            column["mixed"] = True
+        if column.get("mixed"):
+            # Numbers in some chunks and text in others: no range nor mean
+            column["numeric"] = False
+            column["min"] = column["max"] = None
+        elif is_numeric or pd.api.types.is_datetime64_any_dtype(series.dtype):
+            minimum, maximum = values.min(), values.max()
+            try:
+                column["min"] = min(column.get("min", minimum), minimum)
+                column["max"] = max(column.get("max", maximum), maximum)
+            except TypeError:
+                # Incompatible types across chunks
+                column["min"] = column["max"] = None
+        if is_numeric and not column.get("mixed"):
+            # Chan et al. merge of the running mean and sum of squared deviations
+            mean = float(values.mean())
+            m2 = float(((values.astype("float64") - mean) ** 2).sum())
+            total = column["count"] + n
+            delta = mean - column["mean"]
+            column["m2"] += m2 + delta * delta * column["count"] * n / total
+            column["mean"] += delta * n / total
+
+        column["count"] += n
+        column["sketch"].add(values)
+
+        if not pd.api.types.is_float_dtype(series.dtype):
+            counts = values.value_counts(sort=False)
+            if len(counts) > self.max_counts:
+                counts = counts.nlargest(self.max_counts)
+            if column["counts"] is not None:
+                counts = pd.concat([column["counts"], counts]).groupby(level=0, sort=False).sum()
+                if len(counts) > self.max_counts:
+                    counts = counts.nlargest(self.max_counts)
+            column["counts"] = counts
+
+    def profile(self):
+        """
+        Column profiles of all the chunks added so far
+            :return: One dict per column
+            :rtype: list
+        """
+        profile = []
+        for name, column in self.columns.items():
+            result = {
+                "column": str(name),
+                "dtype": column.get("dtype", "null"),
+                "null_ratio": 1 - column["count"] / self.n_rows if self.n_rows else 0.0,
+            }
+            if column["count"]:
+                if column.get("min") is not None:
+                    result["min"] = column["min"]
+                    result["max"] = column["max"]
+                if column.get("numeric"):
+                    result["mean"] = column["mean"]
+                    result["std"] = (column["m2"] / (column["count"] - 1)) ** 0.5 if column["count"] > 1 else 0.0
+                result["distinct"] = min(column["sketch"].count(), column["count"])
+                if column["counts"] is not None and len(column["counts"]):
+                    counts = column["counts"].nlargest(self.top_k)
+                    if counts.iloc[0] > 1:
+                        result["top"] = list(zip(counts.index.tolist(), counts.astype(int).tolist()))
+            profile.append(result)
+        return profile
@@ -0,0 +1,89 @@
+"""Token budgeted prompts for the Arctic model.
+
+Prompts are packed with complete lines (rows of the file or entries of the
+column profile) until the token budget of their section is reached. Tokens
+are counted locally with the Arctic tokenizer from ``transformers``, loaded
+once per process. When the tokenizer can't be loaded, tokens are estimated
+from the number of characters.
+"""
+import functools
+import logging
+
+import numpy as np
+
+TOKENIZER_NAME = "Snowflake/snowflake-arctic-instruct"
+CHARS_PER_TOKEN = 4
+SECTION_BUDGETS = {
+    "analysis": 1024,
+    "security": 512,
+    "visualization": 512,
+}
+
+logger = logging.getLogger(__name__)
+
+
+@functools.lru_cache(maxsize=1)
+def get_tokenizer(name=TOKENIZER_NAME):
+    """
+    Tokenizer of the model, loaded once per process
+        :return: Tokenizer, None when it can't be loaded
+    """
+    try:
+        # Imported here, transformers takes seconds to import
+        from transformers import AutoTokenizer
+    except ImportError:
+        return None
+    try:
+        return AutoTokenizer.from_pretrained(name)
+    except Exception as e:
+        logger.warning("Tokenizer %s not available, estimating tokens from characters: %s", name, e)
+        return None
+
+
+def count_tokens(texts):
+    """
+    Number of tokens of every text
+        :param texts: Texts to count
+        :type texts: list
+        :rtype: numpy.ndarray
+    """
+    if not texts:
+        return np.zeros(0, dtype=np.int64)
+    tokenizer = get_tokenizer()
+    if tokenizer is None:
+        return np.array([len(text) // CHARS_PER_TOKEN + 1 for text in texts], dtype=np.int64)
+    # One batched call to the fast tokenizer
+    encoded = tokenizer(list(texts), add_special_tokens=False)["input_ids"]
+    return np.array([len(ids) for ids in encoded], dtype=np.int64)
+
+
+def complete_lines(text, max_chars):
+    """
+    Lines of a text preview, without the last one when the preview was cut
+        :param text: Preview of at most ``max_chars`` characters
+        :type text: str
+        :rtype: list
+    """
+    lines = text.splitlines()
+    if len(text) >= max_chars and len(lines) > 1:
+        lines = lines[:-1]
+    return lines
+
+
+def build_prompt(instruction, lines, budget):
+    """
+    Pack as many complete lines as possible after an instruction
+        :param instruction: Start of the prompt, always kept
+        :type instruction: str
+        :param lines: Rows or profile entries, in order of priority
+        :type lines: list
+        :param budget: Maximum number of tokens of the prompt
+        :type budget: int
+        :return: Prompt and its number of tokens
+        :rtype: tuple
+    """
+    counts = count_tokens([instruction] + [line + "\n" for line in lines])
+    totals = np.cumsum(counts)
+    n_lines = int(np.searchsorted(totals[1:], budget, side="right"))
+    prompt = instruction + "".join(line + "\n" for line in lines[:n_lines])
+    return prompt, int(totals[n_lines])
@@ -0,0 +1,53 @@
+"""PDF reports of the file analyses.
+
+Reports are rendered in memory, so concurrent sessions never share a
+temporary file on disk.
+"""
+from datetime import datetime
+from io import BytesIO
+
+from markdown_pdf import MarkdownPdf, Section
+
+import metrics
+
+
+@metrics.timed("pdf_render_seconds")
+def generate_pdf(file_name, text_md):
+    """Generate a PDF file from the text
+
+    Parameters
+    ----------
+    file_name : str
+        Name of the analysed file, shown in the subtitle
+    text_md : str
+        Text to be converted to PDF
+
+    Returns
+    -------
+    bytes
+        Content of the PDF file
+    """
+    # Create a new MarkdownPdf object
+    pdf = MarkdownPdf(toc_level=2)
+    
+    # Get the current date and time
+    now = datetime.now()
+    actual_date = now.strftime("%Y-%m-%d - %H:%M:%S")
+    
+    # PDF Titles
+    title = f'<div style="text-align: right"> {actual_date} </div><br>'
+    subtitle = f'<div style="font-style: italic"> {file_name} </div>\n\n'
+    
+    text_md_compose = title + subtitle
+    text_md_compose += '__________\n\n'
+    text_md_compose += text_md
+    # Create a new section
+    pdf.add_section(Section(text_md_compose, toc=False))
+    
+    # Set the title of the PDF, on a copy of the metadata shared by the class
+    pdf.meta = dict(pdf.meta, title=f"Analysis of {file_name}")
+    # Save the PDF file in memory
+    pdf_file = BytesIO()
+    pdf.save(pdf_file)
+            
+    return pdf_file.getvalue()
@@ -0,0 +1,104 @@
+"""Representative row samples for the LLM prompt.
+
+The first rows of a sorted or time-ordered file are a poor picture of the
+whole file. Samples are drawn uniformly (reservoir sampling for data read
+in chunks) or stratified over a key column, and are deterministic for a
+given seed so prompts stay cacheable.
+
+Rows are returned in priority order: any prefix of a sample is itself a
+uniform or stratified sample, so a prompt packer can cut it anywhere.
+"""
+import numpy as np
+import pandas as pd
+
+from dataprep.profile import hashable_values, is_nested
+
+SAMPLE_ROWS = 200
+SAMPLE_SEED = 0
+MAX_STRATA = 50
+
+
+def reservoir_sample(chunks, k=SAMPLE_ROWS, seed=SAMPLE_SEED):
+    """
+    Uniform sample of rows read in chunks, keeping at most ``k`` rows in memory
+        :param chunks: Iterable of DataFrames with the same columns
+        :param k: Number of rows to keep
+        :type k: int
+        :param seed: Seed of the random generator
+        :type seed: int
+        :rtype: pandas.DataFrame
+    """
+    rng = np.random.default_rng(seed)
+    reservoir = None
+    reservoir_keys = np.empty(0)
+    for chunk in chunks:
+        # The k rows with the smallest random keys are a uniform sample
+        keys = np.concatenate([reservoir_keys, rng.random(len(chunk))])
+        candidates = chunk if reservoir is None else pd.concat([reservoir, chunk], ignore_index=True)
+        keep = np.argsort(keys, kind="stable")[:k]
+        reservoir = candidates.iloc[keep].reset_index(drop=True)
+        reservoir_keys = keys[keep]
+    if reservoir is None:
+        return pd.DataFrame()
+    return reservoir
+
+
+def detect_strata_column(df, max_strata=MAX_STRATA):
+    """
+    Column to stratify a sample on: the non-numeric column with the most
+    distinct values, between 2 and ``max_strata``. Columns of nested values
+    can't be stratified on.
+        :return: Column name, None when there is no candidate
+    """
+    best, best_count = None, 1
+    for name in df.columns:
+        series = df[name]
+        if pd.api.types.is_float_dtype(series.dtype):
+            continue
+        is_text = not pd.api.types.is_numeric_dtype(series.dtype) or pd.api.types.is_bool_dtype(series.dtype)
+        if not is_text or is_nested(series):
+            continue
+        count = series.nunique()
+        if best_count < count <= max_strata:
+            best, best_count = name, count
+    return best
+
+
+def sample_rows(df, k=SAMPLE_ROWS, strata=None, seed=SAMPLE_SEED):
+    """
+    Sample of the rows of a DataFrame
+        :param df: Data to sample
+        :type df: pandas.DataFrame
+        :param k: Number of rows of the sample
+        :type k: int
+        :param strata: Column to stratify on, None for a uniform sample
+        :param seed: Seed of the random generator
+        :type seed: int
+        :return: Sampled rows in priority order
+        :rtype: pandas.DataFrame
+    """
+    n = len(df)
+    rng = np.random.default_rng(seed)
+    keys = rng.random(n)
+
+    if strata is None:
+        positions = np.argsort(keys, kind="stable")[:k]
+        return df.iloc[positions]
+
+    # Nested values are grouped by their JSON text
+    codes, uniques = pd.factorize(hashable_values(df[strata]), use_na_sentinel=False)
+    # Rank of every row inside its stratum, in random order
+    order = np.lexsort((keys, codes))
+    sizes = np.bincount(codes, minlength=len(uniques))
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    rank = np.empty(n, dtype=np.int64)
+    rank[order] = np.arange(n) - np.repeat(starts, sizes)
+
+    # Proportional allocation with at least one row per stratum
+    quota = np.maximum(1, np.round(k * sizes / max(n, 1))).astype(np.int64)
+    selected = np.flatnonzero(rank < quota[codes])
+
+    # Round-robin over strata: the first rows of every stratum come first
+    priority = np.lexsort((keys[selected], rank[selected]))
+    positions = selected[priority][:k]
+    return df.iloc[positions]
@@ -0,0 +1,7 @@
+from llmclient.client import MODEL, get_client, generate_llm_data, input_key, LLMStream, merge_streams
+from llmclient.cache import ResponseCache, get_response_cache
+from llmclient.polling import DEADLINE, wait_prediction, cancel_prediction, prediction_stats
+from llmclient.singleflight import Flight, join_flight, flight_stats
+from llmclient.scheduler import INTERACTIVE, BATCH, Scheduler, get_scheduler
+from llmclient.fake import FakeReplicate, get_fake_backend
+from llmclient.webhook import WebhookReceiver, get_webhook_receiver, webhook_stats
@@ -0,0 +1,168 @@
+"""Persistent cache of the LLM responses.
+
+Responses are keyed by the model and the canonical input (see
+``input_key``) and stored in a local SQLite file, so every worker process
+of the server shares them and they survive restarts and redeploys. Only
+successful responses are stored. A failure removes the entry of its own
+input and nothing else. Entries have a time to live, and the least recently
+used ones are evicted once the file exceeds its size limit.
+"""
+import os
+import sqlite3
+import threading
+import time
+
+import metrics
+
+CACHE_PATH = os.environ.get("DATA_INSIGHT_LLM_CACHE", os.path.join(".cache", "llm_responses.sqlite3"))
+CACHE_MAX_BYTES = 50 * 2**20
+CACHE_TTL = 7 * 24 * 3600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    text TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    expires REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed);
+"""
+
+
+class ResponseCache:
+    """
+    Size-bounded LRU cache of LLM responses in a SQLite file
+    """
+    def __init__(self, path=CACHE_PATH, max_bytes=CACHE_MAX_BYTES, ttl=CACHE_TTL):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connection() as connection:
+            connection.executescript(_SCHEMA)
+
+    def _connection(self):
+        # One connection per thread, SQLite connections can't be shared
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            # Readers of other processes don't block the writer
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+        return connection
+
+    def _count(self, hit):
+        metrics.inc("cache_requests_total", cache="llm", result="hit" if hit else "miss")
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key, count=True):
+        """
+        Cached response of a key
+            :param key: Result of ``input_key``
+            :type key: str
+            :param count: Count the lookup in the hits and misses, False for
+                a check of a request already counted
+            :type count: bool
+            :return: Stored text, None when missing or expired
+            :rtype: str
+        """
+        now = time.time()
+        with self._connection() as connection:
+            row = connection.execute(
+                "SELECT text, expires FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and row[1] < now:
+                connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                row = None
+            if row is not None:
+                connection.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+        if count:
+            self._count(row is not None)
+        return None if row is None else row[0]
+
+    def set(self, key, text, model, ttl=None):
+        """
+        Store a successful response
+            :param key: Result of ``input_key``
+            :type key: str
+            :param text: Generated text
+            :type text: str
+            :param model: Model that generated it
+            :type model: str
+            :param ttl: Seconds to keep it, the cache TTL by default
+            :type ttl: float
+        """
+        now = time.time()
+        ttl = self.ttl if ttl is None else ttl
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO responses (key, model, text, size, expires, accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, text, len(text.encode("utf-8")), now + ttl, now)
+            )
+        self.evict()
+
+    def invalidate(self, key):
+        """
+        Remove the response of a single key, e.g. after its prediction failed
+            :param key: Result of ``input_key``
+            :type key: str
+        """
+        with self._connection() as connection:
+            connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+    def clear(self):
+        """Remove every response"""
+        with self._connection() as connection:
+            connection.execute("DELETE FROM responses")
+
+    def evict(self):
+        """Remove expired entries, then the least recently used ones above the size limit"""
+        with self._connection() as connection:
+            connection.execute("DELETE FROM responses WHERE expires < ?", (time.time(),))
+            connection.execute(
+                "DELETE FROM responses WHERE key IN ("
+                " SELECT key FROM (SELECT key, SUM(size) OVER (ORDER BY accessed DESC) AS total"
+                " FROM responses) WHERE total > ?)",
+                (self.max_bytes,)
+            )
+
+    def stats(self):
+        """
+        Hits and misses of the process, entries and bytes of the file
+            :rtype: dict
+        """
+        with self._connection() as connection:
+            entries, size = connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": size}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """
+    Response cache of the process, opened on first use
+        :rtype: ResponseCache
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+        return _cache
@@ -0,0 +1,591 @@
+"""Replicate client shared by every page of the app.
+
+Each API token gets its own client, created once per process and reused
+by every session with that token. Its HTTP connections are pooled and
+kept alive, so requests don't pay a new TLS handshake, and the token is
+never written to the process-wide ``REPLICATE_API_TOKEN`` variable.
+With ``DATA_INSIGHT_LLM_BACKEND=fake`` the clients use the offline backend
+of ``llmclient.fake`` instead of the Replicate API.
+
+Predictions can be streamed with ``LLMStream``, which yields the tokens as
+the model generates them. Successful responses are stored in the response
+cache and replayed for the same model and input, and identical requests
+in flight at the same time share a single prediction (see ``singleflight``).
+Predictions wait for their turn in the scheduler before being sent.
+With ``DATA_INSIGHT_LLM_COMPLETION=webhook`` they are completed by webhook
+(see ``webhook``) instead of being streamed or polled by a thread each,
+provided Replicate can reach the receiver and sign its requests.
+"""
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from contextlib import ExitStack
+from functools import partial
+
+
+import httpx
+import replicate
+from replicate.stream import ServerSentEvent
+
+import metrics
+from llmclient.cache import get_response_cache
+from llmclient.fake import get_fake_backend
+from llmclient.polling import DEADLINE, POLL_INTERVAL, wait_prediction, cancel_prediction, record_completion
+from llmclient.scheduler import INTERACTIVE, current_session, get_scheduler
+from llmclient.singleflight import join_flight, process_lock
+from llmclient.webhook import WEBHOOK_SECRET, WEBHOOK_URL, get_webhook_receiver
+
+MODEL = "snowflake/snowflake-arctic-instruct"
+MAX_CONNECTIONS = 10
+MAX_KEEPALIVE_CONNECTIONS = 5
+KEEPALIVE_EXPIRY = 60
+MAX_CLIENTS = 64
+BACKEND = os.environ.get("DATA_INSIGHT_LLM_BACKEND", "replicate")
+# "stream" (or polling outside of LLMStream) or "webhook"
+COMPLETION = os.environ.get("DATA_INSIGHT_LLM_COMPLETION", "stream")
+
+_clients = OrderedDict()
+_clients_lock = threading.Lock()
+logger = logging.getLogger(__name__)
+
+
+def get_client(api_token=None):
+    """
+    Replicate client of an API token, shared by every session using it
+        :param api_token: Replicate API token, None to use the REPLICATE_API_TOKEN
+            environment variable (e.g. from the Streamlit secrets)
+        :type api_token: str
+        :rtype: replicate.Client
+    """
+    with _clients_lock:
+        client = _clients.get(api_token)
+        if client is None:
+            if BACKEND == "fake":
+                transport = get_fake_backend()
+            else:
+                transport = httpx.HTTPTransport(limits=httpx.Limits(
+                    max_connections=MAX_CONNECTIONS,
+                    max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=KEEPALIVE_EXPIRY
+                ))
+            client = replicate.Client(api_token=api_token, transport=transport)
+            _clients[api_token] = client
+            if len(_clients) > MAX_CLIENTS:
+                _clients.popitem(last=False)
+        else:
+            _clients.move_to_end(api_token)
+        return client
+
+
+def input_key(input, model=MODEL):
+    """
+    Key of a model and input, the same for any order of the input keys
+        :param input: Input to LLM
+        :type input: dict
+        :rtype: str
+    """
+    canonical = json.dumps([model, input], sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(canonical.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def use_webhooks():
+    """
+    Whether predictions are completed by webhook. With the Replicate API it
+    takes a public URL of the receiver, the default one only listens
+    locally, and a signing secret; without them they are polled or streamed.
+        :rtype: bool
+    """
+    return COMPLETION == "webhook" and (BACKEND == "fake" or bool(WEBHOOK_URL and WEBHOOK_SECRET))
+
+
+if COMPLETION == "webhook" and not use_webhooks():
+    logger.warning("DATA_INSIGHT_LLM_COMPLETION=webhook needs DATA_INSIGHT_WEBHOOK_URL and "
+                   "DATA_INSIGHT_WEBHOOK_SECRET, predictions are polled or streamed instead")
+
+
+def start_flight(target, *args):
+    """
+    Starter of flights driven by ``target(flight, *args)`` in their own thread
+        :rtype: callable
+    """
+    def start(flight):
+        threading.Thread(target=target, args=(flight, *args), name=f"llm-{flight.key[:8]}", daemon=True).start()
+    return start
+
+
+def record_prediction(mode, status, elapsed, chunks, prediction_metrics):
+    """
+    Record the latency and token counts of a finished prediction
+        :param mode: "stream", "poll" or "webhook"
+        :type mode: str
+        :param status: Final status of the prediction
+        :type status: str
+        :param elapsed: Seconds from its creation to its end
+        :type elapsed: float
+        :param chunks: Number of output chunks received
+        :type chunks: int
+        :param prediction_metrics: Metrics of the prediction given by the backend
+        :type prediction_metrics: dict
+    """
+    metrics.observe("llm_prediction_seconds", elapsed, mode=mode, status=status)
+    if not metrics.ENABLED or status != "succeeded":
+        return
+    counts = prediction_metrics or {}
+    if "input_token_count" in counts:
+        metrics.inc("llm_tokens_total", counts["input_token_count"], kind="prompt")
+    metrics.inc("llm_tokens_total", counts.get("output_token_count", chunks), kind="completion")
+
+
+def poll_prediction(flight, input, api_token, deadline, session, priority):
+    """
+    Drive a flight by polling its prediction, the whole text is published at the end
+        :param flight: Flight of the input
+        :type flight: Flight
+        :param input: Input to LLM
+        :type input: dict
+        :param api_token: Replicate API token of the session
+        :type api_token: str
+        :param deadline: Seconds after which the prediction is canceled
+        :type deadline: float
+        :param session: Session of the first caller
+        :type session: str
+        :param priority: Priority of the prediction in the scheduler
+        :type priority: int
+    """
+    status = "failed"
+    prediction = None
+    response_cache = get_response_cache()
+    try:
+        with process_lock(flight.key):
+            # Another process may have generated it while this one waited, the
+            # request was already counted in the cache statistics by its caller
+            text = response_cache.get(flight.key, count=False)
+            if text is not None:
+                flight.cached = True
+                flight.publish(text)
+                status = "succeeded"
+                return
+            with get_scheduler().slot(api_token, session, priority, flight.canceled.is_set) as granted:
+                if not granted:
+                    status = "canceled"
+                    return
+                start = time.perf_counter()
+                prediction = get_client(api_token).models.predictions.create(
+                    MODEL,
+                    input=input
+                )
+                status = wait_prediction(prediction, deadline, flight.canceled.is_set)
+            record_prediction("poll", status, time.perf_counter() - start, len(prediction.output or []),
+                              getattr(prediction, "metrics", None))
+            if status == "succeeded":
+                text = "".join(prediction.output or [])
+                response_cache.set(flight.key, text, MODEL)
+                flight.publish(text)
+            else:
+                response_cache.invalidate(flight.key)
+    except Exception:
+        # e.g. a poll failed, don't leave the prediction running
+        status = "failed"
+        if prediction is not None:
+            cancel_prediction(prediction, "error")
+    finally:
+        flight.finish(status)
+
+
+def watch_prediction(prediction, flight, deadline, ended):
+    """
+    Cancel a streamed prediction once past its deadline or abandoned. The
+    stream blocks until its next event, so this runs in its own thread.
+        :param prediction: Prediction being streamed
+        :type prediction: replicate.prediction.Prediction
+        :param flight: Flight of the prediction
+        :type flight: Flight
+        :param deadline: Seconds after which the prediction is canceled
+        :type deadline: float
+        :param ended: Set once the stream is over
+        :type ended: threading.Event
+    """
+    start = time.monotonic()
+    while not ended.wait(POLL_INTERVAL):
+        if flight.canceled.is_set():
+            cancel_prediction(prediction, "abandoned")
+            return
+        if time.monotonic() - start >= deadline:
+            cancel_prediction(prediction, "deadline")
+            return
+
+
+def stream_prediction(flight, input, api_token, deadline, session, priority):
+    """
+    Drive a flight by streaming its prediction, the tokens are published as they arrive
+        :param flight: Flight of the input
+        :type flight: Flight
+        :param input: Input to LLM
+        :type input: dict
+        :param api_token: Replicate API token of the session
+        :type api_token: str
+        :param deadline: Seconds after which the prediction is canceled
+        :type deadline: float
+        :param session: Session of the first caller
+        :type session: str
+        :param priority: Priority of the prediction in the scheduler
+        :type priority: int
+    """
+    status = "failed"
+    prediction = None
+    response_cache = get_response_cache()
+    try:
+        with process_lock(flight.key):
+            # Another process may have generated it while this one waited, the
+            # request was already counted in the cache statistics by its caller
+            text = response_cache.get(flight.key, count=False)
+            if text is not None:
+                flight.cached = True
+                flight.publish(text)
+                status = "succeeded"
+                return
+            with get_scheduler().slot(api_token, session, priority, flight.canceled.is_set) as granted:
+                if not granted:
+                    status = "canceled"
+                    return
+                # The deadline doesn't count the time spent in the queue
+                start = time.perf_counter()
+                prediction = get_client(api_token).models.predictions.create(
+                    MODEL,
+                    input=input,
+                    stream=True
+                )
+                chunks = []
+                ended = threading.Event()
+                threading.Thread(target=watch_prediction, args=(prediction, flight, deadline, ended), daemon=True).start()
+                try:
+                    for event in prediction.stream():
+                        if event.event == ServerSentEvent.EventType.OUTPUT:
+                            if not chunks:
+                                metrics.observe("llm_first_token_seconds", time.perf_counter() - start)
+                            chunks.append(event.data)
+                            flight.publish(event.data)
+                        elif event.event == ServerSentEvent.EventType.DONE:
+                            # A canceled or failed prediction gives its reason
+                            reason = json.loads(event.data or "{}").get("reason")
+                            if not reason:
+                                status = "succeeded"
+                                record_completion(time.perf_counter() - start)
+                            elif reason == "canceled":
+                                status = "canceled"
+                            break
+                except RuntimeError:
+                    # Raised by the client on the error event of a failed prediction
+                    pass
+                finally:
+                    ended.set()
+            elapsed = time.perf_counter() - start
+            if metrics.ENABLED and status == "succeeded":
+                # The streamed prediction was created without its metrics
+                try:
+                    prediction.reload()
+                except Exception:
+                    pass
+            record_prediction("stream", status, elapsed, len(chunks), getattr(prediction, "metrics", None))
+            if status == "succeeded":
+                response_cache.set(flight.key, "".join(chunks), MODEL)
+            else:
+                response_cache.invalidate(flight.key)
+    except Exception:
+        # e.g. the stream timed out, don't leave the prediction running
+        status = "failed"
+        if prediction is not None:
+            cancel_prediction(prediction, "error")
+    finally:
+        flight.finish(status)
+
+
+def store_orphaned(payload):
+    """
+    Store the response of a prediction completed by webhook for another
+    process or before a restart, a rerun finds it in the cache
+        :param payload: Completed prediction
+        :type payload: dict
+    """
+    if payload["status"] == "succeeded" and payload.get("input") is not None:
+        get_response_cache().set(input_key(payload["input"]), "".join(payload.get("output") or []), MODEL)
+
+
+def complete_prediction(flight, stack, start, payload):
+    """
+    Finish a flight with the prediction posted to the webhook receiver
+        :param flight: Flight of the prediction
+        :type flight: Flight
+        :param stack: Process lock and scheduler slot held by the prediction
+        :type stack: contextlib.ExitStack
+        :param start: Creation time of the prediction, from ``time.perf_counter``
+        :type start: float
+        :param payload: Completed prediction
+        :type payload: dict
+    """
+    status = payload["status"]
+    try:
+        elapsed = time.perf_counter() - start
+        output = payload.get("output") or []
+        record_prediction("webhook", status, elapsed, len(output), payload.get("metrics"))
+        response_cache = get_response_cache()
+        if status == "succeeded":
+            record_completion(elapsed)
+            text = "".join(output)
+            response_cache.set(flight.key, text, MODEL)
+            flight.publish(text)
+        else:
+            response_cache.invalidate(flight.key)
+    finally:
+        stack.close()
+        flight.finish(status)
+
+
+def webhook_prediction(flight, input, api_token, deadline, session, priority, fallback=poll_prediction):
+    """
+    Drive a flight by webhook: the prediction is created and registered with
+    the webhook receiver, which publishes the whole text once it's posted.
+    Nothing waits for the prediction after its creation. When the receiver
+    can't be started, the flight is driven by ``fallback`` in this thread.
+        :param flight: Flight of the input
+        :type flight: Flight
+        :param input: Input to LLM
+        :type input: dict
+        :param api_token: Replicate API token of the session
+        :type api_token: str
+        :param deadline: Seconds after which the prediction is canceled
+        :type deadline: float
+        :param session: Session of the first caller
+        :type session: str
+        :param priority: Priority of the prediction in the scheduler
+        :type priority: int
+        :param fallback: ``poll_prediction`` or ``stream_prediction``
+        :type fallback: callable
+    """
+    status = "failed"
+    try:
+        try:
+            receiver = get_webhook_receiver(store_orphaned)
+        except OSError:
+            # e.g. the port is taken by another worker process
+            status = None
+            fallback(flight, input, api_token, deadline, session, priority)
+            return
+        response_cache = get_response_cache()
+        with ExitStack() as stack:
+            stack.enter_context(process_lock(flight.key))
+            # Another process may have generated it while this one waited, the
+            # request was already counted in the cache statistics by its caller
+            text = response_cache.get(flight.key, count=False)
+            if text is not None:
+                flight.cached = True
+                flight.publish(text)
+                status = "succeeded"
+                return
+            if not stack.enter_context(get_scheduler().slot(api_token, session, priority, flight.canceled.is_set)):
+                status = "canceled"
+                return
+            start = time.perf_counter()
+            prediction = get_client(api_token).models.predictions.create(
+                MODEL,
+                input=input,
+                webhook=receiver.url,
+                webhook_events_filter=["completed"]
+            )
+            # The lock and the slot are released by the receiver with the flight
+            receiver.register(prediction, flight, deadline,
+                              lambda payload, stack=stack.pop_all(): complete_prediction(flight, stack, start, payload))
+            status = None
+    except Exception:
+        # e.g. the creation request failed
+        pass
+    finally:
+        if status is not None:
+            flight.finish(status)
+
+
+def generate_llm_data(input, api_token=None, deadline=DEADLINE, abandoned=None, priority=INTERACTIVE, session=None):
+    """
+    Generate LLM data. Safe to call from any thread.
+        :param input: Input to LLM
+        :type input: dict
+        :param api_token: Replicate API token of the session
+        :type api_token: str
+        :param deadline: Seconds after which the prediction is canceled
+        :type deadline: float
+        :param abandoned: Called while waiting, True when the result is not
+            awaited anymore
+        :type abandoned: callable
+        :param priority: INTERACTIVE or BATCH
+        :type priority: int
+        :param session: Session of the caller, the current Streamlit session by default
+        :type session: str
+        :return: Status of LLM and data
+        :rtype: tuple
+    """
+    key = input_key(input)
+    text = get_response_cache().get(key)
+    if text is not None:
+        return "succeeded", [text]
+
+    if session is None:
+        session = current_session()
+    driver = webhook_prediction if use_webhooks() else poll_prediction
+    flight = join_flight(key, start_flight(driver, input, api_token, deadline, session, priority))
+    try:
+        prediction_data = list(flight.follow(abandoned))
+    finally:
+        flight.leave()
+    if flight.status == "succeeded":
+        return flight.status, prediction_data
+    return flight.status or "canceled", None
+
+
+class LLMStream:
+    """
+    Tokens of a prediction, yielded as the model generates them.
+
+    Iterate it once, e.g. with ``st.write_stream``. Afterwards ``status``
+    is "succeeded", "failed" or "canceled", ``text`` holds the whole output
+    and ``time_to_first_token`` and ``latency`` are in seconds. A cached
+    response is yielded at once without calling the model, and a stream
+    started while the same input is already being generated follows that
+    prediction from its first token.
+
+    The prediction is canceled once past its deadline, or once every stream
+    following it has been canceled with ``cancel`` or closed before its end,
+    as happens when Streamlit stops the script of a session that has gone.
+    """
+
+    def __init__(self, input, api_token=None, deadline=DEADLINE, priority=INTERACTIVE):
+        """
+        Stream of a prediction, created in the thread of the session asking for it
+            :param input: Input to LLM
+            :type input: dict
+            :param api_token: Replicate API token of the session
+            :type api_token: str
+            :param deadline: Seconds after which the prediction is canceled
+            :type deadline: float
+            :param priority: INTERACTIVE or BATCH
+            :type priority: int
+        """
+        self.input = input
+        self.api_token = api_token
+        self.deadline = deadline
+        self.priority = priority
+        self.session = current_session()
+        self.key = input_key(input)
+        self.status = None
+        self.text = ""
+        self.cached = False
+        self.time_to_first_token = None
+        self.latency = None
+        self._canceled = threading.Event()
+
+    def cancel(self):
+        """
+        Stop following the prediction, nobody waits for its result anymore
+        """
+        self._canceled.set()
+
+    def __iter__(self):
+        start = time.perf_counter()
+        text = get_response_cache().get(self.key)
+        if text is not None:
+            self.cached = True
+            self.text = text
+            self.status = "succeeded"
+            self.time_to_first_token = self.latency = time.perf_counter() - start
+            yield text
+            return
+
+        chunks = []
+        status = "canceled"
+        driver = partial(webhook_prediction, fallback=stream_prediction) if use_webhooks() else stream_prediction
+        flight = join_flight(self.key, start_flight(
+            driver, self.input, self.api_token, self.deadline, self.session, self.priority
+        ))
+        try:
+            for chunk in flight.follow(self._canceled.is_set):
+                if self.time_to_first_token is None:
+                    self.time_to_first_token = time.perf_counter() - start
+                chunks.append(chunk)
+                yield chunk
+            if flight.status is not None:
+                status = flight.status
+                self.cached = flight.cached
+        finally:
+            # Closed or canceled before the end, the prediction is canceled with its last follower
+            flight.leave()
+            self.text = "".join(chunks)
+            self.latency = time.perf_counter() - start
+            self.status = status
+
+    def waiting_message(self):
+        """
+        Message shown while waiting for the first token, with the queue
+        estimate when the API token has no free slot
+            :rtype: str
+        """
+        queue_status = get_scheduler().queue_status(self.api_token)
+        if not queue_status["estimated_wait"]:
+            return "LLM data generation..."
+        return (f"LLM data generation... {queue_status['queued']} requests waiting, "
+                f"about {queue_status['estimated_wait']:.0f}s in the queue.")
+
+    def timing(self):
+        """
+        Time to the first token and total latency, as shown under a section
+            :rtype: str
+        """
+        if self.cached:
+            return "Cached result."
+        if self.time_to_first_token is None:
+            return f"No tokens in {self.latency:.1f}s."
+        return f"First token in {self.time_to_first_token:.1f}s, generated in {self.latency:.1f}s."
+
+
+def merge_streams(streams):
+    """
+    Follow several streams at the same time, each in its own worker thread,
+    e.g. to show the sections of a page as their tokens arrive. Closing it
+    before the end cancels the streams still running.
+        :param streams: Stream of every name, created in the thread of the session
+        :type streams: dict
+        :return: Lists of every (name, chunk) pair received since the previous
+            list, with a None chunk once the stream of a name is over
+        :rtype: generator
+    """
+    updates = queue.Queue()
+
+    def follow(name, llm_stream):
+        try:
+            for chunk in llm_stream:
+                updates.put((name, chunk))
+        finally:
+            updates.put((name, None))
+
+    for name, llm_stream in streams.items():
+        threading.Thread(target=follow, args=(name, llm_stream), name=f"stream-{name}", daemon=True).start()
+    running = len(streams)
+    try:
+        while running:
+            # Every update already queued is passed at once
+            batch = [updates.get()]
+            while True:
+                try:
+                    batch.append(updates.get_nowait())
+                except queue.Empty:
+                    break
+            running -= sum(chunk is None for _, chunk in batch)
+            yield batch
+    finally:
+        # Stopped before the end (rerun or session gone), cancel what's still running
+        for llm_stream in streams.values():
+            if llm_stream.status is None:
+                llm_stream.cancel()
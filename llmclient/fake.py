@@ -0,0 +1,323 @@
+"""Offline stand-in for the Replicate prediction API.
+
+``FakeReplicate`` is an ``httpx`` transport answering the endpoints used by
+the app (create, get and cancel a prediction, and stream its output as
+server-sent events) without any network access. The Replicate clients use
+it when ``DATA_INSIGHT_LLM_BACKEND`` is ``fake``, configured from:
+
+- ``DATA_INSIGHT_FAKE_LATENCY``: latency distribution of a prediction, e.g.
+  ``fixed:2``, ``uniform:1,3``, ``exponential:2`` or ``lognormal:0.7,0.4``
+  (mean and sigma of the logarithm);
+- ``DATA_INSIGHT_FAKE_FAILURE_RATE``: share of predictions that fail;
+- ``DATA_INSIGHT_FAKE_TIMEOUT_RATE``: share of predictions that never end;
+- ``DATA_INSIGHT_FAKE_OUTPUTS``: JSON file of canned outputs keyed by prompt;
+- ``DATA_INSIGHT_FAKE_SEED``: seed of the random draws.
+
+Predictions created with a webhook are posted to it once completed, by a
+single sender thread, and signed with ``DATA_INSIGHT_WEBHOOK_SECRET``
+when it is set, as the Replicate API does.
+
+Any other stand-in listening over HTTP can be used with the
+``REPLICATE_BASE_URL`` variable of the Replicate client.
+"""
+import collections
+import datetime
+import heapq
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+
+import httpx
+
+from llmclient.webhook import sign
+
+BASE_URL = "https://api.replicate.com"
+DEFAULT_OUTPUT = "This is a generated answer from the offline Replicate backend."
+# Share of the latency before the first token of a streamed prediction
+FIRST_TOKEN_SHARE = 0.2
+
+_PREDICTION_PATH = re.compile(r"^/v1/predictions/(?P<id>[^/]+)(?P<cancel>/cancel)?$")
+_CREATE_PATH = re.compile(r"^/v1/models/(?P<owner>[^/]+)/(?P<name>[^/]+)/predictions$")
+_STREAM_PATH = re.compile(r"^/v1/streams/(?P<id>[^/]+)$")
+
+
+def latency_sampler(spec, rng):
+    """
+    Function drawing latencies from a distribution
+        :param spec: "fixed:2", "uniform:1,3", "exponential:2" or "lognormal:0.7,0.4"
+        :type spec: str
+        :param rng: Random generator
+        :type rng: random.Random
+        :rtype: callable
+    """
+    kind, _, params = spec.partition(":")
+    values = [float(value) for value in params.split(",") if value]
+    samplers = {
+        "fixed": lambda: values[0],
+        "uniform": lambda: rng.uniform(values[0], values[1]),
+        "exponential": lambda: rng.expovariate(1 / values[0]),
+        "lognormal": lambda: rng.lognormvariate(values[0], values[1]),
+    }
+    if kind not in samplers:
+        raise ValueError(f"Unknown latency distribution {spec!r}, expected one of {', '.join(samplers)}")
+    return samplers[kind]
+
+
+class _EventStream(httpx.SyncByteStream):
+    """Server-sent events of a prediction, written as its tokens are due"""
+    def __init__(self, backend, prediction):
+        self.backend = backend
+        self.prediction = prediction
+
+    def __iter__(self):
+        prediction = self.prediction
+        if prediction["outcome"] == "timeout":
+            # Nothing is generated, the stream stays open until it's canceled
+            self.backend.wait_until(prediction, None)
+            yield b'event: done\nid: done\ndata: {"reason": "canceled"}\n\n'
+            return
+        tokens = prediction["tokens"]
+        for i, token in enumerate(tokens):
+            # The first token comes after a share of the latency, the others evenly after it
+            due = prediction["latency"] * (FIRST_TOKEN_SHARE + (1 - FIRST_TOKEN_SHARE) * i / max(len(tokens), 1))
+            status = self.backend.wait_until(prediction, due)
+            if status == "canceled":
+                yield b'event: done\nid: done\ndata: {"reason": "canceled"}\n\n'
+                return
+            if prediction["outcome"] == "failed" and i >= len(tokens) // 2:
+                break
+            # Every line of a token is a data field, joined back by the reader
+            data = "".join(f"data: {line}\n" for line in token.split("\n"))
+            yield f"event: output\nid: {i}\n{data}\n".encode("utf-8")
+
+        status = self.backend.wait_until(prediction, prediction["latency"])
+        if status == "canceled":
+            yield b'event: done\nid: done\ndata: {"reason": "canceled"}\n\n'
+        elif status == "failed":
+            yield b"event: error\nid: error\ndata: Prediction failed\n\n"
+        else:
+            yield b"event: done\nid: done\ndata: {}\n\n"
+
+
+class FakeReplicate(httpx.BaseTransport):
+    """
+    Transport emulating the Replicate prediction API in memory
+    """
+    def __init__(self, latency="fixed:1", failure_rate=0.0, timeout_rate=0.0, outputs=None,
+                 default_output=DEFAULT_OUTPUT, seed=0, webhook_secret=None):
+        self.rng = random.Random(seed)
+        self.sample_latency = latency_sampler(latency, self.rng)
+        self.failure_rate = failure_rate
+        self.timeout_rate = timeout_rate
+        self.outputs = outputs or {}
+        self.default_output = default_output
+        self.calls = collections.Counter()
+        self.predictions = {}
+        self.webhook_secret = webhook_secret
+        self._webhooks = []
+        self._sender = None
+        self._condition = threading.Condition()
+
+    @classmethod
+    def from_env(cls):
+        """
+        Backend configured by the DATA_INSIGHT_FAKE_* environment variables
+            :rtype: FakeReplicate
+        """
+        outputs = None
+        path = os.environ.get("DATA_INSIGHT_FAKE_OUTPUTS")
+        if path:
+            with open(path, "r", encoding="utf-8") as f:
+                outputs = json.load(f)
+        return cls(
+            latency=os.environ.get("DATA_INSIGHT_FAKE_LATENCY", "fixed:1"),
+            failure_rate=float(os.environ.get("DATA_INSIGHT_FAKE_FAILURE_RATE", 0)),
+            timeout_rate=float(os.environ.get("DATA_INSIGHT_FAKE_TIMEOUT_RATE", 0)),
+            outputs=outputs,
+            seed=int(os.environ.get("DATA_INSIGHT_FAKE_SEED", 0)),
+            webhook_secret=os.environ.get("DATA_INSIGHT_WEBHOOK_SECRET"),
+        )
+
+    def reset(self):
+        """Forget the predictions and the call counts"""
+        with self._condition:
+            self.calls.clear()
+            self.predictions.clear()
+
+    def output_of(self, prompt):
+        """
+        Canned output of a prompt, the first one keyed by a substring of it
+            :param prompt: Prompt of the prediction
+            :type prompt: str
+            :rtype: str
+        """
+        if prompt in self.outputs:
+            return self.outputs[prompt]
+        for key, output in self.outputs.items():
+            if key in prompt:
+                return output
+        return self.default_output
+
+    def status_of(self, prediction):
+        """
+        Status of a prediction at the current time
+            :rtype: str
+        """
+        if prediction["canceled"]:
+            return "canceled"
+        if prediction["outcome"] == "timeout" or time.monotonic() - prediction["created"] < prediction["latency"]:
+            return "processing"
+        return prediction["outcome"]
+
+    def wait_until(self, prediction, due):
+        """
+        Wait until a time after the creation of a prediction, or its cancellation
+            :param due: Seconds after the creation, None to wait for the cancellation
+            :type due: float
+            :return: Status of the prediction afterwards
+            :rtype: str
+        """
+        with self._condition:
+            while not prediction["canceled"]:
+                remaining = None if due is None else prediction["created"] + due - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+        return self.status_of(prediction)
+
+    def _schedule_webhook(self, prediction, due):
+        # Called with the condition held
+        if not prediction["webhook"] or prediction["webhook_due"] is not None:
+            return
+        prediction["webhook_due"] = due
+        heapq.heappush(self._webhooks, (due, prediction["id"]))
+        if self._sender is None:
+            self._sender = threading.Thread(target=self._send_webhooks, name="fake-webhooks", daemon=True)
+            self._sender.start()
+        self._condition.notify_all()
+
+    def _send_webhooks(self):
+        http_client = httpx.Client(timeout=10)
+        while True:
+            with self._condition:
+                while not self._webhooks or self._webhooks[0][0] > time.monotonic():
+                    self._condition.wait(self._webhooks[0][0] - time.monotonic() if self._webhooks else None)
+                due, prediction_id = heapq.heappop(self._webhooks)
+                prediction = self.predictions.get(prediction_id)
+            # Rescheduled when canceled, only sent once
+            if prediction is not None and prediction["webhook_due"] == due:
+                self._post_webhook(http_client, prediction)
+
+    def _post_webhook(self, http_client, prediction):
+        body = json.dumps(self._json(prediction)).encode("utf-8")
+        headers = {"content-type": "application/json"}
+        if self.webhook_secret:
+            webhook_id, timestamp = f"msg_{uuid.uuid4().hex}", str(int(time.time()))
+            headers.update({"webhook-id": webhook_id, "webhook-timestamp": timestamp,
+                            "webhook-signature": sign(webhook_id, timestamp, body, self.webhook_secret)})
+        try:
+            http_client.post(prediction["webhook"], content=body, headers=headers).raise_for_status()
+            self.calls["webhook"] += 1
+        except httpx.HTTPError:
+            self.calls["webhook_failed"] += 1
+
+    def _json(self, prediction):
+        status = self.status_of(prediction)
+        return {
+            "id": prediction["id"],
+            "model": prediction["model"],
+            "version": "fake",
+            "status": status,
+            "input": prediction["input"],
+            "output": prediction["tokens"] if status == "succeeded" else None,
+            "logs": "",
+            "error": "Prediction failed" if status == "failed" else None,
+            "metrics": {
+                "predict_time": prediction["latency"],
+                "input_token_count": len(str(prediction["input"].get("prompt", "")).split()),
+                "output_token_count": len(prediction["tokens"]),
+            } if status == "succeeded" else None,
+            "created_at": prediction["created_at"],
+            "started_at": prediction["created_at"],
+            "completed_at": None,
+            "urls": {
+                "get": f"{BASE_URL}/v1/predictions/{prediction['id']}",
+                "cancel": f"{BASE_URL}/v1/predictions/{prediction['id']}/cancel",
+                "stream": f"{BASE_URL}/v1/streams/{prediction['id']}",
+            },
+        }
+
+    def _create(self, request, model):
+        body = json.loads(request.content or b"{}")
+        input = body.get("input", {})
+        draw = self.rng.random()
+        outcome = ("failed" if draw < self.failure_rate
+                   else "timeout" if draw < self.failure_rate + self.timeout_rate
+                   else "succeeded")
+        prediction = {
+            "id": uuid.uuid4().hex,
+            "model": model,
+            "input": input,
+            "tokens": re.findall(r"\S+\s*", self.output_of(str(input.get("prompt", "")))),
+            "latency": self.sample_latency(),
+            "outcome": outcome,
+            "canceled": False,
+            "webhook": body.get("webhook"),
+            "webhook_due": None,
+            "created": time.monotonic(),
+            "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        }
+        with self._condition:
+            self.predictions[prediction["id"]] = prediction
+            if outcome != "timeout":
+                self._schedule_webhook(prediction, prediction["created"] + prediction["latency"])
+        return httpx.Response(201, json=self._json(prediction))
+
+    def handle_request(self, request):
+        path = request.url.path
+        match = _CREATE_PATH.match(path)
+        if request.method == "POST" and match:
+            self.calls["create"] += 1
+            return self._create(request, f"{match['owner']}/{match['name']}")
+
+        match = _PREDICTION_PATH.match(path) or _STREAM_PATH.match(path)
+        prediction = self.predictions.get(match["id"]) if match else None
+        if prediction is None:
+            return httpx.Response(404, json={"detail": "Not found"})
+
+        if path.startswith("/v1/streams/"):
+            self.calls["stream"] += 1
+            return httpx.Response(200, headers={"content-type": "text/event-stream"},
+                                  stream=_EventStream(self, prediction))
+        if request.method == "POST" and match["cancel"]:
+            self.calls["cancel"] += 1
+            with self._condition:
+                if self.status_of(prediction) == "processing":
+                    prediction["canceled"] = True
+                    # The completed webhook comes at once with the canceled status
+                    prediction["webhook_due"] = None
+                    self._schedule_webhook(prediction, time.monotonic())
+                self._condition.notify_all()
+            return httpx.Response(200, json=self._json(prediction))
+        self.calls["get"] += 1
+        return httpx.Response(200, json=self._json(prediction))
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_fake_backend():
+    """
+    Offline backend of the process, configured from the environment on first use
+        :rtype: FakeReplicate
+    """
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = FakeReplicate.from_env()
+        return _backend
@@ -0,0 +1,128 @@
+"""Polling of predictions with exponential backoff and a deadline.
+
+The first poll comes a fraction of a second after the prediction is
+created and the wait doubles after every poll, up to a few seconds, so
+fast predictions return at once and slow ones don't flood the API. A
+prediction still running at its deadline, or that nobody waits for
+anymore, is canceled rather than left running and billing on the backend.
+
+The counters compare every prediction with the fixed polling this
+replaces (three polls, five seconds apart): the latency saved on the
+ones it would have caught, and the orphans avoided, i.e. the predictions
+it would have reported as failed while they kept running.
+"""
+import math
+import threading
+import time
+
+import metrics
+
+POLL_INTERVAL = 0.25
+POLL_BACKOFF = 2
+POLL_MAX_INTERVAL = 5
+DEADLINE = 120
+FINAL_STATUSES = frozenset({"succeeded", "failed", "canceled"})
+
+# Polling replaced by wait_prediction, only used by the counters
+FIXED_POLL_INTERVAL = 5
+FIXED_POLLS = 3
+
+_stats = {
+    "predictions": 0,
+    "polls": 0,
+    "latency_saved": 0.0,
+    "orphans_avoided": 0,
+    "canceled_deadline": 0,
+    "canceled_abandoned": 0,
+    "canceled_error": 0,
+}
+_stats_lock = threading.Lock()
+
+
+def count(name, value=1):
+    """
+    Add to a prediction counter
+        :param name: Name of the counter, see ``prediction_stats``
+        :type name: str
+    """
+    with _stats_lock:
+        _stats[name] += value
+
+
+def prediction_stats():
+    """
+    Counters of the predictions of the process
+        :return: Predictions, polls, seconds of latency saved, orphans avoided
+            and predictions canceled at their deadline, once abandoned or
+            after an error while waiting for them
+        :rtype: dict
+    """
+    with _stats_lock:
+        return dict(_stats)
+
+
+def record_completion(elapsed):
+    """
+    Compare a finished prediction with the fixed polling
+        :param elapsed: Seconds from the creation of the prediction to its end
+        :type elapsed: float
+    """
+    count("predictions")
+    fixed_limit = (FIXED_POLLS - 1) * FIXED_POLL_INTERVAL
+    if elapsed <= fixed_limit:
+        fixed = math.ceil(elapsed / FIXED_POLL_INTERVAL) * FIXED_POLL_INTERVAL
+        count("latency_saved", fixed - elapsed)
+    else:
+        count("orphans_avoided")
+
+
+def cancel_prediction(prediction, reason):
+    """
+    Cancel a running prediction
+        :param prediction: Prediction to cancel
+        :type prediction: replicate.prediction.Prediction
+        :param reason: "deadline", "abandoned" or "error"
+        :type reason: str
+    """
+    # The fixed polling never canceled, it left the prediction running
+    count("canceled_" + reason)
+    count("orphans_avoided")
+    try:
+        prediction.cancel()
+    except Exception:
+        # Canceling is best effort, the prediction may have just ended
+        pass
+
+
+def wait_prediction(prediction, deadline=DEADLINE, abandoned=None):
+    """
+    Poll a prediction until it's over, waiting longer between polls the
+    longer it runs
+        :param prediction: Prediction just created
+        :type prediction: replicate.prediction.Prediction
+        :param deadline: Seconds after which the prediction is canceled
+        :type deadline: float
+        :param abandoned: Called between polls, True when the result is not
+            awaited anymore (e.g. the session has gone away)
+        :type abandoned: callable
+        :return: Final status of the prediction
+        :rtype: str
+    """
+    start = time.monotonic()
+    interval = POLL_INTERVAL
+    while True:
+        time.sleep(interval)
+        prediction.reload()
+        count("polls")
+        metrics.inc("llm_polls_total")
+        elapsed = time.monotonic() - start
+        if prediction.status in FINAL_STATUSES:
+            record_completion(elapsed)
+            return prediction.status
+        if abandoned is not None and abandoned():
+            cancel_prediction(prediction, "abandoned")
+            return "canceled"
+        if elapsed >= deadline:
+            cancel_prediction(prediction, "deadline")
+            return "canceled"
+        interval = min(interval * POLL_BACKOFF, POLL_MAX_INTERVAL, max(deadline - elapsed, 0))
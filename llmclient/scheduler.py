@@ -0,0 +1,175 @@
+"""Process-wide scheduling of the predictions sent to the backend.
+
+Every API token may run a bounded number of predictions at once and start
+new ones at a bounded rate (a token bucket), so bursts of users queue here
+rather than hitting the backend rate limits. Waiting predictions are served
+by priority, interactive requests before batch jobs, then fairly across
+sessions: a session's n-th queued request goes after every other session's
+(n-1)-th, however many it has queued.
+"""
+import heapq
+import itertools
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+import metrics
+
+MAX_CONCURRENT = 4
+RATE = 2.0
+BURST = 10
+INTERACTIVE = 0
+BATCH = 1
+# Initial estimate of a prediction's duration, refined as they finish
+DURATION_ESTIMATE = 10.0
+
+
+def current_session():
+    """
+    Id of the Streamlit session running the calling thread
+        :return: Session id, None outside of a Streamlit script
+        :rtype: str
+    """
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+    except ImportError:
+        return None
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return None if ctx is None else ctx.session_id
+
+
+class _TokenQueue:
+    """Running predictions, waiting ones and rate limit of an API token"""
+    def __init__(self, burst):
+        self.running = 0
+        self.waiting = []
+        self.tokens = burst
+        self.refilled = time.monotonic()
+        self.virtual_time = 0
+        self.session_turns = {}
+
+
+class Scheduler:
+    """
+    Concurrency and rate limits per API token with a fair priority queue
+    """
+    def __init__(self, max_concurrent=MAX_CONCURRENT, rate=RATE, burst=BURST):
+        self.max_concurrent = max_concurrent
+        self.rate = rate
+        self.burst = burst
+        self.duration = DURATION_ESTIMATE
+        self.waits = 0
+        self.wait_time = 0.0
+        self._queues = {}
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+
+    def _refill(self, queue, now):
+        queue.tokens = min(self.burst, queue.tokens + (now - queue.refilled) * self.rate)
+        queue.refilled = now
+
+    @contextmanager
+    def slot(self, api_token, session=None, priority=INTERACTIVE, abandoned=None):
+        """
+        Wait for the turn of a prediction and hold its slot while it runs
+            :param api_token: Replicate API token of the prediction
+            :type api_token: str
+            :param session: Session asking for it, for fairness between sessions
+            :type session: str
+            :param priority: INTERACTIVE or BATCH
+            :type priority: int
+            :param abandoned: Called while waiting, True to leave the queue
+            :type abandoned: callable
+            :return: True once the prediction can be sent, False when abandoned
+        """
+        start = time.monotonic()
+        with self._condition:
+            queue = self._queues.setdefault(api_token, _TokenQueue(self.burst))
+            # Start-time fair queueing, each request of a session takes the next turn
+            turn = max(queue.virtual_time, queue.session_turns.get(session, 0)) + 1
+            queue.session_turns[session] = turn
+            entry = (priority, turn, next(self._sequence))
+            heapq.heappush(queue.waiting, entry)
+            granted = False
+            while True:
+                now = time.monotonic()
+                self._refill(queue, now)
+                if abandoned is not None and abandoned():
+                    break
+                if queue.waiting[0] == entry and queue.running < self.max_concurrent and queue.tokens >= 1:
+                    granted = True
+                    break
+                # Woken when a slot is freed, or once the bucket has a token again
+                timeout = None if queue.tokens >= 1 else (1 - queue.tokens) / self.rate
+                if abandoned is not None:
+                    timeout = 0.25 if timeout is None else min(timeout, 0.25)
+                self._condition.wait(timeout)
+
+            queue.waiting.remove(entry)
+            heapq.heapify(queue.waiting)
+            if granted:
+                queue.running += 1
+                queue.tokens -= 1
+                queue.virtual_time = turn
+                self.waits += 1
+                self.wait_time += now - start
+            self._condition.notify_all()
+        metrics.observe("llm_queue_seconds", time.monotonic() - start,
+                        priority="interactive" if priority == INTERACTIVE else "batch")
+
+        if not granted:
+            yield False
+            return
+        started = time.monotonic()
+        try:
+            yield True
+        finally:
+            with self._condition:
+                queue.running -= 1
+                # Exponentially weighted average of the time a slot is held
+                self.duration = 0.8 * self.duration + 0.2 * (time.monotonic() - started)
+                if not queue.running and not queue.waiting:
+                    del self._queues[api_token]
+                self._condition.notify_all()
+
+    def queue_status(self, api_token):
+        """
+        Load of an API token, as shown to the users before they send a request
+            :param api_token: Replicate API token
+            :type api_token: str
+            :return: Running and queued predictions, and estimated seconds
+                before a new one is sent
+            :rtype: dict
+        """
+        with self._condition:
+            queue = self._queues.get(api_token)
+            running = queue.running if queue else 0
+            queued = len(queue.waiting) if queue else 0
+            duration = self.duration
+        ahead = running + queued - self.max_concurrent + 1
+        estimated_wait = math.ceil(ahead / self.max_concurrent) * duration if ahead > 0 else 0.0
+        return {"running": running, "queued": queued, "estimated_wait": estimated_wait}
+
+    def stats(self):
+        """
+        Predictions running and queued on every token, and mean wait of the sent ones
+            :rtype: dict
+        """
+        with self._condition:
+            return {
+                "running": sum(queue.running for queue in self._queues.values()),
+                "queued": sum(len(queue.waiting) for queue in self._queues.values()),
+                "mean_wait": self.wait_time / self.waits if self.waits else 0.0,
+            }
+
+
+_scheduler = Scheduler()
+
+
+def get_scheduler():
+    """
+    Scheduler of the process
+        :rtype: Scheduler
+    """
+    return _scheduler
@@ -0,0 +1,175 @@
+"""Single-flight coalescing of identical LLM requests.
+
+Callers asking for the same model and input while a prediction is running
+join it instead of starting their own. Each prediction runs in a *flight*,
+driven by its own thread, and every caller follows the tokens it
+publishes, so a caller that joins late still gets the whole text. The
+prediction is only canceled once its last caller has left.
+
+Across the worker processes of the server, the thread driving a flight
+holds a lock file named after the key while the prediction runs. A second
+process blocks on the lock and then finds the response in the shared
+response cache. Lock files are only available where ``fcntl`` is, elsewhere
+flights are only shared within a process.
+"""
+import contextlib
+import itertools
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+LOCK_DIR = os.environ.get("DATA_INSIGHT_LLM_LOCKS", os.path.join(".cache", "llm_locks"))
+LOCK_MAX_AGE = 3600
+LOCK_CLEAN_EVERY = 256
+
+_flights = {}
+_flights_lock = threading.Lock()
+_stats = {"flights": 0, "coalesced": 0}
+_lock_counter = itertools.count(1)
+
+
+class Flight:
+    """
+    Prediction in progress, shared by every caller of the same input
+    """
+    def __init__(self, key):
+        self.key = key
+        self.chunks = []
+        self.status = None
+        self.cached = False
+        self.followers = 0
+        self.canceled = threading.Event()
+        self._condition = threading.Condition()
+
+    def publish(self, chunk):
+        """
+        Make a chunk of text available to every follower
+            :param chunk: Tokens generated
+            :type chunk: str
+        """
+        with self._condition:
+            self.chunks.append(chunk)
+            self._condition.notify_all()
+
+    def finish(self, status):
+        """
+        End the flight, new callers of the key start another one
+            :param status: Final status of the prediction
+            :type status: str
+        """
+        with _flights_lock:
+            if _flights.get(self.key) is self:
+                del _flights[self.key]
+        with self._condition:
+            self.status = status
+            self._condition.notify_all()
+
+    def follow(self, stop=None):
+        """
+        Chunks of text, from the first one, as they are published
+            :param stop: Called while waiting, True to stop following
+            :type stop: callable
+        """
+        position = 0
+        while True:
+            with self._condition:
+                while position == len(self.chunks) and self.status is None:
+                    if stop is not None and stop():
+                        return
+                    self._condition.wait(None if stop is None else 0.25)
+                chunks = self.chunks[position:]
+                position = len(self.chunks)
+                finished = self.status is not None
+            yield from chunks
+            if finished:
+                return
+
+    def leave(self):
+        """
+        Stop following the flight, its prediction is canceled when nobody follows it
+        """
+        with _flights_lock:
+            self.followers -= 1
+            abandoned = self.followers == 0 and self.status is None
+            if abandoned and _flights.get(self.key) is self:
+                # New callers must not join a flight being canceled
+                del _flights[self.key]
+        if abandoned:
+            self.canceled.set()
+
+
+def join_flight(key, start):
+    """
+    Follow the flight of a key, starting it when there is none
+        :param key: Result of ``input_key``
+        :type key: str
+        :param start: Called with a new flight to start driving it
+        :type start: callable
+        :rtype: Flight
+    """
+    with _flights_lock:
+        flight = _flights.get(key)
+        created = flight is None
+        if created:
+            flight = _flights[key] = Flight(key)
+            _stats["flights"] += 1
+        else:
+            _stats["coalesced"] += 1
+        flight.followers += 1
+    if created:
+        start(flight)
+    return flight
+
+
+def flight_stats():
+    """
+    Flights started by the process and callers that joined a running one
+        :rtype: dict
+    """
+    with _flights_lock:
+        return dict(_stats, running=len(_flights))
+
+
+@contextlib.contextmanager
+def process_lock(key, directory=LOCK_DIR):
+    """
+    Hold the lock file of a key, waiting while another process holds it
+        :param key: Result of ``input_key``
+        :type key: str
+        :param directory: Directory of the lock files
+        :type directory: str
+    """
+    if fcntl is None:
+        yield
+        return
+
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{key}.lock")
+    with open(path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            # The modification time tells the lock files still in use
+            os.utime(path)
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+    if next(_lock_counter) % LOCK_CLEAN_EVERY == 0:
+        clean_locks(directory)
+
+
+def clean_locks(directory=LOCK_DIR, max_age=LOCK_MAX_AGE):
+    """Remove the lock files unused for longer than any prediction runs"""
+    now = time.time()
+    with os.scandir(directory) as it:
+        for item in it:
+            try:
+                if item.name.endswith(".lock") and now - item.stat().st_mtime > max_age:
+                    os.remove(item.path)
+            except OSError:
+                pass
@@ -0,0 +1,272 @@
+"""Completion of the predictions by webhook instead of polling or streaming.
+
+With ``DATA_INSIGHT_LLM_COMPLETION=webhook`` the predictions are created
+with a webhook pointing at the small HTTP receiver of the process, and no
+thread waits for them: the prediction is registered here with the flight
+it drives, and the receiver finishes that flight when the backend posts
+the completed prediction. Callers still follow the flight, and a rerun of
+the script joins it or finds the response in the cache.
+
+A single watcher thread per process cancels the registered predictions
+past their deadline or abandoned by every caller, and looks up those whose
+webhook never came. A completed prediction the process doesn't know (sent
+before a restart, or to another worker process) is handed to ``orphaned``,
+which stores it in the shared response cache.
+
+The receiver listens on ``DATA_INSIGHT_WEBHOOK_PORT``. The backend must
+reach it at ``DATA_INSIGHT_WEBHOOK_URL`` (e.g. through a reverse proxy or
+a tunnel), and when ``DATA_INSIGHT_WEBHOOK_SECRET`` is set, only requests
+signed with it are accepted. Without a secret, anyone reaching the port
+could post made-up predictions: only those the process registered are
+completed, and no orphan is stored.
+"""
+import base64
+import hashlib
+import hmac
+import http.server
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from llmclient.polling import FINAL_STATUSES, POLL_INTERVAL, cancel_prediction
+
+WEBHOOK_HOST = os.environ.get("DATA_INSIGHT_WEBHOOK_HOST", "127.0.0.1")
+WEBHOOK_PORT = int(os.environ.get("DATA_INSIGHT_WEBHOOK_PORT", 8765))
+WEBHOOK_URL = os.environ.get("DATA_INSIGHT_WEBHOOK_URL")
+WEBHOOK_SECRET = os.environ.get("DATA_INSIGHT_WEBHOOK_SECRET")
+WEBHOOK_PATH = "/webhook"
+# Seconds after the deadline before the prediction of a missing webhook is looked up
+WEBHOOK_GRACE = 10
+# Oldest signed request accepted, in seconds
+SIGNATURE_TOLERANCE = 300
+# Webhooks of unknown predictions kept, in case they came before the registration
+MAX_EARLY = 256
+
+
+def sign(webhook_id, timestamp, body, secret):
+    """
+    Signature of a webhook request, as sent by Replicate
+        :param webhook_id: Value of the webhook-id header
+        :type webhook_id: str
+        :param timestamp: Value of the webhook-timestamp header
+        :type timestamp: str
+        :param body: Body of the request
+        :type body: bytes
+        :param secret: Signing secret, "whsec_" and its base64 key
+        :type secret: str
+        :return: Value of the webhook-signature header
+        :rtype: str
+    """
+    key = base64.b64decode(secret.split("_", 1)[-1])
+    content = f"{webhook_id}.{timestamp}.".encode("utf-8") + body
+    digest = hmac.new(key, content, hashlib.sha256).digest()
+    return "v1," + base64.b64encode(digest).decode("ascii")
+
+
+def verify_signature(headers, body, secret, tolerance=SIGNATURE_TOLERANCE):
+    """
+    Check that a webhook request was signed with the secret, recently
+        :param headers: Headers of the request
+        :param body: Body of the request
+        :type body: bytes
+        :param secret: Signing secret
+        :type secret: str
+        :rtype: bool
+    """
+    webhook_id = headers.get("webhook-id")
+    timestamp = headers.get("webhook-timestamp")
+    signatures = headers.get("webhook-signature", "").split()
+    if not webhook_id or not timestamp or not timestamp.isdigit():
+        return False
+    if abs(time.time() - int(timestamp)) > tolerance:
+        return False
+    expected = sign(webhook_id, timestamp, body, secret)
+    return any(hmac.compare_digest(expected, signature) for signature in signatures)
+
+
+class _Pending:
+    """Registered prediction waiting for its webhook"""
+    def __init__(self, prediction, flight, deadline, complete):
+        self.prediction = prediction
+        self.flight = flight
+        self.deadline = time.monotonic() + deadline
+        self.complete = complete
+        self.canceled = False
+
+
+class _WebhookHandler(http.server.BaseHTTPRequestHandler):
+    receiver = None
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        secret = self.receiver.secret
+        if self.path.split("?")[0] != WEBHOOK_PATH:
+            self.send_response(404)
+        elif secret and not verify_signature(self.headers, body, secret):
+            self.send_response(401)
+        else:
+            try:
+                self.receiver.deliver(json.loads(body))
+                self.send_response(200)
+            except (ValueError, KeyError):
+                self.send_response(400)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class WebhookReceiver:
+    """
+    Predictions waiting for their webhook, and the HTTP server receiving them
+    """
+    def __init__(self, host=WEBHOOK_HOST, port=WEBHOOK_PORT, url=WEBHOOK_URL, secret=WEBHOOK_SECRET,
+                 orphaned=None):
+        self.host = host
+        self.port = port
+        self.secret = secret
+        self.orphaned = orphaned
+        self._url = url
+        self._pending = {}
+        self._early = OrderedDict()
+        self._stats = {"received": 0, "orphaned": 0, "missed": 0}
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def url(self):
+        """
+        URL the backend posts the completed predictions to
+            :rtype: str
+        """
+        return self._url or f"http://{self.host}:{self.port}{WEBHOOK_PATH}"
+
+    def start(self):
+        """Start the HTTP server and the watcher, once"""
+        with self._lock:
+            if self._server is not None:
+                return
+            handler = type("WebhookHandler", (_WebhookHandler,), {"receiver": self})
+            self._server = http.server.ThreadingHTTPServer((self.host, self.port), handler)
+            # Port 0 picks a free port
+            self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, name="webhook-receiver", daemon=True).start()
+        threading.Thread(target=self._watch, name="webhook-watcher", daemon=True).start()
+
+    def register(self, prediction, flight, deadline, complete):
+        """
+        Wait for the webhook of a prediction, without a thread
+            :param prediction: Prediction created with the webhook URL
+            :type prediction: replicate.prediction.Prediction
+            :param flight: Flight driven by the prediction
+            :type flight: Flight
+            :param deadline: Seconds after which the prediction is canceled
+            :type deadline: float
+            :param complete: Called with the completed prediction as a dict
+            :type complete: callable
+        """
+        with self._lock:
+            payload = self._early.pop(prediction.id, None)
+            if payload is None:
+                self._pending[prediction.id] = _Pending(prediction, flight, deadline, complete)
+                return
+            self._stats["orphaned"] -= 1
+        # A fast prediction completed before the creation request returned
+        complete(payload)
+
+    def deliver(self, payload):
+        """
+        Complete the prediction of a webhook request
+            :param payload: Prediction posted by the backend
+            :type payload: dict
+        """
+        if payload["status"] not in FINAL_STATUSES:
+            return
+        with self._lock:
+            pending = self._pending.pop(payload["id"], None)
+            self._stats["received"] += 1
+            if pending is None:
+                self._stats["orphaned"] += 1
+                self._early[payload["id"]] = payload
+                if len(self._early) > MAX_EARLY:
+                    self._early.popitem(last=False)
+        if pending is not None:
+            pending.complete(payload)
+        elif self.orphaned is not None and self.secret:
+            # Only signed requests are trusted with the shared response cache
+            self.orphaned(payload)
+
+    def _watch(self):
+        while True:
+            time.sleep(POLL_INTERVAL)
+            now = time.monotonic()
+            with self._lock:
+                pending = list(self._pending.values())
+            for entry in pending:
+                if not entry.canceled and (entry.flight.canceled.is_set() or now >= entry.deadline):
+                    # Its webhook still comes, with the canceled status
+                    entry.canceled = True
+                    cancel_prediction(entry.prediction, "abandoned" if entry.flight.canceled.is_set() else "deadline")
+                elif now >= entry.deadline + WEBHOOK_GRACE:
+                    self._look_up(entry)
+
+    def _look_up(self, entry):
+        # The webhook was lost, the prediction is fetched once
+        with self._lock:
+            if self._pending.pop(entry.prediction.id, None) is None:
+                return
+            self._stats["missed"] += 1
+        try:
+            entry.prediction.reload()
+            payload = entry.prediction.dict()
+        except Exception:
+            payload = {"id": entry.prediction.id, "status": "failed", "output": None}
+        if payload["status"] not in FINAL_STATUSES:
+            payload["status"] = "failed"
+        entry.complete(payload)
+
+    def stats(self):
+        """
+        Predictions waiting for their webhook, webhooks received, of unknown
+        predictions and missing ones
+            :rtype: dict
+        """
+        with self._lock:
+            return dict(self._stats, pending=len(self._pending))
+
+
+_receiver = None
+_receiver_lock = threading.Lock()
+
+
+def get_webhook_receiver(orphaned=None):
+    """
+    Webhook receiver of the process, started on first use
+        :param orphaned: Called on first use with the completed predictions
+            the process doesn't know
+        :type orphaned: callable
+        :rtype: WebhookReceiver
+    """
+    global _receiver
+    with _receiver_lock:
+        if _receiver is None:
+            receiver = WebhookReceiver(orphaned=orphaned)
+            # Raises OSError when the port is taken, e.g. by another worker process
+            receiver.start()
+            _receiver = receiver
+        return _receiver
+
+
+def webhook_stats():
+    """
+    Counters of the webhook receiver, zero when it hasn't started
+        :rtype: dict
+    """
+    with _receiver_lock:
+        receiver = _receiver
+    if receiver is None:
+        return {"received": 0, "orphaned": 0, "missed": 0, "pending": 0}
+    return receiver.stats()
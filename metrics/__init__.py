@@ -0,0 +1 @@
+from metrics.registry import ENABLED, BUCKETS, inc, observe, timer, timed, snapshot, quantile, render, write
@@ -0,0 +1,229 @@
+"""Counters and latency histograms of the hot paths of the app.
+
+Metrics are off unless ``DATA_INSIGHT_METRICS`` is set to 1. When off,
+``timed`` returns the decorated function itself, ``timer`` a shared
+no-op context manager and ``inc``/``observe`` return at once, so the
+instrumented code runs as if it weren't.
+
+When on, the metrics of the process are exported in the Prometheus text
+format, to the file named by ``DATA_INSIGHT_METRICS_FILE`` (for a
+textfile collector) every few seconds, and on the HTTP port given by
+``DATA_INSIGHT_METRICS_PORT``.
+"""
+import bisect
+import contextlib
+import functools
+import http.server
+import os
+import threading
+import time
+
+ENABLED = os.environ.get("DATA_INSIGHT_METRICS", "0") == "1"
+METRICS_FILE = os.environ.get("DATA_INSIGHT_METRICS_FILE")
+METRICS_PORT = os.environ.get("DATA_INSIGHT_METRICS_PORT")
+EXPORT_INTERVAL = 5
+# Upper bounds of the latency buckets, in seconds
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+PREFIX = "data_insight_"
+
+_counters = {}
+_histograms = {}
+_lock = threading.Lock()
+_null_timer = contextlib.nullcontext()
+
+
+def _labels_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def inc(name, value=1, **labels):
+    """
+    Add to a counter
+        :param name: Name of the counter, e.g. "bytes_ingested_total"
+        :type name: str
+        :param value: Amount to add
+        :param labels: Labels of the series
+    """
+    if not ENABLED:
+        return
+    key = (name, _labels_key(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name, value, **labels):
+    """
+    Record a duration in a histogram
+        :param name: Name of the histogram, e.g. "read_data_seconds"
+        :type name: str
+        :param value: Duration in seconds
+        :type value: float
+        :param labels: Labels of the series
+    """
+    if not ENABLED:
+        return
+    key = (name, _labels_key(labels))
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = [[0] * (len(BUCKETS) + 1), 0.0]
+        histogram[0][bisect.bisect_left(BUCKETS, value)] += 1
+        histogram[1] += value
+
+
+@contextlib.contextmanager
+def _timer(name, labels):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def timer(name, **labels):
+    """
+    Context manager recording the duration of its block
+        :param name: Name of the histogram
+        :type name: str
+        :param labels: Labels of the series
+    """
+    if not ENABLED:
+        return _null_timer
+    return _timer(name, labels)
+
+
+def timed(name, **labels):
+    """
+    Decorator recording the duration of every call of a function
+        :param name: Name of the histogram
+        :type name: str
+        :param labels: Labels of the series
+    """
+    def decorator(function):
+        if not ENABLED:
+            return function
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with _timer(name, labels):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def snapshot():
+    """
+    Copy of every metric of the process
+        :return: Counters by (name, labels), and histograms by (name, labels)
+            as (bucket counts, sum) with a last bucket above the largest bound
+        :rtype: tuple
+    """
+    with _lock:
+        counters = dict(_counters)
+        histograms = {key: (list(counts), total) for key, (counts, total) in _histograms.items()}
+    return counters, histograms
+
+
+def quantile(counts, q):
+    """
+    Upper bound of the bucket holding a quantile of a histogram
+        :param counts: Bucket counts, see ``snapshot``
+        :type counts: list
+        :param q: Quantile between 0 and 1
+        :type q: float
+        :rtype: float
+    """
+    total = sum(counts)
+    if not total:
+        return 0.0
+    rank = q * total
+    cumulated = 0
+    for bound, count in zip(BUCKETS + (float("inf"),), counts):
+        cumulated += count
+        if cumulated >= rank:
+            return bound
+    return float("inf")
+
+
+def _format_labels(labels, **extra):
+    items = list(labels) + list(extra.items())
+    if not items:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in items) + "}"
+
+
+def render():
+    """
+    Every metric in the Prometheus text exposition format
+        :rtype: str
+    """
+    counters, histograms = snapshot()
+    lines = []
+    for name in sorted({name for name, _ in counters}):
+        lines.append(f"# TYPE {PREFIX}{name} counter")
+        for (key_name, labels), value in sorted(counters.items()):
+            if key_name == name:
+                lines.append(f"{PREFIX}{name}{_format_labels(labels)} {value}")
+    for name in sorted({name for name, _ in histograms}):
+        lines.append(f"# TYPE {PREFIX}{name} histogram")
+        for (key_name, labels), (counts, total) in sorted(histograms.items()):
+            if key_name != name:
+                continue
+            cumulated = 0
+            for bound, count in zip(BUCKETS + ("+Inf",), counts):
+                cumulated += count
+                lines.append(f"{PREFIX}{name}_bucket{_format_labels(labels, le=bound)} {cumulated}")
+            lines.append(f"{PREFIX}{name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{PREFIX}{name}_count{_format_labels(labels)} {cumulated}")
+    return "\n".join(lines) + "\n"
+
+
+def write(path):
+    """
+    Write every metric to a file, replaced atomically
+        :param path: Path of the file
+        :type path: str
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(render())
+    os.replace(tmp_path, path)
+
+
+class _MetricsHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _export_file(path):
+    while True:
+        time.sleep(EXPORT_INTERVAL)
+        try:
+            write(path)
+        except OSError:
+            pass
+
+
+def start_exporters():
+    """Start the file and HTTP exporters configured in the environment, once per process"""
+    if METRICS_FILE:
+        threading.Thread(target=_export_file, args=(METRICS_FILE,), name="metrics-file", daemon=True).start()
+    if METRICS_PORT:
+        try:
+            server = http.server.ThreadingHTTPServer(("", int(METRICS_PORT)), _MetricsHandler)
+        except OSError:
+            # Another worker process of the server already serves the port
+            return
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+
+
+if ENABLED:
+    start_exporters()
@@ -1,12 +1,19 @@
 import streamlit as st
 import pandas as pd
-import replicate
-from markdown_pdf import MarkdownPdf, Section
-from io import StringIO, BytesIO
+from dataprep import frame_preview, read_data, read_data_file, ParquetReader
+from dataprep import profile_frame, format_profile, AnalysisCache, generate_pdf
+from dataprep import read_json_lines, compact_frame, frame_memory
+from dataprep import scan_frame, scan_columns
+from dataprep import SECTIONS, analysis_key, section_key, section_inputs, report_markdown
+from dataprep import reservoir_sample, detect_strata_column, sample_rows, is_nested
+from llmclient import LLMStream, merge_streams
 import uuid
-from datetime import datetime
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
 import time
-import os
+import metrics
+
+page_start = time.perf_counter()
 
 # App title
 st.set_page_config(page_title="Hackathon - The Future of AI is Open",
@@ -17,7 +24,6 @@ st.set_page_config(page_title="Hackathon - The Future of AI is Open",
 
 if 'REPLICATE_API_TOKEN' in st.session_state:  
     api_token = st.session_state['REPLICATE_API_TOKEN']
-    os.environ["REPLICATE_API_TOKEN"] = st.session_state['REPLICATE_API_TOKEN']
 
 else:  
     api_token = "Enter the token"
@@ -30,93 +36,248 @@ with st.expander("About this section..."):
     st.markdown("* **CSV**: are commonly used for tabular data storage. They consist of rows and columns, where each row represents a record, and each column represents a field.")
     st.markdown("* **Apache Parquet**: is a columnar storage format optimized for analytics. It’s efficient for large datasets and supports nested structures.")
     st.markdown("* **JSON**: is a flexible format for representing structured data. It’s widely used for APIs, configuration files, and NoSQL databases.")
+    st.markdown("* **JSON Lines**: stores one JSON record per line. It’s the usual format of logs and event exports, and is read in chunks to handle large files.")
     st.markdown("**IMPORTANT: Avoid uploading files with confidential data or that may affect third parties.**")
 
 class SampleData:
     """
     Class to generate sample data
     """
+    files = {
+        "CSV": "data/country_codes.csv",
+        "Apache Parquet": "data/house_price.parquet",
+        "JSON": "data/sample_data.json",
+        "JSON Lines": "data/sample_data.jsonl"
+    }
+
     def __init__(self, type_file):
         self.type_file = type_file
         self.name = "sample-" + type_file
+        self.path = self.files[type_file]
 
     def load_sample_data(self):
         """
         Generate sample data
         """
-        if self.type_file == "CSV":
-            self.sample_data = pd.read_csv("data/country_codes.csv")
-        elif self.type_file == "Apache Parquet":
-            self.sample_data = pd.read_parquet("data/house_price.parquet")
-        elif self.type_file == "JSON":
-            self.sample_data = pd.read_json("data/sample_data.json")
-
+        self.sample_data = read_data_file(self.path, self.type_file)
         return self.sample_data
 
+    def getvalue(self):
+        """
+        Raw content of the sample data file, as for an uploaded file
+        """
+        with open(self.path, "rb") as f:
+            return f.read()
 
-def generate_pdf(file_name, text_md):
-    """Generate a PDF file from the text
 
-    Parameters
-    ----------
-    text_md : str
-        Text to be converted to PDF
+@st.cache_resource
+def get_pdf_executor():
     """
-    # Create a new MarkdownPdf object
-    pdf = MarkdownPdf(toc_level=2)
-    
-    # Get the current date and time
-    now = datetime.now()
-    actual_date = now.strftime("%Y-%m-%d - %H:%M:%S")
-    
-    # PDF Titles
-    title = f'<div style="text-align: right"> {actual_date} </div><br>'
-    subtitle = f'<div style="font-style: italic"> {file_name} </div>\n\n'
-    
-    text_md_compose = title + subtitle
-    text_md_compose += '__________\n\n'
-    text_md_compose += text_md
-    # Create a new section
-    pdf.add_section(Section(text_md_compose, toc=False))
-    
-    # Set the title of the PDF
-    pdf.meta["title"] = f"Analysis of {file_name}"
-    file_pdf = "data-analysis-temp.pdf"
-    # Save the PDF file
-    pdf.save(file_pdf)
-    
-    with open(file_pdf, "rb") as f:
-        pdf_data = f.read()
-            
-    return pdf_data
+    Worker threads rendering the PDF reports of every session
+        :rtype: ThreadPoolExecutor
+    """
+    return ThreadPoolExecutor(max_workers=2)
+
+@st.cache_data(max_entries=32)
+def render_pdf(file_name, text_md):
+    """
+    Render the PDF report off the script thread, unchanged reports are
+    served from the cache
+        :param file_name: Name of the analysed file
+        :type file_name: str
+        :param text_md: Text to be converted to PDF
+        :type text_md: str
+        :return: Content of the PDF file
+        :rtype: bytes
+    """
+    return get_pdf_executor().submit(generate_pdf, file_name, text_md).result()
+
+@st.cache_data
+def generate_profile(df):
+    """
+    Generate the column profile sent to the LLM
+        :param df: Data of the file
+        :type df: pandas.DataFrame
+        :return: Text profile of every column
+        :rtype: str
+    """
+    return format_profile(profile_frame(df), len(df))
+
+@st.cache_resource(max_entries=8)
+def get_parquet_reader(bytes_data):
+    """
+    Reader of a Parquet file shared by every rerun and session, its bytes
+    are read and counted once
+        :param bytes_data: Content of the Parquet file
+        :type bytes_data: bytes
+        :rtype: ParquetReader
+    """
+    return ParquetReader(bytes_data)
 
 @st.cache_data
-def generate_llm_data(input):
+def generate_parquet_profile(bytes_data):
     """
-    Generate LLM data
-        :param input: Input to LLM
-        :type input: str
-        :return: Status of LLM and data
+    Generate the column profile of a Parquet file, one column at a time
+        :param bytes_data: Content of the Parquet file
+        :type bytes_data: bytes
+        :return: Text profile of every column
+        :rtype: str
+    """
+    parquet_data = get_parquet_reader(bytes_data)
+    return format_profile(parquet_data.profile(), parquet_data.num_rows)
+
+@st.cache_data
+def load_json_lines(bytes_data):
+    """
+    Parse and profile a JSON Lines file one chunk at a time
+        :param bytes_data: Content of the JSON Lines file
+        :type bytes_data: bytes
+        :return: Compacted data and text profile
         :rtype: tuple
     """
-    try:
-        with st.spinner('LLM data generation...'):  
-            prediction = replicate.models.predictions.create(
-                "snowflake/snowflake-arctic-instruct",
-                input=input
-            )
-            for i in range(3):
-                prediction.reload()
-                if prediction.status in {"succeeded", "failed", "canceled"}:
-                    break
+    df, streaming_profile = read_json_lines(BytesIO(bytes_data))
+    data_profile = format_profile(streaming_profile.profile(), streaming_profile.n_rows)
+    return df, data_profile
+
+@st.cache_data
+def compact_data(df):
+    """
+    Compact the dtypes of the loaded data
+        :param df: Data of the file
+        :type df: pandas.DataFrame
+        :return: Compacted data, memory in bytes before and after
+        :rtype: tuple
+    """
+    compacted_df = compact_frame(df)
+    return compacted_df, frame_memory(df), frame_memory(compacted_df)
+
+@st.cache_data
+def scan_personal_data(df):
+    """
+    Scan every row of the data for personal data
+        :param df: Data of the file
+        :type df: pandas.DataFrame
+        :return: Hits and masked samples per column and detector
+        :rtype: pandas.DataFrame
+    """
+    return scan_frame(df)
+
+@st.cache_data
+def scan_parquet_personal_data(bytes_data):
+    """
+    Scan every row of a Parquet file for personal data, one column at a time
+        :param bytes_data: Content of the Parquet file
+        :type bytes_data: bytes
+        :return: Hits and masked samples per column and detector
+        :rtype: pandas.DataFrame
+    """
+    return scan_columns(get_parquet_reader(bytes_data).iter_columns())
+
+@st.cache_data
+def generate_sample_preview(df, strata=None, automatic=False):
+    """
+    Generate the text preview of a representative sample of the rows
+        :param df: Data of the file
+        :type df: pandas.DataFrame
+        :param strata: Column to stratify the sample on, None for a uniform sample
+        :type strata: str
+        :param automatic: Detect the column to stratify the sample on
+        :type automatic: bool
+        :return: Text preview of the sampled rows and the column used
+        :rtype: tuple
+    """
+    if automatic:
+        strata = detect_strata_column(df)
+    return frame_preview(sample_rows(df, strata=strata)), strata
+
+@st.cache_data
+def generate_parquet_sample_preview(bytes_data):
+    """
+    Generate the text preview of a uniform sample of the rows of a Parquet
+    file, read one row group at a time
+        :param bytes_data: Content of the Parquet file
+        :type bytes_data: bytes
+        :return: Text preview of the sampled rows
+        :rtype: str
+    """
+    return frame_preview(reservoir_sample(get_parquet_reader(bytes_data).iter_row_groups()))
+
+@st.cache_resource
+def get_analysis_cache():
+    """
+    Analysis cache shared by every session of the server
+        :rtype: AnalysisCache
+    """
+    return AnalysisCache()
+
+def generate_analysis(analysis_key, inputs, placeholders, prompt_tokens, strata=None):
+    """
+    Show every section of the file analysis, sending the prompts of the
+    sections that are not cached to the LLM at the same time and showing
+    their tokens as they arrive
+        :param analysis_key: Content key of the file
+        :type analysis_key: str
+        :param inputs: Input to LLM of every section, or the final text
+            of the sections answered without the LLM
+        :type inputs: dict
+        :param placeholders: Placeholder of every section
+        :type placeholders: dict
+        :param prompt_tokens: Number of tokens of the prompt of every section
+        :type prompt_tokens: dict
+        :param strata: Choice of the column the sample of rows is stratified
+            on, None for the automatic one
+        :type strata: str
+        :return: Generated text of every available section
+        :rtype: dict
+    """
+    analysis_cache = get_analysis_cache()
+    # Cached sections are stored under their key, see ``section_key``
+    keys = {section: section_key(section, strata) for section in SECTIONS}
+    entry = analysis_cache.get(analysis_key) or {}
+    analysis = {section: entry[key] for section, key in keys.items() if key in entry}
+
+    streams = {}
+    for section, input in inputs.items():
+        if isinstance(input, str):
+            placeholders[section].markdown(input)
+        elif section in analysis:
+            placeholders[section].markdown(analysis[section])
+        else:
+            streams[section] = LLMStream(input, api_token)
+            placeholders[section].info(streams[section].waiting_message())
+            # Record the size of every request sent to the LLM
+            st.session_state.llm_requests.append({
+                "section": section,
+                "prompt_tokens": prompt_tokens.get(section)
+            })
+
+    # Worker threads can't write to the page, the tokens are passed back
+    texts = dict.fromkeys(streams, "")
+    for updates in merge_streams(streams):
+        # Every token already received is shown with a single update per section
+        changed = set()
+        for section, chunk in updates:
+            if chunk is None:
+                changed.discard(section)
+                llm_stream = streams[section]
+                if llm_stream.status == "succeeded":
+                    with placeholders[section].container():
+                        st.markdown(llm_stream.text)
+                        st.caption(llm_stream.timing())
+                    # Reload the entry, another session may have stored other sections
+                    entry = analysis_cache.get(analysis_key) or entry
+                    entry[keys[section]] = analysis[section] = llm_stream.text
+                    analysis_cache.set(analysis_key, entry)
                 else:
-                    time.sleep(5)
-            prediction_status = prediction.status
-            prediction_data = prediction.output
-        
-        return prediction_status, prediction_data
-    except:
-        return False, False
+                    placeholders[section].error("LLM data generation failed. Try again later.")
+            else:
+                texts[section] += chunk
+                changed.add(section)
+        for section in changed:
+            placeholders[section].markdown(texts[section])
+
+    analysis.update((section, input) for section, input in inputs.items() if isinstance(input, str))
+    return analysis
 
 # Generate sidebar
 ####################################################
@@ -126,7 +287,6 @@ with st.sidebar:
     if token:
         api_token = token
         st.session_state['REPLICATE_API_TOKEN'] = token
-        os.environ["REPLICATE_API_TOKEN"] = token
     
     try:
         st.image('images/logo.jpg', use_column_width="always", caption="Hackathon - The Future of AI is Open")
@@ -134,25 +294,20 @@ with st.sidebar:
         st.error('Image logo.jpg not found', icon="🚨")
     
 
-# Store LLM-status
-if "status_llm" not in st.session_state.keys():
-    st.session_state.status_llm = {
-                        "data_file": None,
-                        "status_header": "not_started", 
-                        "status_not_header": "not_started", 
-                        "prediction_header_data": None,
-                        "prediction_no_header_data": None,
-                        "prediction_sec_data": None,
-                        "prediction_vis_data": None
-    }
+# Store the prompt size of the LLM requests
+if "llm_requests" not in st.session_state:
+    st.session_state.llm_requests = []
 
 option_format = st.selectbox(
    "Select an extension file:",
-   ("CSV", "Apache Parquet", "JSON")
+   ("CSV", "Apache Parquet", "JSON", "JSON Lines")
 )
 
-type_file = {"CSV": "csv", "Apache Parquet": "parquet", "JSON": ["js", "json"]}
+PARQUET_PAGE_SIZE = 1000
+
+type_file = {"CSV": "csv", "Apache Parquet": "parquet", "JSON": ["js", "json"], "JSON Lines": ["jsonl", "ndjson"]}
 sample_data = st.toggle("Use sample data file.")
+compact_dtypes = st.toggle("Compact the data types in memory.", value=True)
 
 if sample_data:
     uploaded_file = SampleData(option_format)
@@ -167,173 +322,136 @@ else:
 # Check if file is uploaded
 ############################################
 if uploaded_file is not None:        
-    prompt = f"Explains this {option_format} file and all its columns, indicates the potential uses of this data and which columns could cause problems:"
     header_data = True
+    # Read once, every step below shares the same bytes
+    bytes_data = uploaded_file.getvalue()
     
     if option_format == "CSV":       
                 
         if sample_data:
             df = uploaded_file.load_sample_data()
-            string_data = df.to_string(index=False)
             
         else:
-            # To read file as bytes:
-            bytes_data = uploaded_file.getvalue()
-            string_data=str(bytes_data,'utf-8')
-            data = StringIO(string_data)
-        
             if no_csv_header:
-                df = pd.read_csv(data, header=None)
-                prompt = f"Explains this {option_format} file. Indicates what the data can be used for and what might cause problems:"
+                df = read_data(bytes_data, option_format, header=False)
                 header_data = False
             else:
-                df = pd.read_csv(data)
+                df = read_data(bytes_data, option_format)
         
     elif option_format == "Apache Parquet":
         
         st.write("CSV files are commonly used for tabular data storage. They consist of rows and columns, where each row represents a record, and each column represents a field.")
 
-        if sample_data:
-            df = uploaded_file.load_sample_data()
-            string_data = df.to_string(index=False)
-        else:
-            bytes_data = uploaded_file.getvalue()
-            data = BytesIO(bytes_data)
-            df = pd.read_parquet(data)
-            string_data = df.to_string(index=False)
+        # Schema and statistics come from the file footer, rows are read by page
+        parquet_data = get_parquet_reader(bytes_data)
+
+        with st.expander("Schema and column statistics"):
+            st.dataframe(parquet_data.column_statistics(), hide_index=True)
+
+        n_pages = parquet_data.num_pages(PARQUET_PAGE_SIZE)
+        page = st.number_input(f"Page (of {n_pages})", min_value=1, max_value=n_pages, value=1)
+        st.caption(f"{parquet_data.num_rows} rows, {parquet_data.num_columns} columns")
+        df = parquet_data.page(page, PARQUET_PAGE_SIZE)
+        data_profile = generate_parquet_profile(bytes_data)
         
     elif option_format == "JSON":
         if sample_data:
             df = uploaded_file.load_sample_data()
-            string_data = df.to_string(index=False)
         else:
-            bytes_data = uploaded_file.getvalue()
-            string_data=str(bytes_data,'utf-8')
-            data = StringIO(string_data)
-            df = pd.read_json(data)
+            df = read_data(bytes_data, option_format)
+
+    elif option_format == "JSON Lines":
+        # The file is parsed and profiled in chunks of lines
+        df, data_profile = load_json_lines(bytes_data)
+
+    if compact_dtypes and option_format in ("CSV", "JSON"):
+        df, memory_before, memory_after = compact_data(df)
+        st.caption(f"Memory usage: {memory_before / 2**20:.2f}MB → {memory_after / 2**20:.2f}MB after data type compaction")
+    elif option_format == "JSON Lines":
+        # Compacted chunk by chunk while it was read, there is no uncompacted frame to measure
+        st.caption(f"Memory usage: {frame_memory(df) / 2**20:.2f}MB, data types compacted while reading")
+
+    if option_format in ("CSV", "JSON"):
+        data_profile = generate_profile(df)
         
     st.dataframe(df)
+
+    # Sample of rows spread over the whole file for the prompts
+    strata_option = None
+    if option_format == "Apache Parquet":
+        string_data = generate_parquet_sample_preview(bytes_data)
+    else:
+        # Columns of continuous or nested values can't be stratified on
+        strata_columns = [name for name in df.columns
+                          if not pd.api.types.is_float_dtype(df[name].dtype) and not is_nested(df[name])]
+        strata_options = ["Automatic", "None (uniform sample)"] + [str(name) for name in strata_columns]
+        strata_option = st.selectbox("Stratify the sample of rows sent to the LLM by:", strata_options)
+        if strata_option == "Automatic":
+            string_data, strata = generate_sample_preview(df, automatic=True)
+            st.caption(f"Sample stratified by {strata}" if strata is not None else "Uniform sample")
+        elif strata_option == "None (uniform sample)":
+            string_data, _ = generate_sample_preview(df)
+        else:
+            strata = strata_columns[strata_options.index(strata_option) - 2]
+            string_data, _ = generate_sample_preview(df, strata)
     
+    # Local scan of every row, only the flagged columns are sent to the LLM
+    if option_format == "Apache Parquet":
+        pii_findings = scan_parquet_personal_data(bytes_data)
+    else:
+        pii_findings = scan_personal_data(df)
+
+    inputs, sections_tokens = section_inputs(option_format, data_profile, pii_findings, string_data, header_data)
+    placeholders = {}
+
     st.divider()
     st.markdown(f"### {option_format} file data analysis")
-    input = {
-        "prompt": prompt + string_data[0:1000],
-        "temperature": 0.2
-    }
-    
-    if header_data:         # If CSV file contains header      
-        if st.session_state.status_llm["status_header"] == "not_started" or st.session_state.status_llm["data_file"] != uploaded_file.name:
-            # Generate LLM data
-            prediction_status, prediction_data = generate_llm_data(input)
-            
-            if prediction_status == "succeeded": 
-                st.session_state.status_llm["status_header"] = "done"
-                prediction_data_formatted = "".join(prediction_data)
-                st.markdown(prediction_data_formatted)
-                st.session_state.status_llm["prediction_header_data"] = prediction_data_formatted
-            else:
-                st.error("LLM data generation failed. Try again later.")
-                st.cache_data.clear()
-        else:
-            st.markdown(st.session_state.status_llm["prediction_header_data"])
-                
-    else:                   # If CSV file does not contain header
-        if st.session_state.status_llm["status_not_header"] == "not_started" or st.session_state.status_llm["data_file"] != uploaded_file.name:
-            # Generate LLM data
-            prediction_status, prediction_data = generate_llm_data(input)
-            
-            if prediction_status == "succeeded": 
-                st.session_state.status_llm["status_not_header"] = "done"
-                prediction_data_formatted = "".join(prediction_data)
-                st.markdown(prediction_data_formatted)
-                st.session_state.status_llm["prediction_no_header_data"] = prediction_data_formatted
-            else:
-                st.error("LLM data generation failed. Try again later.")   
-                st.cache_data.clear() 
-        else:
-            st.markdown(st.session_state.status_llm["prediction_no_header_data"]) 
-
+    st.caption(f"Prompt: {sections_tokens['analysis']} tokens")
+    placeholders["analysis"] = st.empty()
 
     st.divider()
     st.markdown("### Security issues")
-    prompt_sec = f"Look for any leaks of sensitive personal data. Discuss the security issues in this {option_format} file in Python. Select only the ones you think are relevant."
-    input_sec = {
-        "prompt": prompt_sec + string_data[0:500],
-        "temperature": 0.4
-    }
-    
-    # prediction_sec
-    if not st.session_state.status_llm["prediction_sec_data"] or st.session_state.status_llm["data_file"] != uploaded_file.name:
-        prediction_status, prediction_data = generate_llm_data(input_sec)
-
-        if prediction_status == "succeeded":
-            prediction_data_formatted = "".join(prediction_data)
-            st.session_state.status_llm["prediction_sec_data"] = prediction_data_formatted
-            st.markdown(prediction_data_formatted)
-        else:
-            st.error("LLM data generation failed. Try again later.")
-            st.cache_data.clear()
-    
-    else:
-        st.markdown(st.session_state.status_llm["prediction_sec_data"]) 
-    
+    if not pii_findings.empty:
+        st.markdown("Potential personal data found by a scan of every row:")
+        st.dataframe(pii_findings, hide_index=True)
+        st.caption(f"Prompt: {sections_tokens['security']} tokens")
+    placeholders["security"] = st.empty()
     
     st.divider()
     st.markdown("### Data visualization techniques")
-    prompt_vis = f"Discuss the pros and cons of different data visualization techniques for data analysis of this {option_format} file in Python. Select only the ones you think are relevant."
-    input_vis = {
-        "prompt": prompt_vis + string_data[0:500],
-        "temperature": 0.9
-    }
-    
-    # prediction_vis
-    if not st.session_state.status_llm["prediction_vis_data"] or st.session_state.status_llm["data_file"] != uploaded_file.name:
-        prediction_status, prediction_data = generate_llm_data(input_vis)
-
-        if prediction_status == "succeeded":
-            prediction_data_formatted = "".join(prediction_data)
-            st.session_state.status_llm["prediction_vis_data"] = prediction_data_formatted
-            st.markdown(prediction_data_formatted)
-        else:
-            st.error("LLM data generation failed. Try again later.")
-            st.cache_data.clear()
-    
-    else:
-        st.markdown(st.session_state.status_llm["prediction_vis_data"])
+    st.caption(f"Prompt: {sections_tokens['visualization']} tokens")
+    placeholders["visualization"] = st.empty()
 
     st.divider()
 
+    file_key = analysis_key(bytes_data, option_format, header_data, compact_dtypes)
+    # The automatic stratification is the one of the batch command line, they share its section
+    strata_choice = None if strata_option in (None, "Automatic") else strata_option
+    analysis = generate_analysis(file_key, inputs, placeholders, sections_tokens, strata_choice)
   
-    if not sample_data:
-        # Store CSV file name
-        st.session_state.status_llm["data_file"] = uploaded_file.name  
-  
+    if not sample_data and all(section in analysis for section in SECTIONS):
         # Join all generated results into a single element
-        all_generated_data = ""
-        all_generated_data += f"## {option_format} file data analysis\n"
-        
-        if header_data:
-            all_generated_data += st.session_state.status_llm["prediction_header_data"]
-        else:
-            all_generated_data += st.session_state.status_llm["prediction_no_header_data"]
-        
-        all_generated_data += "\n\n"
-        all_generated_data += "## Security issues\n"
-        all_generated_data += st.session_state.status_llm["prediction_sec_data"]
-        all_generated_data += "\n\n"
-        all_generated_data += "## Data visualization techniques\n"
-        all_generated_data += st.session_state.status_llm["prediction_vis_data"]
+        all_generated_data = report_markdown(option_format, analysis)
                 
-        pdf = generate_pdf(uploaded_file.name, all_generated_data)
-        id4 = uuid.uuid4()
-        file_pdf = f"data-analysis-{id4}.pdf"
+        # The PDF is only rendered once it has been requested for this file
+        if st.button("Generate the PDF report") or st.session_state.get("pdf_report") == file_key:
+            st.session_state.pdf_report = file_key
+            with st.spinner("Generating the PDF report..."):
+                pdf = render_pdf(uploaded_file.name, all_generated_data)
+            id4 = uuid.uuid4()
+            file_pdf = f"data-analysis-{id4}.pdf"
         
-        st.download_button(
-            label="Download the PDF report",
-            data=pdf,
-            file_name=file_pdf,
-            mime="application/pdf"
-        )
-    
-       
-        
\ No newline at end of file
+            st.download_button(
+                label="Download the PDF report",
+                data=pdf,
+                file_name=file_pdf,
+                mime="application/pdf"
+            )
+
+# Prompt size of the LLM requests of this session, filled in by this run too
+if st.session_state.llm_requests:
+    with st.sidebar.expander("LLM requests of this session"):
+        st.metric("Prompt tokens sent", sum(request["prompt_tokens"] or 0 for request in st.session_state.llm_requests))
+        st.dataframe(st.session_state.llm_requests, hide_index=True, use_container_width=True)
+
+metrics.observe("page_run_seconds", time.perf_counter() - page_start, page="analysing_data_files")
@@ -1,8 +1,13 @@
 import streamlit as st
-import replicate
+import pandas as pd
+from llmclient import LLMStream, input_key, merge_streams
+from sqlcheck import DIALECTS, RULES, check_sql, format_sql_findings
+from sqlcheck import SCALES, DEFAULT_ROWS, local_engine, extract_sql, benchmark_queries, median_seconds
 from sqlexamples import SQLExamples
 import time
-import os
+import metrics
+
+page_start = time.perf_counter()
 
 st.set_page_config(page_title="Hackathon - The Future of AI is Open",
                    menu_items={
@@ -12,7 +17,6 @@ st.set_page_config(page_title="Hackathon - The Future of AI is Open",
 
 if 'REPLICATE_API_TOKEN' in st.session_state:  
     api_token = st.session_state['REPLICATE_API_TOKEN']
-    os.environ["REPLICATE_API_TOKEN"] = st.session_state['REPLICATE_API_TOKEN']
 
 else:  
     api_token = "Enter the token"
@@ -21,34 +25,6 @@ else:
 
 st.markdown("## Dissecting the code with LLM")
 
-@st.cache_data
-def generate_llm_data(input):
-    """
-    Generate LLM data
-        :param input: Input to LLM
-        :type input: str
-        :return: Status of LLM and data
-        :rtype: tuple
-    """
-    try:
-        with st.spinner('LLM data generation...'):  
-            prediction = replicate.models.predictions.create(
-                "snowflake/snowflake-arctic-instruct",
-                input=input
-            )
-            for i in range(3):
-                prediction.reload()
-                if prediction.status in {"succeeded", "failed", "canceled"}:
-                    break
-                else:
-                    time.sleep(5)
-            prediction_status = prediction.status
-            prediction_data = prediction.output
-        
-        return prediction_status, prediction_data
-    except:
-        return False, False
-
 # Generate sidebar
 ####################################################
 with st.sidebar:
@@ -56,21 +32,25 @@ with st.sidebar:
     if token:
         api_token = token
         st.session_state['REPLICATE_API_TOKEN'] = token
-        os.environ["REPLICATE_API_TOKEN"] = token
     
     try:
         st.image('images/logo.jpg', use_column_width="always", caption="Hackathon - The Future of AI is Open")
     except:
         st.error('Image logo.jpg not found', icon="🚨")
         
-if 'clicked_sec101' not in st.session_state: st.session_state.clicked_sec101 = False
-if 'clicked_sec102' not in st.session_state: st.session_state.clicked_sec102 = False
-if 'clicked_sec103' not in st.session_state: st.session_state.clicked_sec103 = False
+CODE_SECTIONS = {
+    "explain": "Explain the code",
+    "optimize": "Suggest code improvements to optimize performance.",
+    "costs": "Suggestions to reduce costs.",
+}
+
+# Input keys of the sections asked for, a section stays shown while its
+# code, dialect and observations are unchanged
+if 'code_requests' not in st.session_state: st.session_state.code_requests = set()
+# Key and report of the last benchmark of the optimized code
+if 'benchmark' not in st.session_state: st.session_state.benchmark = None
     
 def option_func():
-    st.session_state.clicked_sec101 = False
-    st.session_state.clicked_sec102 = False
-    st.session_state.clicked_sec103 = False
     st.session_state.obs = ''
 
 option_format = st.selectbox(
@@ -82,137 +62,166 @@ option_format = st.selectbox(
 sql_example = SQLExamples()
 code_example = sql_example.get_sql_example(option_format)
 
-def click_button_1():
-    st.session_state.clicked_sec101 = True
-    
-def enable_generate_button():
-    st.session_state.clicked_sec101 = False
-    st.session_state.clicked_sec102 = False
-    st.session_state.clicked_sec103 = False
-
 txt_code = st.text_area(
     "Code to analyze",
     placeholder=code_example,
-    height=400,
-    on_change=enable_generate_button
+    height=400
 )
 
 txt_observations = st.text_area(
     "Observations",
     placeholder="Enter some comments about the code or leave the dialog box as it is.",
     height=80,
-    on_change=enable_generate_button,
     key='obs'
 )
 
-st.divider()
-st.markdown("#### Explain the code")
-
-if not st.session_state.clicked_sec101:
-    b = st.button('Generate', key=1, on_click=click_button_1)
-else:
-    # The message and nested widget will remain on the page
-    b = None
-    prompt_sec1 = f"Your task is to explain the provided {option_format} code snippet."
-    prompt_sec1 += "\n\n"
-    
-    if txt_code:
-        prompt_sec1 += txt_code
-    else:
-        prompt_sec1 += code_example
-    
-    if txt_observations:
-        obs = "\n\nNote the following observations:\n"
-        prompt_sec1 += txt_observations
-    
-    input = {
-        "prompt": prompt_sec1,
-        "temperature": 0.2
-    }
-    
-    prediction_status, prediction_data = generate_llm_data(input)
-    
-    if prediction_status == "succeeded": 
-        st.markdown("".join(prediction_data))
+def code_input(section, code, observations, findings):
+    """
+    Input to LLM of a section. The explanation doesn't depend on the
+    observations nor on the static analysis, editing them keeps it.
+        :param section: Key of ``CODE_SECTIONS``
+        :type section: str
+        :param code: Code to analyze
+        :type code: str
+        :param observations: Comments about the code
+        :type observations: str
+        :param findings: Result of ``check_sql`` on the code
+        :type findings: list
+        :rtype: dict
+    """
+    if section == "explain":
+        prompt = f"Your task is to explain the provided {option_format} code snippet."
+        temperature = 0.2
+    elif section == "optimize":
+        prompt = f"Suggest improvements to optimize the performance of the provided {option_format} code snippet. Identify areas where the code can be made more efficient, faster, or less resource-intensive."
+        temperature = 0.6
     else:
-        st.error("LLM data generation failed. Try again later.")
-        st.cache_data.clear()
-        st.session_state.clicked_sec101 = False
-
-
-# PART 2 ############################################################
-st.divider()
-st.markdown("#### Suggest code improvements to optimize performance.")
-
-def click_button_2():
-    st.session_state.clicked_sec102 = True
+        prompt = f"Suggest improvements to reduce the costs of this code provided in {option_format}."
+        temperature = 0.6
+    prompt += "\n\n"
+    prompt += code
 
-if not st.session_state.clicked_sec102:
-    c = st.button('Generate', key=2, on_click=click_button_2)
-else:
-    # The message and nested widget will remain on the page
-    c = None
-    prompt_sec2 = f"Suggest improvements to optimize the performance of the provided {option_format} code snippet. Identify areas where the code can be made more efficient, faster, or less resource-intensive."
-    prompt_sec2 += "\n\n"
+    static_analysis = format_sql_findings(findings)
+    if static_analysis and section != "explain":
+        prompt += f"\n\nA static analysis of the code found:\n{static_analysis}"
     
-    if txt_code:
-        prompt_sec2 += txt_code
-    else:
-        prompt_sec2 += code_example
-    
-    if txt_observations:
+    if observations and section != "explain":
         obs = "\n\nNote the following observations:"
-        prompt_sec2 += f" {obs} {txt_observations}"
+        prompt += f" {obs} {observations}"
     
-    input = {
-        "prompt": prompt_sec2,
-        "temperature": 0.6
+    return {
+        "prompt": prompt,
+        "temperature": temperature
     }
-    
-    prediction_status, prediction_data = generate_llm_data(input)
-    
-    if prediction_status == "succeeded": 
-        st.markdown("".join(prediction_data))
-    else:
-        st.error("LLM data generation failed. Try again later.")
-        st.cache_data.clear()
-        st.session_state.clicked_sec102 = False
 
+def request_sections(*keys):
+    st.session_state.code_requests.update(keys)
+
+# Local rules, shown at once and sent to the LLM as context
+findings = check_sql(txt_code or code_example, DIALECTS[option_format])
+st.markdown("#### Static analysis")
+if findings:
+    st.dataframe(pd.DataFrame({
+        "Line": [finding["line"] for finding in findings],
+        "Severity": [finding["severity"] for finding in findings],
+        "Rule": [RULES[finding["rule"]] for finding in findings],
+        "Finding": [finding["message"] for finding in findings],
+        "Code": [finding["snippet"] for finding in findings],
+    }), hide_index=True, use_container_width=True)
+else:
+    st.success("No performance anti-pattern found by the static analysis.")
 
-# PART 3 ############################################################
-st.divider()
-st.markdown("#### Suggestions to reduce costs.")
+inputs = {section: code_input(section, txt_code or code_example, txt_observations, findings) for section in CODE_SECTIONS}
+keys = {section: input_key(input) for section, input in inputs.items()}
 
-def click_button_3():
-    st.session_state.clicked_sec103 = True
-    
-if not st.session_state.clicked_sec103:
-    d = st.button('Generate', key=3, on_click=click_button_3)
-else:
-    # The message and nested widget will remain on the page
-    d = None
-    prompt_sec3 = f"Suggest improvements to reduce the costs of this code provided in {option_format}."
-    prompt_sec3 += "\n\n"
-    
-    if txt_code:
-        prompt_sec3 += txt_code
-    else:
-        prompt_sec3 += code_example
-    
-    if txt_observations:
-        obs = "\n\nNote the following observations:"
-        prompt_sec3 += f" {obs} {txt_observations}"
-    
-    input = {
-        "prompt": prompt_sec3,
-        "temperature": 0.6
-    }
-    
-    prediction_status, prediction_data = generate_llm_data(input)
-    
-    if prediction_status == "succeeded": 
-        st.markdown("".join(prediction_data))
+st.button('Analyse all', key="analyse_all", type="primary", on_click=request_sections, args=tuple(keys.values()))
+
+placeholders = {}
+for i, (section, title) in enumerate(CODE_SECTIONS.items(), start=1):
+    st.divider()
+    st.markdown(f"#### {title}")
+    if keys[section] in st.session_state.code_requests:
+        placeholders[section] = st.empty()
     else:
-        st.error("LLM data generation failed. Try again later.")
-        st.cache_data.clear()
-        st.session_state.clicked_sec103 = False
\ No newline at end of file
+        st.button('Generate', key=i, on_click=request_sections, args=(keys[section],))
+
+# The sections asked for are sent at once and shown as their tokens arrive,
+# the unchanged ones come from the response cache
+streams = {section: LLMStream(inputs[section], api_token) for section in placeholders}
+for section, llm_stream in streams.items():
+    placeholders[section].info(llm_stream.waiting_message())
+
+texts = dict.fromkeys(streams, "")
+answers = {}
+for updates in merge_streams(streams):
+    changed = set()
+    for section, chunk in updates:
+        if chunk is None:
+            changed.discard(section)
+            llm_stream = streams[section]
+            if llm_stream.status == "succeeded":
+                answers[section] = llm_stream.text
+                with placeholders[section].container():
+                    st.markdown(llm_stream.text)
+                    st.caption(llm_stream.timing())
+            else:
+                placeholders[section].error("LLM data generation failed. Try again later.")
+                st.session_state.code_requests.discard(keys[section])
+        else:
+            texts[section] += chunk
+            changed.add(section)
+    for section in changed:
+        placeholders[section].markdown(texts[section])
+
+# The optimized code runs against the original on synthetic tables, the
+# suggestions of the LLM are checked before they are trusted
+st.divider()
+st.markdown("#### Benchmark the optimization")
+dialect = DIALECTS[option_format]
+st.caption(f"The original and the optimized code run on {local_engine(dialect)} with synthetic tables inferred from the code.")
+proposed_code = st.text_area(
+    "Optimized code",
+    value=extract_sql(answers.get("optimize")) or "",
+    placeholder="Paste the optimized code, or generate the performance suggestions above.",
+    height=200
+)
+rows = st.select_slider("Rows per table", options=SCALES, value=DEFAULT_ROWS, format_func=lambda rows: f"{rows:,}")
+benchmark_key = (txt_code or code_example, proposed_code, dialect, rows)
+if st.button('Run benchmark', key="benchmark_run", disabled=not proposed_code.strip()):
+    with st.spinner("Running both versions of the code..."):
+        report = benchmark_queries(txt_code or code_example, proposed_code, dialect, rows)
+    st.session_state.benchmark = (benchmark_key, report)
+
+if st.session_state.benchmark is not None and st.session_state.benchmark[0] == benchmark_key:
+    report = st.session_state.benchmark[1]
+    if report["equivalent"]:
+        st.success(f"Same results on both versions: {report['original']['rows']:,} rows.")
+    elif report["equivalent"] is False:
+        st.error("Different results: the optimized code is not equivalent on these tables.")
+        only_original, only_proposed = st.columns(2)
+        only_original.caption("Rows only in the original result")
+        only_original.dataframe(pd.DataFrame(report["only_original"]), hide_index=True)
+        only_proposed.caption("Rows only in the optimized result")
+        only_proposed.dataframe(pd.DataFrame(report["only_proposed"]), hide_index=True)
+
+    original_seconds = median_seconds(report["original"])
+    for column, (name, title) in zip(st.columns(2), (("original", "Original"), ("proposed", "Optimized"))):
+        run = report[name]
+        with column:
+            st.markdown(f"**{title}**")
+            if run["error"]:
+                st.error(run["error"])
+                continue
+            seconds = median_seconds(run)
+            delta = None
+            if name == "proposed" and original_seconds:
+                delta = f"{(seconds / original_seconds - 1) * 100:+.0f}%"
+            st.metric("Median time", f"{seconds * 1000:.1f} ms", delta, delta_color="inverse")
+            st.caption(f"{run['rows']:,} rows, {len(run['seconds'])} runs")
+            st.code(run["plan"], language="text")
+            with st.expander(f"Code run on {report['engine']}"):
+                st.code(run["sql"], language="sql")
+    with st.expander(f"Synthetic tables, {report['rows_per_table']:,} rows each"):
+        st.dataframe(pd.DataFrame(report["schema"]), hide_index=True, use_container_width=True)
+
+metrics.observe("page_run_seconds", time.perf_counter() - page_start, page="dissecting_the_code")
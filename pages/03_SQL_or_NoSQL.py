@@ -1,8 +1,10 @@
 import streamlit as st
-import replicate
+from llmclient import LLMStream
 from sqlexamples import SQLExamples
 import time
-import os
+import metrics
+
+page_start = time.perf_counter()
 
 st.set_page_config(page_title="Hackathon - The Future of AI is Open",
                    menu_items={
@@ -12,40 +14,11 @@ st.set_page_config(page_title="Hackathon - The Future of AI is Open",
 
 if 'REPLICATE_API_TOKEN' in st.session_state:  
     api_token = st.session_state['REPLICATE_API_TOKEN']
-    os.environ["REPLICATE_API_TOKEN"] = st.session_state['REPLICATE_API_TOKEN']
 
 else:  
     api_token = "Enter the token"
     st.error('Enter the [Replicate api token](https://replicate.com/account/api-tokens)', icon='🚨')
 
-@st.cache_data
-def generate_llm_data(input):
-    """
-    Generate LLM data
-        :param input: Input to LLM
-        :type input: str
-        :return: Status of LLM and data
-        :rtype: tuple
-    """
-    try:
-        with st.spinner('LLM data generation...'):  
-            prediction = replicate.models.predictions.create(
-                "snowflake/snowflake-arctic-instruct",
-                input=input
-            )
-            for i in range(3):
-                prediction.reload()
-                if prediction.status in {"succeeded", "failed", "canceled"}:
-                    break
-                else:
-                    time.sleep(5)
-            prediction_status = prediction.status
-            prediction_data = prediction.output
-        
-        return prediction_status, prediction_data
-    except:
-        return False, False
-
 # Generate sidebar
 ####################################################
 with st.sidebar:
@@ -53,7 +26,6 @@ with st.sidebar:
     if token:
         api_token = token
         st.session_state['REPLICATE_API_TOKEN'] = token
-        os.environ["REPLICATE_API_TOKEN"] = token
     
     try:
         st.image('images/logo.jpg', use_column_width="always", caption="Hackathon - The Future of AI is Open")
@@ -149,15 +121,17 @@ else:
         "temperature": 0.9
     }
     
-    prediction_status, prediction_data = generate_llm_data(input)
+    st.markdown("### Generated LLM report")
+    llm_stream = LLMStream(input, api_token)
+    with st.spinner(llm_stream.waiting_message()):
+        st.write_stream(llm_stream)
     
-    if prediction_status == "succeeded": 
-        st.markdown("### Generated LLM report")
-        st.markdown("".join(prediction_data))
+    if llm_stream.status == "succeeded": 
+        st.caption(llm_stream.timing())
     else:
         st.error("LLM data generation failed. Try again later.")
-        st.cache_data.clear()
         st.session_state.clicked_sec500 = False
         
     c = st.button('Reset', key=101, type="primary", on_click=click_button_reset)
 
+metrics.observe("page_run_seconds", time.perf_counter() - page_start, page="sql_or_nosql")
@@ -1,9 +1,11 @@
 import streamlit as st
 import pandas as pd
-import replicate
+from llmclient import LLMStream
 import json
 import time
-import os
+import metrics
+
+page_start = time.perf_counter()
 
 # App title
 st.set_page_config(page_title="Hackathon - The Future of AI is Open",
@@ -14,7 +16,6 @@ st.set_page_config(page_title="Hackathon - The Future of AI is Open",
 
 if 'REPLICATE_API_TOKEN' in st.session_state:  
     api_token = st.session_state['REPLICATE_API_TOKEN']
-    os.environ["REPLICATE_API_TOKEN"] = st.session_state['REPLICATE_API_TOKEN']
 
 else:  
     api_token = "Enter the token"
@@ -27,34 +28,6 @@ with st.expander("About this section..."):
     st.markdown("LLM models allow you to identify key information and determine what specific data you need to extract from the text. They could be names, dates, numbers or any other relevant information.")
     st.markdown("**IMPORTANT: Avoid entering information with confidential data or that may affect third parties.**")
 
-@st.cache_data
-def generate_llm_data(input):
-    """
-    Generate LLM data
-        :param input: Input to LLM
-        :type input: str
-        :return: Status of LLM and data
-        :rtype: tuple
-    """
-    try:
-        with st.spinner('LLM data generation...'):  
-            prediction = replicate.models.predictions.create(
-                "snowflake/snowflake-arctic-instruct",
-                input=input
-            )
-            for i in range(3):
-                prediction.reload()
-                if prediction.status in {"succeeded", "failed", "canceled"}:
-                    break
-                else:
-                    time.sleep(5)
-            prediction_status = prediction.status
-            prediction_data = prediction.output
-        
-        return prediction_status, prediction_data
-    except:
-        return False, False
-
 # Generate sidebar
 ####################################################
 with st.sidebar:
@@ -63,7 +36,6 @@ with st.sidebar:
     if token:
         api_token = token
         st.session_state['REPLICATE_API_TOKEN'] = token
-        os.environ["REPLICATE_API_TOKEN"] = token
     
     try:
         st.image('images/logo.jpg', use_column_width="always", caption="Hackathon - The Future of AI is Open")
@@ -110,17 +82,20 @@ else:
         "prompt_template": "<|im_start|>system\nYour task is to take the unstructured text provided and convert it into a well-organized table format using JSON. Identify the main entities, attributes, or categories mentioned in the text and use them as keys in the JSON object. Then, extract the relevant information from the text and populate the corresponding values in the JSON object. Ensure that the data is accurately represented and properly formatted within the JSON structure. The resulting JSON table should provide a clear, structured overview of the information.<|im_end|>\n<|im_start|>user\n{prompt}<|im_end|>\n\n<|im_start|>assistant\n",
     }
     
-    prediction_status, prediction_data = generate_llm_data(input)
+    # The tokens are shown as they arrive, then replaced by the JSON table
+    llm_stream = LLMStream(input, api_token)
+    stream_placeholder = st.empty()
+    with st.spinner(llm_stream.waiting_message()):
+        stream_placeholder.write_stream(llm_stream)
     
-    if prediction_status == "succeeded" and prediction_data:
-        response = "".join(prediction_data)
+    if llm_stream.status == "succeeded" and llm_stream.text:
+        response = llm_stream.text
         try:
             json_data = json.loads(response)
-            st.json(json_data, expanded=True)
+            stream_placeholder.json(json_data, expanded=True)
             json_string = json.dumps(json_data, indent=2)
         except:
-            st.markdown("*The conversion to JSON of the entered text presented some difficulties, it shows the result could be incomplete.*\n\n")
-            st.markdown(response)
+            stream_placeholder.markdown("*The conversion to JSON of the entered text presented some difficulties, it shows the result could be incomplete.*\n\n" + response)
         else:
             st.download_button(
                 label="Download JSON",
@@ -128,11 +103,13 @@ else:
                 mime="application/json",
                 data=json_string,
             )
+        st.caption(llm_stream.timing())
 
     else:
         st.error("LLM data generation failed. Try again later.")
-        st.cache_data.clear()
         st.session_state.clicked_sec800 = False
     
     
-    c = st.button('Reset', key=101, type="primary", on_click=click_button_reset)
\ No newline at end of file
+    c = st.button('Reset', key=101, type="primary", on_click=click_button_reset)
+
+metrics.observe("page_run_seconds", time.perf_counter() - page_start, page="unstructured_text_to_json")
@@ -0,0 +1,6 @@
+from sqlcheck.tokens import DIALECTS, KEYWORDS, SQLSyntaxError, Token, tokenize, split_statements
+from sqlcheck.parser import MAX_PARSED, Node, ParsedSQL, snippet_key, parse_sql, from_relations, relation_names, column_qualifiers
+from sqlcheck.rules import RULES, SEVERITIES, check_sql, format_sql_findings
+from sqlcheck.schema import Schema, infer_schema, generate_tables
+from sqlcheck.translate import ENGINES, declared_values, translate_query
+from sqlcheck.sandbox import SCALES, DEFAULT_ROWS, LOCAL_ENGINES, Sandbox, local_engine, extract_sql, compare_results, benchmark_queries, median_seconds
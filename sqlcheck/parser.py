@@ -0,0 +1,987 @@
+"""Recursive descent parser of the queries of a SQL snippet.
+
+Only what the rules look at is parsed: SELECT statements with their CTEs,
+set operations, joins, subqueries, window functions and expressions, in
+the syntax shared by the dialects of the app plus their common extensions
+(TOP, LIMIT/OFFSET, ``::`` casts, CROSS APPLY, UNNEST, ARRAY[...]).
+Other statements (DECLARE, SET, DDL...) are skipped, and INSERT or CREATE
+statements are analysed through their SELECT.
+
+A snippet is parsed once: the result is kept in memory by the hash of its
+text and dialect, so the reruns of the Streamlit script don't parse it
+again.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+import metrics
+from sqlcheck.tokens import SQLSyntaxError, tokenize, split_statements
+
+# Parsed snippets kept in memory
+MAX_PARSED = 128
+
+_COMPARISONS = frozenset(("=", "==", "<>", "!=", "<", ">", "<=", ">="))
+_ADDITIVE = frozenset(("+", "-", "&", "|", "^"))
+_MULTIPLICATIVE = frozenset(("*", "/", "%"))
+# Functions taking "expr AS type"
+_CASTS = frozenset(("CAST", "TRY_CAST", "SAFE_CAST"))
+# Keywords also used as function names
+_KEYWORD_FUNCTIONS = frozenset(("LEFT", "RIGHT", "ROW", "FILTER"))
+# Keywords ending a relation of the FROM clause
+_JOIN_KEYWORDS = frozenset(("JOIN", "INNER", "LEFT", "RIGHT", "FULL", "CROSS", "NATURAL", "OUTER"))
+_NO_SPACE_BEFORE = frozenset((",", ")", ".", "]", "::"))
+_NO_SPACE_AFTER = frozenset(("(", ".", "[", "::"))
+
+
+class Node:
+    """
+    Node of a parsed query: its kind, its arguments (nodes, lists of nodes
+    or plain values) and the tokens it was parsed from
+    """
+    __slots__ = ("kind", "args", "tokens")
+
+    def __init__(self, kind, tokens, **args):
+        self.kind = kind
+        self.tokens = tokens
+        self.args = args
+
+    def __getattr__(self, name):
+        try:
+            return self.args[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __repr__(self):
+        return f"Node({self.kind}, {self.sql()!r})"
+
+    @property
+    def line(self):
+        return self.tokens[0].line if self.tokens else None
+
+    def sql(self):
+        """
+        Normalized text of the node, one space between tokens
+            :rtype: str
+        """
+        parts = []
+        previous = None
+        for token in self.tokens:
+            text = token.text()
+            if previous is not None and text not in _NO_SPACE_BEFORE and previous.text() not in _NO_SPACE_AFTER \
+                    and not (text == "(" and previous.kind in ("name", "quoted")):
+                parts.append(" ")
+            parts.append(text)
+            previous = token
+        return "".join(parts)
+
+    def key(self):
+        """
+        Key comparing nodes regardless of case and layout
+            :rtype: tuple
+        """
+        return tuple(token.text().upper() if token.kind in ("keyword", "name") else token.text()
+                     for token in self.tokens)
+
+    def children(self):
+        """Nodes among the arguments"""
+        for value in self.args.values():
+            if isinstance(value, Node):
+                yield value
+            elif isinstance(value, list):
+                for item in value:
+                    if isinstance(item, Node):
+                        yield item
+
+    def walk(self, skip=()):
+        """
+        The node and its descendants, depth first
+            :param skip: Kinds of the descendants not entered, e.g. "query"
+                to stay in the scope of a query
+            :type skip: tuple
+        """
+        yield self
+        for child in self.children():
+            if child.kind in skip:
+                yield child
+            else:
+                yield from child.walk(skip)
+
+
+class _Parser:
+    """Parser of the tokens of one statement"""
+    def __init__(self, tokens, dialect):
+        self.tokens = tokens
+        self.dialect = dialect
+        self.position = 0
+
+    # Token helpers
+    ####################################################
+    def peek(self, offset=0):
+        index = self.position + offset
+        return self.tokens[index] if index < len(self.tokens) else None
+
+    def at(self, *values, offset=0):
+        """Whether the token is one of the keywords or operators"""
+        token = self.peek(offset)
+        return token is not None and token.kind in ("keyword", "op") and token.value in values
+
+    def at_name(self, offset=0):
+        token = self.peek(offset)
+        return token is not None and token.kind in ("name", "quoted")
+
+    def at_word(self, *values, offset=0):
+        """Whether the token is one of the words, keyword or not"""
+        token = self.peek(offset)
+        return token is not None and token.kind in ("keyword", "name") and token.value.upper() in values
+
+    def accept(self, *values):
+        if self.at(*values):
+            self.position += 1
+            return self.tokens[self.position - 1]
+        return None
+
+    def expect(self, value):
+        token = self.accept(value)
+        if token is None:
+            self.fail(f"Expected {value}")
+        return token
+
+    def fail(self, message):
+        token = self.peek()
+        if token is None:
+            line = self.tokens[-1].line if self.tokens else None
+            raise SQLSyntaxError(f"{message}, found the end of the statement", line)
+        raise SQLSyntaxError(f"{message}, found {token.text()}", token.line)
+
+    def node(self, kind, start, **args):
+        return Node(kind, self.tokens[start:self.position], **args)
+
+    def name(self):
+        token = self.peek()
+        if token is None or token.kind not in ("name", "quoted"):
+            self.fail("Expected a name")
+        self.position += 1
+        return token.value
+
+    def skip_parentheses(self):
+        """Skip a balanced group of parentheses or brackets"""
+        depth = 0
+        while True:
+            token = self.peek()
+            if token is None:
+                self.fail("Expected )")
+            self.position += 1
+            if token.kind == "op" and token.value in ("(", "["):
+                depth += 1
+            elif token.kind == "op" and token.value in (")", "]"):
+                depth -= 1
+                if depth == 0:
+                    return
+
+    def data_type(self):
+        """Skip a data type, e.g. VARCHAR(10), DOUBLE PRECISION or ROW(a INT)"""
+        start = self.position
+        while self.at_name() or self.at("ROW", "WITH") or self.at_word("TIME", "ZONE", "ARRAY"):
+            self.position += 1
+            if self.at("("):
+                self.skip_parentheses()
+            elif self.at("<"):
+                # BigQuery ARRAY<INT64>, STRUCT<a INT64>
+                depth = 0
+                while self.peek() is not None:
+                    depth += self.at("<") - self.at(">")
+                    self.position += 1
+                    if depth == 0:
+                        break
+        if self.position == start:
+            self.fail("Expected a data type")
+        while self.at("[") and self.at("]", offset=1):
+            self.position += 2
+        return " ".join(token.text() for token in self.tokens[start:self.position])
+
+    # Queries
+    ####################################################
+    def statement(self):
+        """Query of the statement, None when it has no SELECT"""
+        if self.at("SELECT", "WITH") or (self.at("(") and self.at("SELECT", "WITH", "(", offset=1)):
+            query = self.query()
+        else:
+            # INSERT ... SELECT, CREATE TABLE ... AS SELECT, CREATE VIEW ...
+            first = self.peek()
+            if first is None or first.kind != "name" or first.value.upper() not in ("INSERT", "CREATE", "REPLACE"):
+                return None
+            while self.peek() is not None and not self.at("SELECT", "WITH"):
+                self.position += 1
+            if self.peek() is None:
+                return None
+            query = self.query()
+        if self.peek() is not None:
+            self.fail("Unexpected token")
+        return query
+
+    def query(self):
+        start = self.position
+        ctes = []
+        if self.accept("WITH"):
+            if self.at_word("RECURSIVE"):
+                self.position += 1
+            while True:
+                cte_start = self.position
+                name = self.name()
+                columns = self.name_list() if self.at("(") else []
+                self.expect("AS")
+                if self.at_word("MATERIALIZED"):
+                    self.position += 1
+                elif self.at("NOT") and self.at_word("MATERIALIZED", offset=1):
+                    self.position += 2
+                self.expect("(")
+                cte_query = self.query()
+                self.expect(")")
+                ctes.append(self.node("cte", cte_start, name=name, columns=columns, query=cte_query))
+                if not self.accept(","):
+                    break
+        body = self.set_operation()
+        order, limit, offset = self.query_tail()
+        return self.node("query", start, ctes=ctes, body=body, order=order, limit=limit, offset=offset)
+
+    def query_tail(self):
+        order, limit, offset = [], None, None
+        if self.at("ORDER") and self.at("BY", offset=1):
+            self.position += 2
+            order = self.order_items()
+        if self.accept("LIMIT"):
+            limit = self.expression()
+            if self.accept(","):
+                # MySQL LIMIT offset, count
+                offset, limit = limit, self.expression()
+        if self.accept("OFFSET"):
+            offset = self.expression()
+            self.accept("ROWS", "ROW")
+        if self.accept("FETCH"):
+            self.accept("FIRST", "NEXT")
+            limit = self.expression() if not self.at("ROWS", "ROW") else None
+            self.accept("ROWS", "ROW")
+            self.expect("ONLY")
+        return order, limit, offset
+
+    def set_operation(self):
+        start = self.position
+        left = self.select_core()
+        while self.at("UNION", "EXCEPT", "INTERSECT", "MINUS"):
+            operator = self.peek().value
+            self.position += 1
+            if self.accept("ALL"):
+                operator += " ALL"
+            else:
+                self.accept("DISTINCT")
+            right = self.select_core()
+            left = self.node("setop", start, operator=operator, left=left, right=right)
+        return left
+
+    def select_core(self):
+        start = self.position
+        if self.accept("("):
+            query = self.query()
+            self.expect(")")
+            return query
+        self.expect("SELECT")
+        distinct = bool(self.accept("DISTINCT"))
+        if not distinct:
+            self.accept("ALL")
+        if self.at("ON") and distinct:
+            # PostgreSQL DISTINCT ON (...)
+            self.position += 1
+            self.skip_parentheses()
+        top = None
+        if self.accept("TOP"):
+            top = self.primary()
+            if self.at_word("PERCENT"):
+                self.position += 1
+            if self.at("WITH") and self.at_word("TIES", offset=1):
+                self.position += 2
+        items = [self.select_item()]
+        while self.accept(","):
+            items.append(self.select_item())
+        if self.at_word("INTO"):
+            # SELECT ... INTO new_table
+            self.position += 1
+            self.qualified_name()
+        relations = self.from_clause() if self.accept("FROM") else []
+        where = self.expression() if self.accept("WHERE") else None
+        group = []
+        if self.at("GROUP") and self.at("BY", offset=1):
+            self.position += 2
+            if not self.accept("ALL"):
+                group = self.expression_list()
+            if self.at("WITH") and self.at_word("ROLLUP", offset=1):
+                self.position += 2
+        having = self.expression() if self.accept("HAVING") else None
+        qualify = None
+        while self.at("WINDOW", "QUALIFY"):
+            # In either order, depending on the dialect
+            if self.accept("QUALIFY"):
+                qualify = self.expression()
+                continue
+            self.position += 1
+            while True:
+                self.name()
+                self.expect("AS")
+                self.window_spec()
+                if not self.accept(","):
+                    break
+        return self.node("select", start, distinct=distinct, top=top, items=items, relations=relations,
+                         where=where, group=group, having=having, qualify=qualify)
+
+    def select_item(self):
+        start = self.position
+        expression = self.expression()
+        if expression.kind == "star" and (self.at("EXCEPT") or self.at_word("REPLACE")) and self.at("(", offset=1):
+            # BigQuery SELECT * EXCEPT (a), SELECT * REPLACE (x AS a)
+            self.position += 1
+            self.skip_parentheses()
+        alias = self.alias()
+        return self.node("item", start, expression=expression, alias=alias)
+
+    def alias(self):
+        if self.accept("AS"):
+            token = self.peek()
+            if token is None or token.kind not in ("name", "quoted", "string"):
+                self.fail("Expected an alias")
+            self.position += 1
+            return token.value
+        token = self.peek()
+        if token is not None and token.kind in ("name", "quoted"):
+            self.position += 1
+            return token.value
+        return None
+
+    def name_list(self):
+        self.expect("(")
+        names = [self.name()]
+        while self.accept(","):
+            names.append(self.name())
+        self.expect(")")
+        return names
+
+    def qualified_name(self):
+        parts = [self.name()]
+        while self.at(".") and self.peek(1) is not None and self.peek(1).kind in ("name", "quoted"):
+            self.position += 1
+            parts.append(self.name())
+        return parts
+
+    # FROM clause
+    ####################################################
+    def from_clause(self):
+        """The first relation, then a "join" node for every other one"""
+        relations = [self.relation()]
+        while True:
+            start = self.position
+            if self.accept(","):
+                relations.append(self.node("join", start, join_type="COMMA", relation=self.relation(),
+                                           on=None, using=None))
+                continue
+            if self.at("CROSS", "OUTER") and self.at("APPLY", offset=1):
+                join_type = self.peek().value + " APPLY"
+                self.position += 2
+                relations.append(self.node("join", start, join_type=join_type, relation=self.relation(),
+                                           on=None, using=None))
+                continue
+            if not self.at(*_JOIN_KEYWORDS):
+                return relations
+            words = []
+            while not self.at("JOIN"):
+                if not self.at(*_JOIN_KEYWORDS):
+                    self.fail("Expected JOIN")
+                words.append(self.peek().value)
+                self.position += 1
+            self.position += 1
+            join_type = " ".join(word for word in words if word != "OUTER") or "INNER"
+            relation = self.relation()
+            on = using = None
+            if self.accept("ON"):
+                on = self.expression()
+            elif self.accept("USING"):
+                using = self.name_list()
+            relations.append(self.node("join", start, join_type=join_type, relation=relation,
+                                       on=on, using=using))
+
+    def relation(self):
+        start = self.position
+        lateral = bool(self.accept("LATERAL"))
+        if self.at("(") and self.at("SELECT", "WITH", "(", offset=1):
+            self.position += 1
+            query = self.query()
+            self.expect(")")
+            alias, columns = self.relation_alias()
+            return self.node("derived", start, query=query, alias=alias, columns=columns, lateral=lateral)
+        if self.at("("):
+            # Parenthesized joins
+            self.position += 1
+            relations = self.from_clause()
+            self.expect(")")
+            alias, columns = self.relation_alias()
+            return self.node("nested", start, relations=relations, alias=alias)
+        parts = self.qualified_name()
+        if self.at("("):
+            # Table function: UNNEST(...), generate_series(...)
+            function = self.function(start, parts)
+            alias, columns = self.relation_alias()
+            return self.node("tablefunc", start, function=function, alias=alias, columns=columns)
+        if self.at_word("FOR") and self.at_word("SYSTEM_TIME", offset=1):
+            while self.peek() is not None and not self.at_name() and not self.at("AS", "WHERE", *_JOIN_KEYWORDS):
+                self.position += 1
+        alias, columns = self.relation_alias()
+        if self.at("WITH") and self.at("(", offset=1):
+            # SQL Server table hints, WITH (NOLOCK)
+            self.position += 1
+            self.skip_parentheses()
+        if self.at_word("TABLESAMPLE"):
+            self.position += 1
+            if self.at_name():
+                self.position += 1
+            self.skip_parentheses()
+        return self.node("table", start, parts=parts, alias=alias, columns=columns)
+
+    def relation_alias(self):
+        token = self.peek()
+        if self.accept("AS") or (token is not None and token.kind in ("name", "quoted")
+                                 and token.value.upper() not in ("TABLESAMPLE", "FOR", "GO")):
+            alias = self.name()
+            columns = self.name_list() if self.at("(") else []
+            return alias, columns
+        return None, []
+
+    # Expressions
+    ####################################################
+    def expression_list(self):
+        expressions = [self.expression()]
+        while self.accept(","):
+            expressions.append(self.expression())
+        return expressions
+
+    def order_items(self):
+        items = []
+        while True:
+            start = self.position
+            expression = self.expression()
+            descending = bool(self.accept("DESC"))
+            if not descending:
+                self.accept("ASC")
+            if self.accept("NULLS") and not self.accept("FIRST"):
+                self.expect_word("LAST")
+            items.append(self.node("order", start, expression=expression, descending=descending))
+            if not self.accept(","):
+                return items
+
+    def expression(self):
+        start = self.position
+        left = self.conjunction()
+        while self.accept("OR"):
+            left = self.node("binary", start, operator="OR", left=left, right=self.conjunction())
+        return left
+
+    def conjunction(self):
+        start = self.position
+        left = self.negation()
+        while self.accept("AND"):
+            left = self.node("binary", start, operator="AND", left=left, right=self.negation())
+        return left
+
+    def negation(self):
+        start = self.position
+        if self.accept("NOT"):
+            return self.node("unary", start, operator="NOT", operand=self.negation())
+        return self.comparison()
+
+    def comparison(self):
+        start = self.position
+        left = self.concatenation()
+        while True:
+            token = self.peek()
+            if token is not None and token.kind == "op" and token.value in _COMPARISONS:
+                self.position += 1
+                if self.at("ANY", "ALL") or self.at_word("SOME"):
+                    # x = ANY (subquery)
+                    quantified_start = self.position
+                    quantifier = self.peek().value.upper()
+                    self.position += 1
+                    right = self.node("quantified", quantified_start, quantifier=quantifier, operand=self.primary())
+                else:
+                    right = self.concatenation()
+                left = self.node("binary", start, operator=token.value, left=left, right=right)
+                continue
+            if self.accept("IS"):
+                negated = bool(self.accept("NOT"))
+                if self.accept("DISTINCT"):
+                    self.expect("FROM")
+                    value = self.concatenation()
+                else:
+                    value = self.primary()
+                left = self.node("is", start, expression=left, value=value, negated=negated)
+                continue
+            negated = self.at("NOT") and self.at("IN", "BETWEEN", "LIKE", "ILIKE", offset=1)
+            if negated:
+                self.position += 1
+            if self.accept("IN"):
+                in_start = self.position
+                self.expect("(")
+                if self.at("SELECT", "WITH"):
+                    values = self.query()
+                else:
+                    values = self.expression_list()
+                self.expect(")")
+                if isinstance(values, Node):
+                    values = self.node("subquery", in_start, query=values)
+                left = self.node("in", start, expression=left, values=values, negated=negated)
+            elif self.accept("BETWEEN"):
+                low = self.concatenation()
+                self.expect("AND")
+                high = self.concatenation()
+                left = self.node("between", start, expression=left, low=low, high=high, negated=negated)
+            elif self.at("LIKE", "ILIKE") or self.at_word("RLIKE", "REGEXP", "SIMILAR"):
+                operator = self.peek().value.upper()
+                self.position += 1
+                if operator == "SIMILAR":
+                    self.expect_word("TO")
+                pattern = self.concatenation()
+                if self.accept("ESCAPE"):
+                    self.concatenation()
+                left = self.node("like", start, operator=operator, expression=left, pattern=pattern,
+                                 negated=negated)
+            elif negated:
+                self.fail("Expected IN, BETWEEN or LIKE")
+            else:
+                return left
+
+    def expect_word(self, value):
+        if not self.at_word(value):
+            self.fail(f"Expected {value}")
+        self.position += 1
+
+    def concatenation(self):
+        start = self.position
+        left = self.additive()
+        while self.at("||"):
+            self.position += 1
+            left = self.node("binary", start, operator="||", left=left, right=self.additive())
+        return left
+
+    def additive(self):
+        start = self.position
+        left = self.multiplicative()
+        while self.at(*_ADDITIVE):
+            operator = self.peek().value
+            self.position += 1
+            left = self.node("binary", start, operator=operator, left=left, right=self.multiplicative())
+        return left
+
+    def multiplicative(self):
+        start = self.position
+        left = self.unary()
+        while self.at(*_MULTIPLICATIVE) or self.at_word("DIV", "MOD"):
+            operator = self.peek().value.upper()
+            self.position += 1
+            left = self.node("binary", start, operator=operator, left=left, right=self.unary())
+        return left
+
+    def unary(self):
+        start = self.position
+        if self.at("-", "+", "~"):
+            operator = self.peek().value
+            self.position += 1
+            return self.node("unary", start, operator=operator, operand=self.unary())
+        return self.postfix()
+
+    def postfix(self):
+        start = self.position
+        expression = self.primary()
+        while True:
+            if self.accept("::"):
+                data_type = self.data_type()
+                expression = self.node("cast", start, expression=expression, data_type=data_type, function=None)
+            elif self.accept("["):
+                index = self.expression()
+                self.expect("]")
+                expression = self.node("index", start, expression=expression, index=index)
+            elif self.at(".") and self.at_name(offset=1):
+                # Field of a function result or of a parenthesized expression
+                self.position += 1
+                field = self.name()
+                expression = self.node("field", start, expression=expression, field=field)
+            elif self.at_word("AT") and self.at_word("TIME", offset=1):
+                self.position += 3
+                zone = self.primary()
+                expression = self.node("function", start, name="AT TIME ZONE", arguments=[expression, zone],
+                                       distinct=False, order=[], filter=None, window=None)
+            elif self.at_word("COLLATE"):
+                self.position += 1
+                self.name()
+            else:
+                return expression
+
+    def primary(self):
+        start = self.position
+        token = self.peek()
+        if token is None:
+            self.fail("Expected an expression")
+        kind, value = token.kind, token.value
+        upper = value.upper() if kind in ("keyword", "name") else None
+
+        if kind in ("number", "string"):
+            self.position += 1
+            return self.node("literal", start, value=value)
+        if kind == "variable" or (kind == "op" and value == "?"):
+            self.position += 1
+            return self.node("parameter", start, name=value)
+        if kind == "op" and value == ":" and self.at_name(offset=1):
+            self.position += 2
+            return self.node("parameter", start, name=":" + self.tokens[start + 1].value)
+        if kind == "op" and value == "*":
+            self.position += 1
+            return self.node("star", start, qualifier=[])
+        if kind == "op" and value == "(":
+            self.position += 1
+            if self.at("SELECT", "WITH"):
+                query = self.query()
+                self.expect(")")
+                return self.node("subquery", start, query=query)
+            expressions = self.expression_list()
+            self.expect(")")
+            if len(expressions) > 1:
+                return self.node("tuple", start, items=expressions)
+            return self.node("paren", start, expression=expressions[0])
+        if kind == "keyword":
+            if upper == "NULL":
+                self.position += 1
+                return self.node("literal", start, value=None)
+            if upper == "CASE":
+                return self.case()
+            if upper == "EXISTS":
+                self.position += 1
+                self.expect("(")
+                query = self.query()
+                self.expect(")")
+                return self.node("exists", start, query=query)
+            if upper == "CAST":
+                self.position += 1
+                return self.cast(start, upper)
+            if upper == "INTERVAL":
+                self.position += 1
+                interval = self.primary()
+                if self.at_name():
+                    self.position += 1
+                return self.node("interval", start, value=interval)
+            if upper in _KEYWORD_FUNCTIONS and self.at("(", offset=1):
+                self.position += 1
+                return self.function(start, [value])
+            self.fail("Expected an expression")
+        if kind in ("name", "quoted"):
+            if kind == "name" and upper in ("TRUE", "FALSE") and not self.at(".", offset=1):
+                self.position += 1
+                return self.node("literal", start, value=upper == "TRUE")
+            if kind == "name" and upper in _CASTS and self.at("(", offset=1):
+                self.position += 1
+                return self.cast(start, upper)
+            if kind == "name" and upper == "ARRAY" and self.at("[", offset=1):
+                self.position += 2
+                items = [] if self.at("]") else self.expression_list()
+                self.expect("]")
+                return self.node("function", start, name="ARRAY", arguments=items, distinct=False, order=[],
+                                 filter=None, window=None)
+            if kind == "name" and self.peek(1) is not None and self.peek(1).kind == "string" and upper in (
+                    "DATE", "TIME", "TIMESTAMP", "DATETIME"):
+                # Typed literal, DATE '2024-01-01'
+                self.position += 2
+                return self.node("literal", start, value=self.tokens[start + 1].value)
+            parts = [self.name()]
+            while self.at("."):
+                if self.at("*", offset=1):
+                    self.position += 2
+                    return self.node("star", start, qualifier=parts)
+                self.position += 1
+                parts.append(self.name())
+            if self.at("("):
+                return self.function(start, parts)
+            return self.node("column", start, parts=parts)
+        self.fail("Expected an expression")
+
+    def cast(self, start, name):
+        self.expect("(")
+        expression = self.expression()
+        if self.accept("AS"):
+            data_type = self.data_type()
+        else:
+            # CAST(x, type) is not valid, but keep the parser going
+            self.expect(",")
+            data_type = self.data_type()
+        if self.at_word("FORMAT"):
+            self.position += 1
+            self.primary()
+        self.expect(")")
+        return self.node("cast", start, expression=expression, data_type=data_type, function=name)
+
+    def case(self):
+        start = self.position
+        self.expect("CASE")
+        operand = None if self.at("WHEN") else self.expression()
+        whens = []
+        while self.at("WHEN"):
+            when_start = self.position
+            self.position += 1
+            condition = self.expression()
+            self.expect("THEN")
+            result = self.expression()
+            whens.append(self.node("when", when_start, condition=condition, result=result))
+        if not whens:
+            self.fail("Expected WHEN")
+        default = self.expression() if self.accept("ELSE") else None
+        self.expect("END")
+        return self.node("case", start, operand=operand, whens=whens, default=default)
+
+    def function(self, start, parts):
+        name = ".".join(parts).upper()
+        self.expect("(")
+        distinct = bool(self.accept("DISTINCT"))
+        if not distinct:
+            self.accept("ALL")
+        arguments = []
+        if self.at("*"):
+            star_start = self.position
+            self.position += 1
+            arguments.append(self.node("star", star_start, qualifier=[]))
+        elif not self.at(")"):
+            arguments = self.function_arguments(name)
+        order = []
+        if self.at("ORDER") and self.at("BY", offset=1):
+            # STRING_AGG(x, ',' ORDER BY y), ARRAY_AGG(x ORDER BY y)
+            self.position += 2
+            order = self.order_items()
+        if self.at_word("SEPARATOR"):
+            self.position += 1
+            self.primary()
+        if self.at_word("IGNORE", "RESPECT") and self.at("NULLS", offset=1):
+            self.position += 2
+        if self.accept("LIMIT"):
+            self.expression()
+        self.expect(")")
+        if self.at_word("WITHIN") and self.at("GROUP", offset=1):
+            self.position += 2
+            self.expect("(")
+            self.expect("ORDER")
+            self.expect("BY")
+            order = self.order_items()
+            self.expect(")")
+        filter = None
+        if self.at("FILTER") and self.at("(", offset=1):
+            self.position += 2
+            self.expect("WHERE")
+            filter = self.expression()
+            self.expect(")")
+        if self.at_word("IGNORE", "RESPECT") and self.at("NULLS", offset=1):
+            self.position += 2
+        window = None
+        if self.accept("OVER"):
+            if self.at("("):
+                window = self.window_spec()
+            else:
+                window_start = self.position
+                reference = self.name()
+                window = self.node("window", window_start, reference=reference, partition=[], order=[], frame=None)
+        return self.node("function", start, name=name, arguments=arguments, distinct=distinct, order=order,
+                         filter=filter, window=window)
+
+    def function_arguments(self, name):
+        arguments = []
+        while True:
+            if self.at_name() and self.at("=>", offset=1):
+                # Named argument
+                self.position += 2
+            if name in ("EXTRACT", "DATE_PART") and self.at_name() and self.at("FROM", offset=1):
+                # EXTRACT(YEAR FROM x)
+                self.position += 2
+            elif name == "TRIM" and self.at_word("LEADING", "TRAILING", "BOTH"):
+                self.position += 1
+                self.accept("FROM")
+            arguments.append(self.expression())
+            while self.at("FROM") or self.at_word("FOR"):
+                # TRIM('x' FROM y), SUBSTRING(x FROM 1 FOR 2)
+                self.position += 1
+                arguments.append(self.expression())
+            if self.accept("USING"):
+                # MySQL CONVERT(x USING utf8mb4)
+                self.name()
+            if not self.accept(","):
+                return arguments
+
+    def window_spec(self):
+        start = self.position
+        self.expect("(")
+        reference = None
+        if self.at_name():
+            reference = self.name()
+        partition, order, frame = [], [], None
+        if self.accept("PARTITION"):
+            self.expect("BY")
+            partition = self.expression_list()
+        if self.at("ORDER") and self.at("BY", offset=1):
+            self.position += 2
+            order = self.order_items()
+        if self.at("ROWS", "RANGE", "GROUPS"):
+            unit = self.peek().value
+            self.position += 1
+            if self.accept("BETWEEN"):
+                frame_start = self.frame_bound()
+                self.expect("AND")
+                frame_end = self.frame_bound()
+            else:
+                frame_start, frame_end = self.frame_bound(), "CURRENT ROW"
+            if self.at_word("EXCLUDE"):
+                self.position += 1
+                while not self.at(")"):
+                    self.position += 1
+            frame = {"unit": unit, "start": frame_start, "end": frame_end}
+        self.expect(")")
+        return self.node("window", start, reference=reference, partition=partition, order=order, frame=frame)
+
+    def frame_bound(self):
+        if self.accept("UNBOUNDED"):
+            direction = self.accept("PRECEDING", "FOLLOWING")
+            if direction is None:
+                self.fail("Expected PRECEDING or FOLLOWING")
+            return "UNBOUNDED " + direction.value
+        if self.accept("CURRENT"):
+            self.expect("ROW")
+            return "CURRENT ROW"
+        offset = self.additive()
+        direction = self.accept("PRECEDING", "FOLLOWING")
+        if direction is None:
+            self.fail("Expected PRECEDING or FOLLOWING")
+        return f"{offset.sql()} {direction.value}"
+
+
+def from_relations(entries):
+    """
+    Relations of a FROM clause, those of the parenthesized joins included
+        :param entries: ``relations`` of a "select" node
+        :type entries: list
+    """
+    for entry in entries:
+        relation = entry.relation if entry.kind == "join" else entry
+        if relation.kind == "nested":
+            yield from from_relations(relation.relations)
+        else:
+            yield relation
+
+
+def relation_names(relation):
+    """
+    Names a relation is referred to by, in lower case
+        :param relation: "table", "derived", "tablefunc" or "nested" node
+        :type relation: Node
+        :rtype: set
+    """
+    names = set()
+    if relation.kind == "nested":
+        for inner in from_relations(relation.relations):
+            names |= relation_names(inner)
+    if relation.alias:
+        names.add(relation.alias.lower())
+    if relation.kind == "table":
+        names.add(relation.parts[-1].lower())
+        names.add(".".join(relation.parts).lower())
+    elif relation.kind == "tablefunc":
+        # UNNEST(items) t(site): site.field is a column of t
+        names.update(column.lower() for column in relation.columns)
+    return names
+
+
+def column_qualifiers(column):
+    """
+    Names of the relation a column may refer to, in lower case
+        :param column: "column" node
+        :type column: Node
+        :return: Its full qualifier and its first part, empty when it isn't qualified
+        :rtype: tuple
+    """
+    if len(column.parts) < 2:
+        return ()
+    return ".".join(column.parts[:-1]).lower(), column.parts[0].lower()
+
+
+class ParsedSQL:
+    """
+    Queries of a snippet, with the number of statements skipped and the
+    syntax errors of those that couldn't be parsed
+    """
+    def __init__(self, queries, skipped, errors):
+        self.queries = queries
+        self.skipped = skipped
+        self.errors = errors
+
+
+def snippet_key(sql, dialect):
+    """
+    Key of a snippet in the cache of the parsed snippets
+        :param sql: SQL snippet
+        :type sql: str
+        :param dialect: Value of ``DIALECTS``
+        :type dialect: str
+        :rtype: str
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(dialect.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(sql.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _parse(sql, dialect):
+    queries, skipped, errors = [], 0, []
+    try:
+        statements = split_statements(tokenize(sql, dialect), dialect)
+    except SQLSyntaxError as e:
+        return ParsedSQL([], 0, [e])
+    for tokens in statements:
+        try:
+            query = _Parser(tokens, dialect).statement()
+        except SQLSyntaxError as e:
+            errors.append(e)
+            continue
+        except RecursionError:
+            errors.append(SQLSyntaxError("Statement nested too deeply", tokens[0].line))
+            continue
+        if query is None:
+            skipped += 1
+        else:
+            queries.append(query)
+    return ParsedSQL(queries, skipped, errors)
+
+
+_parsed = OrderedDict()
+_parsed_lock = threading.Lock()
+
+
+def parse_sql(sql, dialect="ansi"):
+    """
+    Parse the queries of a snippet, once per snippet and dialect
+        :param sql: SQL snippet
+        :type sql: str
+        :param dialect: Value of ``DIALECTS``
+        :type dialect: str
+        :rtype: ParsedSQL
+    """
+    key = snippet_key(sql, dialect)
+    with _parsed_lock:
+        if key in _parsed:
+            _parsed.move_to_end(key)
+            metrics.inc("cache_requests_total", cache="sql_ast", result="hit")
+            return _parsed[key]
+    metrics.inc("cache_requests_total", cache="sql_ast", result="miss")
+    parsed = _parse(sql, dialect)
+    with _parsed_lock:
+        _parsed[key] = parsed
+        if len(_parsed) > MAX_PARSED:
+            _parsed.popitem(last=False)
+    return parsed
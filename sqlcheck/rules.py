@@ -0,0 +1,447 @@
+"""Rules flagging the performance anti-patterns of a SQL snippet.
+
+The rules look at the parsed queries only, without the schema or the data,
+so they run in milliseconds before any request to the LLM: SELECT *,
+predicates wrapping a column (non-sargable), correlated subqueries,
+expressions computed several times, joins without a predicate, COUNT
+(DISTINCT) over derived tables and costly window frames. Their advice
+depends on the dialect, e.g. what replaces a repeated GROUP BY expression
+or which approximate distinct count is available.
+"""
+from collections import Counter
+
+import metrics
+from sqlcheck.parser import Node, parse_sql, from_relations, relation_names, column_qualifiers
+
+# Title of every rule
+RULES = {
+    "select_star": "SELECT *",
+    "non_sargable": "Non-sargable predicate",
+    "correlated_subquery": "Correlated subquery",
+    "repeated_expression": "Repeated expression",
+    "count_distinct_derived": "COUNT(DISTINCT) over a derived table",
+    "missing_join_predicate": "Missing join predicate",
+    "unbounded_window": "Costly window frame",
+    "syntax_error": "Not analysed",
+}
+SEVERITIES = ("high", "medium", "low")
+AGGREGATES = frozenset("""
+COUNT SUM AVG MIN MAX STDDEV STDDEV_POP STDDEV_SAMP VARIANCE VAR_POP VAR_SAMP STDEV STDEVP VAR VARP
+ARRAY_AGG STRING_AGG GROUP_CONCAT LISTAGG BOOL_AND BOOL_OR BIT_AND BIT_OR COUNT_BIG ANY_VALUE MEDIAN
+""".split())
+# Shortest expression reported as repeated, in tokens
+MIN_REPEATED_TOKENS = 6
+
+_COMPARISONS = frozenset(("=", "==", "<>", "!=", "<", ">", "<=", ">="))
+_COLUMNAR = frozenset(("bigquery", "athena", "redshift"))
+# What a predicate wrapping a column prevents, per dialect
+_PRUNING = {
+    "bigquery": "partition and cluster pruning",
+    "athena": "partition pruning",
+    "redshift": "the zone maps of the sort key",
+}
+_APPROX_COUNT_DISTINCT = {
+    "bigquery": "APPROX_COUNT_DISTINCT(x)",
+    "tsql": "APPROX_COUNT_DISTINCT(x)",
+    "athena": "approx_distinct(x)",
+    "redshift": "APPROXIMATE COUNT(DISTINCT x)",
+}
+# Dialects grouping by an alias of the select list, or by its position
+_GROUP_BY_ALIAS = frozenset(("mysql", "postgres", "bigquery", "redshift"))
+_GROUP_BY_POSITION = frozenset(("athena",))
+_SNIPPET_CHARS = 80
+
+
+def _snippet(node):
+    text = node.sql()
+    return text if len(text) <= _SNIPPET_CHARS else text[:_SNIPPET_CHARS - 3] + "..."
+
+
+def _columns(node):
+    return [child for child in node.walk(skip=("query",)) if child.kind == "column"]
+
+
+def _unwrap(node):
+    while node.kind == "paren":
+        node = node.expression
+    return node
+
+
+def _is_plain_aggregate(node):
+    """An aggregate of columns, computed once by the engine however often it is written"""
+    return (node.kind == "function" and node.name in AGGREGATES and node.window is None
+            and all(argument.kind in ("column", "star", "literal") for argument in node.arguments))
+
+
+def _contains(longer, shorter):
+    size = len(shorter)
+    return any(longer[i:i + size] == shorter for i in range(len(longer) - size + 1))
+
+
+class _Checker:
+    """Findings of the queries of a snippet, one query scope at a time"""
+    def __init__(self, dialect):
+        self.dialect = dialect
+        self.findings = []
+
+    def add(self, rule, severity, node, message):
+        self.findings.append({"rule": rule, "severity": severity, "line": node.line,
+                              "message": message, "snippet": _snippet(node)})
+
+    # Scopes
+    ####################################################
+    def query(self, query, outer=frozenset(), exists=False):
+        """
+        Check a query and the queries nested in it
+            :param outer: Names of the relations of the enclosing queries
+            :param exists: Whether the query is the subquery of EXISTS
+        """
+        for cte in query.ctes:
+            self.query(cte.query, outer)
+        self.body(query.body, outer, exists, query.order)
+
+    def body(self, node, outer, exists, order):
+        if node.kind == "setop":
+            self.body(node.left, outer, exists, [])
+            self.body(node.right, outer, exists, [])
+        elif node.kind == "query":
+            self.query(node, outer, exists)
+        else:
+            self.select(node, outer, exists, order)
+
+    def select(self, select, outer, exists, order):
+        relations = list(from_relations(select.relations))
+        names = set().union(*(relation_names(relation) for relation in relations))
+        expressions = self.expressions(select)
+
+        if not exists:
+            self.select_star(select)
+        if select.where is not None:
+            self.sargable(select.where, "WHERE")
+        for entry in select.relations:
+            if entry.kind == "join" and entry.on is not None:
+                self.sargable(entry.on, "ON")
+        self.join_predicates(select)
+        self.repeated_expressions(select, order)
+        self.count_distinct(select, relations, expressions)
+        self.windows(expressions)
+
+        for relation in relations:
+            if relation.kind == "derived":
+                self.query(relation.query, outer | names if relation.lateral else outer)
+        scope = outer | names
+        for usage, subquery in self.subqueries(expressions):
+            if usage != "exists":
+                self.correlated(subquery, usage, scope)
+            self.query(subquery.query, scope, usage == "exists")
+
+    def expressions(self, select):
+        """Expressions of a select, in its own scope"""
+        expressions = [item.expression for item in select.items]
+        expressions += [node for node in (select.top, select.where, select.having, select.qualify) if node is not None]
+        expressions += select.group
+        for entry in select.relations:
+            if entry.kind == "join" and entry.on is not None:
+                expressions.append(entry.on)
+        for relation in from_relations(select.relations):
+            if relation.kind == "tablefunc":
+                expressions.append(relation.function)
+        return expressions
+
+    def subqueries(self, expressions):
+        """Subqueries of expressions, and whether they are "scalar", "in" or "exists" ones"""
+        in_lists = set()
+        for expression in expressions:
+            for node in expression.walk(skip=("query",)):
+                if node.kind == "in" and isinstance(node.values, Node):
+                    in_lists.add(id(node.values))
+                elif node.kind == "exists":
+                    yield "exists", node
+                elif node.kind == "subquery":
+                    yield ("in" if id(node) in in_lists else "scalar"), node
+
+    # Rules
+    ####################################################
+    def select_star(self, select):
+        for item in select.items:
+            if item.expression.kind != "star":
+                continue
+            if self.dialect in _COLUMNAR:
+                self.add("select_star", "high", item,
+                         "SELECT * reads and bills every column of a columnar table. "
+                         "List the columns the result needs.")
+            else:
+                self.add("select_star", "medium", item,
+                         "SELECT * reads every column, prevents covering indexes and changes the result "
+                         "when columns are added. List the columns the result needs.")
+
+    def sargable(self, predicate, clause):
+        pruning = _PRUNING.get(self.dialect, "an index")
+        for node in predicate.walk(skip=("query",)):
+            if node.kind == "binary" and node.operator in _COMPARISONS:
+                operands = [node.left, node.right]
+            elif node.kind in ("in", "between"):
+                operands = [node.expression]
+            elif node.kind == "like":
+                operands = [node.expression]
+                pattern = _unwrap(node.pattern)
+                if (pattern.kind == "literal" and isinstance(pattern.value, str)
+                        and pattern.value[:1] in ("%", "_") and _columns(node.expression)):
+                    self.add("non_sargable", "medium", node,
+                             f"{node.operator} with a leading wildcard in {clause} scans every row, "
+                             f"it can't use {pruning}. Anchor the pattern or use a full text index.")
+            else:
+                continue
+            for operand in operands:
+                operand = _unwrap(operand)
+                columns = _columns(operand)
+                if operand.kind in ("column", "literal", "parameter", "subquery") or not columns:
+                    continue
+                if operand.kind == "function" and (operand.window is not None or operand.name in AGGREGATES):
+                    continue
+                column = columns[0].sql()
+                self.add("non_sargable", "medium", node,
+                         f"{column} is transformed in {clause} ({_snippet(operand)}), so the comparison "
+                         f"can't use {pruning} on {column}. Compare the bare column to a transformed "
+                         f"value instead, e.g. a date range rather than YEAR(column).")
+                break
+
+    def join_predicates(self, select):
+        entries = select.relations
+        if len(entries) < 2:
+            return
+        # Union-find of the relations connected by a predicate
+        parents = list(range(len(entries)))
+        index = {}
+        for i, entry in enumerate(entries):
+            for name in relation_names(entry.relation if entry.kind == "join" else entry):
+                index.setdefault(name, i)
+
+        def find(i):
+            while parents[i] != i:
+                parents[i] = parents[parents[i]]
+                i = parents[i]
+            return i
+
+        def union(i, j):
+            parents[find(i)] = find(j)
+
+        def referenced(node):
+            """Relations referred to by the columns of a node, None when one isn't qualified"""
+            found = set()
+            for column in _columns(node):
+                qualifiers = column_qualifiers(column)
+                matches = [index[name] for name in qualifiers if name in index]
+                if not matches:
+                    return None
+                found.add(matches[0])
+            return found
+
+        unknown = False
+        for i, entry in enumerate(entries[1:], start=1):
+            relation = entry.relation
+            if (entry.join_type in ("COMMA",) and relation.kind not in ("tablefunc",)
+                    and not (relation.kind == "derived" and relation.lateral)):
+                continue
+            union(i, i - 1)
+            if entry.join_type in ("CROSS", "CROSS APPLY", "OUTER APPLY") or "NATURAL" in entry.join_type \
+                    or entry.using is not None or relation.kind == "tablefunc":
+                continue
+            if entry.on is None:
+                self.add("missing_join_predicate", "high", entry,
+                         "JOIN without ON pairs every row of both sides. Add the join condition, "
+                         "or write CROSS JOIN when the cartesian product is intended.")
+                continue
+            relations = referenced(entry.on)
+            if relations is None:
+                continue
+            if not _columns(entry.on):
+                self.add("missing_join_predicate", "high", entry,
+                         "The ON clause doesn't compare any column, every row of both sides is paired.")
+            elif i not in relations:
+                self.add("missing_join_predicate", "high", entry,
+                         f"The ON clause doesn't reference the joined relation, every row of "
+                         f"{_snippet(relation)} is paired with the previous ones.")
+            for j in relations:
+                union(i, j)
+
+        comma_joins = [entry for entry in entries[1:] if entry.join_type == "COMMA"]
+        if not comma_joins:
+            return
+        conditions = [node for node in (select.where,) if node is not None]
+        for condition in conditions:
+            for node in condition.walk(skip=("query",)):
+                if node.kind != "binary" or node.operator not in _COMPARISONS:
+                    continue
+                left, right = referenced(node.left), referenced(node.right)
+                if left is None or right is None:
+                    unknown = True
+                    continue
+                for i in left:
+                    for j in right:
+                        union(i, j)
+        if unknown:
+            return
+        for i, entry in enumerate(entries[1:], start=1):
+            if entry.join_type == "COMMA" and find(i) != find(0):
+                self.add("missing_join_predicate", "high", entry,
+                         f"No WHERE condition relates {_snippet(entry.relation)} to the other relations, "
+                         f"the comma join is a cartesian product. Join it with JOIN ... ON.")
+                union(i, 0)
+
+    def correlated(self, subquery, usage, scope):
+        defined, columns = set(), []
+        for node in subquery.query.walk():
+            if node.kind in ("table", "derived", "tablefunc", "nested"):
+                defined |= relation_names(node)
+            elif node.kind == "cte":
+                defined.add(node.name.lower())
+            elif node.kind == "column":
+                columns.append(node)
+        outer = sorted({column.sql() for column in columns
+                        if not defined.intersection(column_qualifiers(column)) and scope.intersection(column_qualifiers(column))})
+        if not outer:
+            return
+        references = ", ".join(outer)
+        if usage == "in":
+            self.add("correlated_subquery", "medium", subquery,
+                     f"The IN subquery depends on the outer query ({references}) and may run once per "
+                     f"outer row. Use EXISTS or a join.")
+        else:
+            self.add("correlated_subquery", "high", subquery,
+                     f"The subquery depends on the outer query ({references}) and runs once per outer "
+                     f"row. Join a grouped derived table or use a window function instead.")
+
+    def repeated_expressions(self, select, order):
+        clauses = [("SELECT", [item.expression for item in select.items]), ("GROUP BY", select.group),
+                   ("HAVING", [select.having] if select.having is not None else []),
+                   ("QUALIFY", [select.qualify] if select.qualify is not None else []),
+                   ("ORDER BY", [item.expression for item in order])]
+        found = {}
+        counts = Counter()
+        for clause, expressions in clauses:
+            for expression in expressions:
+                for node in expression.walk(skip=("query",)):
+                    if (node.kind in ("case", "function", "binary", "cast") and len(node.tokens) >= MIN_REPEATED_TOKENS
+                            and not _is_plain_aggregate(node)):
+                        key = node.key()
+                        counts[key] += 1
+                        found.setdefault(key, (node, []))[1].append(clause)
+        repeated = [key for key, count in counts.items() if count > 1]
+        for key in repeated:
+            if any(other != key and len(other) > len(key) and _contains(other, key) for other in repeated):
+                continue
+            node, where = found[key]
+            message = (f"The same expression is written {counts[key]} times "
+                       f"({', '.join(dict.fromkeys(where))}) and may be evaluated for each.")
+            if "GROUP BY" in where and "SELECT" in where:
+                message += " " + self.group_by_advice(select, key)
+            else:
+                message += " Compute it once in a CTE or a derived table."
+            self.add("repeated_expression", "low", node, message)
+
+    def group_by_advice(self, select, key):
+        for position, item in enumerate(select.items, start=1):
+            if item.expression.key() == key:
+                alias, position = item.alias, position
+                break
+        else:
+            alias, position = None, None
+        if self.dialect in _GROUP_BY_ALIAS and alias:
+            return f"Group by its alias instead: GROUP BY {alias}."
+        if self.dialect in _GROUP_BY_POSITION and position:
+            return f"Group by its position instead: GROUP BY {position}."
+        if self.dialect == "tsql":
+            return ("Compute it once with CROSS APPLY (VALUES (...)) AS v(col) or in a derived table, "
+                    "and group by its column.")
+        return "Compute it once in a CTE or a derived table and group by its column."
+
+    def count_distinct(self, select, relations, expressions):
+        derived = [relation for relation in relations if relation.kind == "derived"]
+        if not derived:
+            return
+        approximate = _APPROX_COUNT_DISTINCT.get(self.dialect)
+        for expression in expressions:
+            for node in expression.walk(skip=("query",)):
+                if node.kind == "function" and node.name == "COUNT" and node.distinct and node.window is None:
+                    name = derived[0].alias or "the derived table"
+                    message = (f"COUNT(DISTINCT) over {name} sorts or hashes again the rows the derived table "
+                               f"already materialized. Aggregate the base table directly")
+                    message += f", or use {approximate} when an estimate is enough." if approximate else "."
+                    self.add("count_distinct_derived", "medium", node, message)
+
+    def windows(self, expressions):
+        for expression in expressions:
+            for node in expression.walk(skip=("query",)):
+                if node.kind != "function" or node.window is None or node.window.reference:
+                    continue
+                window = node.window
+                frame = window.frame
+                aggregate = node.name in AGGREGATES
+                if aggregate and frame and frame["start"] == "UNBOUNDED PRECEDING" \
+                        and frame["end"] == "UNBOUNDED FOLLOWING":
+                    if window.order:
+                        self.add("unbounded_window", "medium", node,
+                                 "The frame covers the whole partition, its ORDER BY sorts the rows for "
+                                 "nothing. Drop the ORDER BY and the frame.")
+                elif aggregate and window.order and (frame is None or (
+                        frame["unit"] == "RANGE" and frame["start"] == "UNBOUNDED PRECEDING")):
+                    if self.dialect == "redshift" and frame is None:
+                        message = ("Redshift requires a frame clause for an aggregate window function "
+                                   "with ORDER BY. ")
+                    else:
+                        message = ("The frame defaults to RANGE BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW, "
+                                   if frame is None else "A RANGE frame ")
+                        message += "compares the peer rows of every row and may spill to disk. "
+                    message += "Use ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW for a running total."
+                    self.add("unbounded_window", "medium", node, message)
+                if not window.partition and (window.order or frame):
+                    self.add("unbounded_window", "medium" if self.dialect in _COLUMNAR else "low", node,
+                             "Without PARTITION BY, every row is sorted in a single partition, "
+                             "by a single worker. Partition the window when the logic allows it.")
+
+
+@metrics.timed("sql_check_seconds")
+def check_sql(sql, dialect="ansi"):
+    """
+    Performance anti-patterns of a SQL snippet
+        :param sql: SQL snippet
+        :type sql: str
+        :param dialect: Value of ``DIALECTS``
+        :type dialect: str
+        :return: Findings with their "rule", "severity", "line", "message"
+            and the code they are about, "snippet", in the order of the lines
+        :rtype: list
+    """
+    parsed = parse_sql(sql, dialect)
+    checker = _Checker(dialect)
+    for query in parsed.queries:
+        checker.query(query)
+    for error in parsed.errors:
+        checker.findings.append({"rule": "syntax_error", "severity": "low", "line": error.line,
+                                 "message": f"The statement couldn't be parsed: {error}", "snippet": ""})
+    findings = []
+    seen = set()
+    for finding in checker.findings:
+        key = (finding["rule"], finding["line"], finding["message"])
+        if key not in seen:
+            seen.add(key)
+            findings.append(finding)
+    return sorted(findings, key=lambda finding: (finding["line"] or 0, SEVERITIES.index(finding["severity"])))
+
+
+def format_sql_findings(findings):
+    """
+    Findings as text lines for the prompt, without the statements that
+    couldn't be parsed
+        :param findings: Result of ``check_sql``
+        :type findings: list
+        :rtype: str
+    """
+    lines = []
+    for finding in findings:
+        if finding["rule"] == "syntax_error":
+            continue
+        lines.append(f"- Line {finding['line']}, {RULES[finding['rule']]} ({finding['severity']}): "
+                     f"{finding['message']}")
+    return "\n".join(lines)
@@ -0,0 +1,280 @@
+"""Benchmark of a query and its proposed rewrite on synthetic tables.
+
+The schema is inferred from both snippets and filled with the same
+synthetic rows, in an embedded engine close to the dialect: DuckDB when it
+is installed for the analytical dialects, SQLite otherwise and for the
+transactional ones (MySQL, SQL Server), with an index on every join key
+and filtered column as their schemas usually have. Both queries run a few
+times; their results are compared regardless of the order of the rows, and
+their plans and timings are reported side by side.
+"""
+import contextlib
+import datetime
+import decimal
+import re
+import sqlite3
+import statistics
+import threading
+import time
+from collections import Counter
+
+import pandas as pd
+
+from sqlcheck.parser import parse_sql
+from sqlcheck.schema import infer_schema, generate_tables
+from sqlcheck.translate import quote, declared_values, translate_query
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+# Rows per table offered by the app
+SCALES = (1_000, 10_000, 100_000, 1_000_000)
+DEFAULT_ROWS = 10_000
+# Runs of each query, the first one warms the engine up
+REPEAT = 3
+# Seconds a query may run before it is interrupted
+TIMEOUT = 30
+# Rows only in one of the results reported
+MAX_DIFFERENCES = 5
+# Local engine closest to every dialect, in order of preference
+LOCAL_ENGINES = {
+    "ansi": ("duckdb", "sqlite"),
+    "postgres": ("duckdb", "sqlite"),
+    "bigquery": ("duckdb", "sqlite"),
+    "athena": ("duckdb", "sqlite"),
+    "redshift": ("duckdb", "sqlite"),
+    "mysql": ("sqlite", "duckdb"),
+    "tsql": ("sqlite", "duckdb"),
+}
+_SQL_TYPES = {
+    "sqlite": {"integer": "INTEGER", "real": "REAL", "text": "TEXT", "date": "TEXT", "boolean": "INTEGER"},
+    "duckdb": {"integer": "BIGINT", "real": "DOUBLE", "text": "VARCHAR", "date": "DATE", "boolean": "BOOLEAN"},
+}
+_CODE_BLOCK = re.compile(r"```[ \t]*(\w*)[^\n]*\n(.*?)```", re.DOTALL)
+
+
+def local_engine(dialect):
+    """
+    Embedded engine closest to a dialect among those installed
+        :param dialect: Value of ``DIALECTS``
+        :type dialect: str
+        :return: "duckdb" or "sqlite"
+        :rtype: str
+    """
+    for engine in LOCAL_ENGINES.get(dialect, ("duckdb", "sqlite")):
+        if engine == "sqlite" or duckdb is not None:
+            return engine
+
+
+def extract_sql(text):
+    """
+    Code proposed in an answer of the LLM: its last code block with a SELECT
+        :param text: Answer in Markdown
+        :type text: str
+        :return: SQL code, None when the answer has none
+        :rtype: str
+    """
+    blocks = [code.strip() for language, code in _CODE_BLOCK.findall(text or "")
+              if language.lower() in ("", "sql") and re.search(r"\bselect\b", code, re.IGNORECASE)]
+    return blocks[-1] if blocks else None
+
+
+def _normalize(value):
+    # Equal values from different expressions, e.g. 2 and 2.0000000001
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (int, float, decimal.Decimal)):
+        return round(float(value), 6) + 0.0
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return value
+
+
+def compare_results(first, second):
+    """
+    Whether two results have the same rows, in any order
+        :param first: Rows of the first result
+        :type first: list
+        :param second: Rows of the second result
+        :type second: list
+        :return: Whether they are equal, and a few rows only in the first
+            and only in the second result
+        :rtype: tuple
+    """
+    first = Counter(tuple(_normalize(value) for value in row) for row in first)
+    second = Counter(tuple(_normalize(value) for value in row) for row in second)
+    if first == second:
+        return True, [], []
+    only_first = list((first - second).elements())[:MAX_DIFFERENCES]
+    only_second = list((second - first).elements())[:MAX_DIFFERENCES]
+    return False, only_first, only_second
+
+
+class Sandbox:
+    """
+    In-memory database of an embedded engine loaded with tables
+    """
+    def __init__(self, engine, tables, indexes=()):
+        """
+        :param engine: "sqlite" or "duckdb"
+        :type engine: str
+        :param tables: Result of ``generate_tables``
+        :type tables: dict
+        :param indexes: Table and column of every index to create
+        :type indexes: list
+        """
+        self.engine = engine
+        if engine == "duckdb":
+            self.connection = duckdb.connect(":memory:")
+        else:
+            self.connection = sqlite3.connect(":memory:", check_same_thread=False)
+        for name, (columns, values) in tables.items():
+            self.load(name, columns, values)
+        for i, (table, column) in enumerate(indexes):
+            self.connection.execute(f"CREATE INDEX index_{i} ON {quote(table)} ({quote(column)})")
+
+    def load(self, name, columns, values):
+        types = _SQL_TYPES[self.engine]
+        definition = ", ".join(f"{quote(column)} {types[data_type]}" for column, data_type in columns)
+        self.connection.execute(f"CREATE TABLE {quote(name)} ({definition})")
+        if self.engine == "duckdb":
+            # Loaded column-wise, much faster than row by row
+            frame = pd.DataFrame({f"c{i}": column for i, column in enumerate(values)})
+            self.connection.register("synthetic_rows", frame)
+            self.connection.execute(f"INSERT INTO {quote(name)} SELECT * FROM synthetic_rows")
+            self.connection.unregister("synthetic_rows")
+        else:
+            placeholders = ", ".join("?" * len(columns))
+            self.connection.executemany(f"INSERT INTO {quote(name)} VALUES ({placeholders})", zip(*values))
+            self.connection.execute("ANALYZE")
+
+    @contextlib.contextmanager
+    def deadline(self, timeout):
+        """Interrupt the queries running after ``timeout`` seconds"""
+        if self.engine == "duckdb":
+            timer = threading.Timer(timeout, self.connection.interrupt)
+            timer.start()
+            try:
+                yield
+            finally:
+                timer.cancel()
+        else:
+            end = time.monotonic() + timeout
+            self.connection.set_progress_handler(lambda: time.monotonic() > end, 10_000)
+            try:
+                yield
+            finally:
+                self.connection.set_progress_handler(None, 0)
+
+    def run(self, statements, repeat=REPEAT, timeout=TIMEOUT):
+        """
+        Run statements a few times
+            :param statements: SQL and values of its parameters, see ``translate_query``
+            :type statements: list
+            :return: Column names and rows of the last statement, and the
+                seconds of every run
+            :rtype: tuple
+        """
+        seconds = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            with self.deadline(timeout):
+                for sql, values in statements:
+                    cursor = self.connection.execute(sql, values)
+                    rows = cursor.fetchall()
+            seconds.append(time.perf_counter() - start)
+        columns = [column[0] for column in cursor.description or ()]
+        return columns, rows, seconds
+
+    def plan(self, sql, values):
+        """
+        Query plan of a statement, as text
+            :rtype: str
+        """
+        if self.engine == "duckdb":
+            rows = self.connection.execute("EXPLAIN " + sql, values).fetchall()
+            return "\n".join(row[-1] for row in rows)
+        depths = {0: -1}
+        lines = []
+        for node_id, parent, _, detail in self.connection.execute("EXPLAIN QUERY PLAN " + sql, values):
+            depths[node_id] = depths.get(parent, -1) + 1
+            lines.append("  " * depths[node_id] + detail)
+        return "\n".join(lines)
+
+    def close(self):
+        self.connection.close()
+
+
+def benchmark_queries(original, proposed, dialect="ansi", rows=DEFAULT_ROWS, repeat=REPEAT, seed=0,
+                      timeout=TIMEOUT):
+    """
+    Run a query and its proposed rewrite on the same synthetic tables
+        :param original: SQL snippet under analysis
+        :type original: str
+        :param proposed: SQL snippet proposed to replace it
+        :type proposed: str
+        :param dialect: Value of ``DIALECTS``
+        :type dialect: str
+        :param rows: Rows per table
+        :type rows: int
+        :param repeat: Runs of each snippet
+        :type repeat: int
+        :param seed: Seed of the synthetic rows
+        :type seed: int
+        :param timeout: Seconds a run may take
+        :type timeout: float
+        :return: "engine", inferred "schema", the "original" and "proposed"
+            runs with their translated "sql", "columns", "rows", "seconds",
+            "plan" and "error", whether they are "equivalent" (None when one
+            failed) and the rows "only_original" and "only_proposed"
+        :rtype: dict
+    """
+    engine = local_engine(dialect)
+    parameters = declared_values(original, dialect)
+    parameters.update(declared_values(proposed, dialect))
+    parsed = {"original": parse_sql(original, dialect), "proposed": parse_sql(proposed, dialect)}
+    schema = infer_schema(parsed["original"].queries + parsed["proposed"].queries, parameters)
+    indexes = schema.indexed_columns() if engine == "sqlite" else ()
+    report = {"engine": engine, "rows_per_table": rows, "schema": schema.describe(), "equivalent": None,
+              "only_original": [], "only_proposed": []}
+
+    results = {}
+    sandbox = Sandbox(engine, generate_tables(schema, rows, seed), indexes)
+    try:
+        for name, snippet in parsed.items():
+            run = report[name] = {"sql": "", "columns": [], "rows": None, "seconds": [], "plan": "", "error": None}
+            if snippet.errors:
+                run["error"] = f"The code couldn't be parsed: {snippet.errors[0]}"
+                continue
+            if not snippet.queries:
+                run["error"] = "The code has no SELECT statement."
+                continue
+            statements = [translate_query(query, engine, parameters) for query in snippet.queries]
+            run["sql"] = ";\n".join(sql for sql, _ in statements)
+            try:
+                run["plan"] = sandbox.plan(*statements[-1])
+                run["columns"], results[name], run["seconds"] = sandbox.run(statements, repeat, timeout)
+            except Exception as e:
+                # Whatever the engine raises: syntax it doesn't support, interruption...
+                run["error"] = f"{engine} can't run it: {e}"
+                continue
+            run["rows"] = len(results[name])
+    finally:
+        sandbox.close()
+
+    if len(results) == 2:
+        report["equivalent"], report["only_original"], report["only_proposed"] = compare_results(
+            results["original"], results["proposed"])
+    return report
+
+
+def median_seconds(run):
+    """
+    Median of the runs of a query, None when it didn't run
+        :param run: "original" or "proposed" of ``benchmark_queries``
+        :type run: dict
+        :rtype: float
+    """
+    return statistics.median(run["seconds"]) if run["seconds"] else None
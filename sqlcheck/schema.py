@@ -0,0 +1,444 @@
+"""Schema of the tables a SQL snippet reads, and synthetic rows for them.
+
+The tables and columns are those the queries refer to. Their types are
+guessed from how the columns are used (compared to a number, a string or a
+date, summed, passed to YEAR()...) and then from their names. The literals
+a column is compared to are among its generated values, so the filters keep
+rows, and the columns joined together draw from the same keys, so the
+joins match.
+"""
+import datetime
+import re
+from collections import Counter
+
+import numpy as np
+
+from sqlcheck.parser import from_relations, relation_names, column_qualifiers
+
+TYPES = ("integer", "real", "text", "date", "boolean")
+# Distinct values of a text column, besides its literals
+TEXT_VALUES = 50
+# Rows sharing a value of a join key, on average, when no side is unique
+KEY_FANOUT = 4
+# Rows taking one of the literals of their column
+LITERAL_FRACTION = 0.1
+NULL_FRACTION = 0.01
+FIRST_DATE = datetime.date(2020, 1, 1)
+DATE_DAYS = 5 * 365
+
+_COMPARISONS = frozenset(("=", "==", "<>", "!=", "<", ">", "<=", ">="))
+_ARITHMETIC = frozenset(("+", "-", "*", "/", "%"))
+_DATE_FUNCTIONS = frozenset("""
+YEAR MONTH DAY QUARTER WEEK DATE_TRUNC DATE_PART DATEPART DATENAME DATEADD DATEDIFF DATE_ADD DATE_SUB
+DATE_DIFF EXTRACT TO_CHAR STRFTIME FORMAT_DATE LAST_DAY EOMONTH
+""".split())
+# Date functions whose first argument is the unit, e.g. DATEADD(day, 1, d)
+_DATE_PART_FUNCTIONS = frozenset(("DATEADD", "DATEDIFF", "DATEPART", "DATENAME"))
+_NUMERIC_FUNCTIONS = frozenset("SUM AVG ROUND FLOOR CEIL CEILING ABS STDDEV VARIANCE".split())
+_TEXT_FUNCTIONS = frozenset("UPPER LOWER TRIM LTRIM RTRIM SUBSTRING SUBSTR LENGTH LEN CONCAT REPLACE LEFT RIGHT".split())
+_DATE_LITERAL = re.compile(r"\d{4}-\d{2}-\d{2}")
+# Words of a column name hinting at its type
+_NAME_HINTS = (
+    ("date", ("date", "time", "_at", "day")),
+    ("real", ("price", "salary", "amount", "cost", "total", "rate", "pct", "ratio", "score", "avg", "skew")),
+    ("text", ("name", "category", "type", "code", "status", "email", "city", "country", "host", "grp", "product",
+              "description", "title", "label", "department")),
+)
+
+
+def _type_from_name(name):
+    lower = name.lower()
+    if lower.endswith("id") or lower.endswith("_key") or lower == "year":
+        return "integer"
+    if lower.startswith("is_") or lower.startswith("has_") or re.match(r"(is|has)[A-Z]", name):
+        return "boolean"
+    for data_type, hints in _NAME_HINTS:
+        if any(hint in lower for hint in hints):
+            return data_type
+    return "integer"
+
+
+def _literal(node, parameters):
+    """Type and value of a literal, None when the node isn't one"""
+    sign = 1
+    if node.kind == "unary" and node.operator == "-":
+        sign, node = -1, node.operand
+    if node.kind == "parameter":
+        value = parameters.get(node.name.lower())
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return ("integer" if isinstance(value, int) else "real"), sign * value
+        return None if value is None else ("text", value)
+    if node.kind != "literal" or node.value is None:
+        return None
+    if isinstance(node.value, bool):
+        return "boolean", node.value
+    token = node.tokens[0]
+    if token.kind == "number":
+        number = float(node.value)
+        if number.is_integer() and "." not in node.value and "e" not in node.value.lower():
+            return "integer", sign * int(number)
+        return "real", sign * number
+    if token.kind == "name" or _DATE_LITERAL.fullmatch(node.value[:10]):
+        return "date", node.value[:10]
+    return "text", node.value
+
+
+def _rename(outputs, columns):
+    """Output columns of a relation renamed by its column list, e.g. AS t(a, b)"""
+    if not columns:
+        return outputs
+    sources = list(outputs.values()) if outputs else []
+    return {column.lower(): sources[i] if i < len(sources) else None for i, column in enumerate(columns)}
+
+
+class Column:
+    """
+    Column of an inferred table, with the types its uses vote for, the
+    literals it is compared to and the columns it is joined with
+    """
+    def __init__(self, table, name):
+        self.table = table
+        self.name = name
+        self.votes = Counter()
+        self.literals = []
+        self.group = None
+
+    @property
+    def type(self):
+        """
+        Type voted for the most by the uses, then the one of the name
+            :rtype: str
+        """
+        votes = Counter(self.votes)
+        votes[_type_from_name(self.name)] += 0.5
+        return max(TYPES, key=lambda data_type: votes[data_type])
+
+    @property
+    def unique(self):
+        return self.name.lower() == "id"
+
+
+class Table:
+    """Table of an inferred schema and its columns by lower case name"""
+    def __init__(self, name):
+        self.name = name
+        self.columns = {}
+
+    def column(self, name):
+        key = name.lower()
+        if key not in self.columns:
+            self.columns[key] = Column(self, name)
+        return self.columns[key]
+
+
+class Schema:
+    """
+    Tables read by the queries of a snippet, by lower case name
+    """
+    def __init__(self):
+        self.tables = {}
+
+    def table(self, parts):
+        name = ".".join(parts)
+        if name.lower() not in self.tables:
+            self.tables[name.lower()] = Table(name)
+        return self.tables[name.lower()]
+
+    def link(self, first, second):
+        """Columns joined together, their values come from the same keys"""
+        if first.group is not None and first.group is second.group:
+            return
+        group = (first.group or [first]) + (second.group or [second])
+        for column in group:
+            column.group = group
+
+    def indexed_columns(self):
+        """
+        Columns joined or compared to a literal, those a transactional
+        schema would index
+            :return: Table and column names
+            :rtype: list
+        """
+        return [(table.name, column.name) for table in self.tables.values() for column in table.columns.values()
+                if column.group is not None or column.literals or column.unique]
+
+    def describe(self):
+        """
+        Every column with its table, type and whether it is a join key
+            :rtype: list
+        """
+        return [{"table": table.name, "column": column.name, "type": column.type, "key": column.group is not None}
+                for table in self.tables.values() for column in table.columns.values()]
+
+
+class _Scope:
+    """Relations of a select: their names, base table or output columns"""
+    def __init__(self, parent):
+        self.parent = parent
+        self.entries = []
+        self.aliases = set()
+
+
+class _Inference:
+    def __init__(self, schema, parameters):
+        self.schema = schema
+        self.parameters = parameters
+
+    def query(self, query, parent, ctes):
+        """
+        Find the columns of a query, return its output columns by lower case
+        name with the base column they come from, None when unknown
+        """
+        ctes = dict(ctes)
+        for cte in query.ctes:
+            outputs = self.query(cte.query, parent, ctes)
+            ctes[cte.name.lower()] = _rename(outputs, cte.columns)
+        return self.body(query.body, parent, ctes, query.order)
+
+    def body(self, node, parent, ctes, order):
+        if node.kind == "setop":
+            outputs = self.body(node.left, parent, ctes, [])
+            self.body(node.right, parent, ctes, [])
+            return outputs
+        if node.kind == "query":
+            return self.query(node, parent, ctes)
+        return self.select(node, parent, ctes, order)
+
+    def select(self, select, parent, ctes, order):
+        scope = _Scope(parent)
+        for entry in select.relations:
+            relation = entry.relation if entry.kind == "join" else entry
+            for inner in from_relations([relation]):
+                self.relation(inner, scope, parent, ctes)
+            if entry.kind == "join" and entry.using:
+                self.using(entry.using, scope)
+        scope.aliases = {item.alias.lower() for item in select.items if item.alias}
+
+        expressions = [item.expression for item in select.items] + select.group
+        expressions += [node for node in (select.top, select.where, select.having, select.qualify) if node is not None]
+        expressions += [entry.on for entry in select.relations if entry.kind == "join" and entry.on is not None]
+        expressions += [relation.function for relation in from_relations(select.relations)
+                        if relation.kind == "tablefunc"]
+        expressions += [item.expression for item in order]
+        for expression in expressions:
+            self.expression(expression, scope, ctes)
+
+        outputs = {}
+        for item in select.items:
+            expression = item.expression
+            if expression.kind == "star":
+                return None
+            source = self.resolve(expression, scope, through=True) if expression.kind == "column" else None
+            if item.alias:
+                outputs[item.alias.lower()] = source
+            elif expression.kind == "column":
+                outputs[expression.parts[-1].lower()] = source
+        return outputs
+
+    def relation(self, relation, scope, parent, ctes):
+        names = relation_names(relation)
+        if relation.kind == "table":
+            name = ".".join(relation.parts).lower()
+            if len(relation.parts) == 1 and name in ctes:
+                scope.entries.append((names, None, ctes[name]))
+            else:
+                scope.entries.append((names, self.schema.table(relation.parts), None))
+        elif relation.kind == "derived":
+            outputs = self.query(relation.query, scope if relation.lateral else parent, ctes)
+            scope.entries.append((names, None, _rename(outputs, relation.columns)))
+        else:
+            scope.entries.append((names, None, _rename({}, relation.columns)))
+
+    def using(self, columns, scope):
+        tables = [table for _, table, _ in scope.entries if table is not None]
+        if len(tables) < 2 or scope.entries[-1][1] is None:
+            return
+        for name in columns:
+            self.schema.link(tables[0].column(name), tables[-1].column(name))
+
+    def resolve(self, column, scope, through=False):
+        """
+        Column of a base table a column node refers to, None for the other
+        relations unless ``through`` them to the base column they select
+        """
+        parts = column.parts
+        if len(parts) > 1:
+            qualifiers = set(column_qualifiers(column))
+            while scope is not None:
+                for names, table, outputs in scope.entries:
+                    if names & qualifiers:
+                        if table is not None:
+                            return table.column(parts[-1])
+                        return outputs.get(parts[-1].lower()) if through and outputs else None
+                scope = scope.parent
+            return None
+        name = parts[0].lower()
+        while scope is not None:
+            if name in scope.aliases:
+                return None
+            for _, table, outputs in scope.entries:
+                if table is None and (outputs is None or name in outputs):
+                    return outputs.get(name) if through and outputs else None
+            tables = [table for _, table, _ in scope.entries if table is not None]
+            if tables:
+                for table in tables:
+                    if name in table.columns:
+                        return table.columns[name]
+                return tables[0].column(parts[0])
+            scope = scope.parent
+        return None
+
+    def vote(self, node, data_type, scope):
+        while node.kind == "paren":
+            node = node.expression
+        if node.kind == "column":
+            column = self.resolve(node, scope, through=True)
+            if column is not None:
+                column.votes[data_type] += 1
+
+    def compare(self, left, right, scope, equality):
+        while left.kind == "paren":
+            left = left.expression
+        while right.kind == "paren":
+            right = right.expression
+        if right.kind == "column" and left.kind != "column":
+            left, right = right, left
+        if left.kind != "column":
+            return
+        column = self.resolve(left, scope, through=True)
+        if column is None:
+            return
+        if right.kind == "column":
+            other = self.resolve(right, scope, through=True)
+            if equality and other is not None and other.table is not column.table:
+                self.schema.link(column, other)
+            return
+        literal = _literal(right, self.parameters)
+        if literal is not None:
+            column.votes[literal[0]] += 1
+            column.literals.append(literal)
+
+    def expression(self, node, scope, ctes):
+        kind = node.kind
+        if kind == "query":
+            self.query(node, scope, ctes)
+            return
+        if kind == "column":
+            self.resolve(node, scope)
+            return
+        children = list(node.children())
+        if kind == "binary" and node.operator in _COMPARISONS:
+            self.compare(node.left, node.right, scope, node.operator in ("=", "=="))
+        elif kind == "binary" and node.operator in _ARITHMETIC:
+            self.vote(node.left, "real", scope)
+            self.vote(node.right, "real", scope)
+        elif kind == "binary" and node.operator == "||":
+            self.vote(node.left, "text", scope)
+            self.vote(node.right, "text", scope)
+        elif kind == "between":
+            self.compare(node.expression, node.low, scope, False)
+            self.compare(node.expression, node.high, scope, False)
+        elif kind == "in" and isinstance(node.values, list):
+            for value in node.values:
+                self.compare(node.expression, value, scope, True)
+        elif kind == "like":
+            self.vote(node.expression, "text", scope)
+        elif kind == "function":
+            arguments = node.arguments
+            if node.name in _DATE_PART_FUNCTIONS and arguments and arguments[0].kind == "column":
+                # The unit isn't a column
+                children = [child for child in children if child is not arguments[0]]
+                arguments = arguments[1:]
+            data_type = ("date" if node.name in _DATE_FUNCTIONS else "real" if node.name in _NUMERIC_FUNCTIONS
+                         else "text" if node.name in _TEXT_FUNCTIONS else None)
+            if data_type is not None:
+                for argument in arguments:
+                    self.vote(argument, data_type, scope)
+        for child in children:
+            self.expression(child, scope, ctes)
+
+
+def infer_schema(queries, parameters=None):
+    """
+    Tables and columns read by queries
+        :param queries: "query" nodes, see ``parse_sql``
+        :type queries: list
+        :param parameters: Values of the variables and parameters by lower
+            case name, e.g. those of DECLARE statements
+        :type parameters: dict
+        :rtype: Schema
+    """
+    schema = Schema()
+    inference = _Inference(schema, parameters or {})
+    for query in queries:
+        inference.query(query, None, {})
+    for table in schema.tables.values():
+        if not table.columns:
+            # Only counted, e.g. SELECT COUNT(*) FROM t
+            table.column("id")
+    return schema
+
+
+def _values(column, rows, rng):
+    data_type = column.type
+    key = column.group is not None or column.unique
+    # The literals of a join key are those of every column it is joined with
+    literals = [value for other in (column.group or [column]) for literal_type, value in other.literals
+                if literal_type == data_type]
+    if key:
+        if column.unique:
+            values = rng.permutation(rows) + 1
+        else:
+            size = rows if any(other.unique for other in column.group) else max(1, rows // KEY_FANOUT)
+            values = rng.integers(1, size + 1, rows)
+        values = values.tolist()
+        if data_type == "text":
+            values = [f"k{value}" for value in values]
+    elif data_type in ("integer", "real"):
+        low, high = (min(literals), max(literals)) if literals else (0, 1000)
+        span = max(high - low, abs(high), 1)
+        low, high = (max(0, low - span) if low >= 0 else low - span), high + span
+        values = rng.uniform(low, high, rows)
+        values = np.rint(values).astype(np.int64) if data_type == "integer" else np.round(values, 2)
+        values = values.tolist()
+    elif data_type == "text":
+        vocabulary = [f"{column.name}_{i}" for i in range(min(TEXT_VALUES, rows))] + literals
+        values = [vocabulary[i] for i in rng.integers(0, len(vocabulary), rows).tolist()]
+    elif data_type == "date":
+        first = min([FIRST_DATE] + [datetime.date.fromisoformat(value) for value in literals])
+        last = max([FIRST_DATE + datetime.timedelta(days=DATE_DAYS)]
+                   + [datetime.date.fromisoformat(value) for value in literals])
+        days = rng.integers(0, (last - first).days + 1, rows).tolist()
+        values = [(first + datetime.timedelta(days=day)).isoformat() for day in days]
+    else:
+        values = (rng.random(rows) < 0.5).tolist()
+
+    if literals and not column.unique:
+        for i in np.flatnonzero(rng.random(rows) < LITERAL_FRACTION).tolist():
+            values[i] = literals[i % len(literals)]
+    if not column.unique:
+        # Missing foreign keys too, NOT IN and NOT EXISTS differ on them
+        for i in np.flatnonzero(rng.random(rows) < NULL_FRACTION).tolist():
+            values[i] = None
+    return values
+
+
+def generate_tables(schema, rows, seed=0):
+    """
+    Synthetic rows of every table of a schema
+        :param schema: Result of ``infer_schema``
+        :type schema: Schema
+        :param rows: Rows per table
+        :type rows: int
+        :param seed: Seed of the generator, the same seed gives the same rows
+        :type seed: int
+        :return: Names and types of the columns, and their values, by table name
+        :rtype: dict
+    """
+    rng = np.random.default_rng(seed)
+    tables = {}
+    for table in schema.tables.values():
+        columns = list(table.columns.values())
+        tables[table.name] = ([(column.name, column.type) for column in columns],
+                              [_values(column, rows, rng) for column in columns])
+    return tables
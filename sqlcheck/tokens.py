@@ -0,0 +1,181 @@
+"""Dialect-aware tokenizer of SQL snippets.
+
+Dialects differ in how identifiers are quoted (double quotes, backticks or
+brackets), whether double quotes delimit strings, which comments are
+allowed and how variables are written. Those differences are handled here,
+so the parser sees the same tokens for every dialect.
+"""
+import re
+
+# Select box option of the app to dialect
+DIALECTS = {
+    "SQL": "ansi",
+    "PostgreSQL": "postgres",
+    "MySQL": "mysql",
+    "GCP BigQuery": "bigquery",
+    "Azure SQL Server": "tsql",
+    "Amazon Athena": "athena",
+    "Amazon Redshift": "redshift",
+}
+
+KEYWORDS = frozenset("""
+ALL AND ANY APPLY AS ASC BETWEEN BY CASE CAST CROSS CURRENT DESC DISTINCT ELSE END ESCAPE EXCEPT EXISTS
+FETCH FILTER FIRST FOLLOWING FROM FULL GROUP GROUPS HAVING ILIKE IN INNER INTERSECT INTERVAL IS JOIN
+LATERAL LEFT LIKE LIMIT MINUS NATURAL NEXT NOT NULL NULLS OFFSET ON ONLY OR ORDER OUTER OVER PARTITION
+PRECEDING QUALIFY RANGE RIGHT ROW ROWS SELECT THEN TOP UNBOUNDED UNION USING WHEN WHERE WINDOW WITH
+""".split())
+
+# Identifier quotes and whether double quotes are strings, per dialect
+_IDENTIFIER_QUOTES = {
+    "mysql": "`",
+    "bigquery": "`",
+    "tsql": '"[',
+}
+_DOUBLE_QUOTED_STRINGS = frozenset(("mysql", "bigquery"))
+_HASH_COMMENTS = frozenset(("mysql",))
+_OPERATORS = ("::", "<=", ">=", "<>", "!=", "||", "=>", "==", "=", "<", ">", "+", "-", "*", "/", "%",
+              "(", ")", ",", ".", ";", "[", "]", "?", ":", "&", "|", "^", "~")
+_NUMBER = re.compile(r"(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?")
+_WORD = re.compile(r"[A-Za-z_À-￿][\w$À-￿]*")
+_VARIABLE = re.compile(r"@@?[\w$]+")
+
+
+class SQLSyntaxError(ValueError):
+    """A snippet that can't be tokenized or parsed"""
+    def __init__(self, message, line=None):
+        super().__init__(message if line is None else f"{message} (line {line})")
+        self.line = line
+
+
+class Token:
+    """
+    Token of a snippet: its kind ("keyword", "name", "quoted", "string",
+    "number", "variable" or "op"), its value and its line
+    """
+    __slots__ = ("kind", "value", "line")
+
+    def __init__(self, kind, value, line):
+        self.kind = kind
+        self.value = value
+        self.line = line
+
+    def __repr__(self):
+        return f"Token({self.kind}, {self.value!r})"
+
+    def text(self):
+        """Normalized text, keywords in upper case"""
+        if self.kind == "string":
+            return "'" + self.value.replace("'", "''") + "'"
+        if self.kind == "quoted":
+            return '"' + self.value + '"'
+        return self.value
+
+
+def _quoted(sql, start, close, line):
+    # Closing quote doubled to escape it
+    end = start + 1
+    value = []
+    while True:
+        index = sql.find(close, end)
+        if index < 0:
+            raise SQLSyntaxError("Unterminated quote", line)
+        value.append(sql[end:index])
+        if sql.startswith(close * 2, index) and close != "]":
+            value.append(close)
+            end = index + 2
+            continue
+        return "".join(value), index + 1
+
+
+def tokenize(sql, dialect="ansi"):
+    """
+    Tokens of a snippet, without whitespace and comments
+        :param sql: SQL snippet
+        :type sql: str
+        :param dialect: Value of ``DIALECTS``
+        :type dialect: str
+        :rtype: list
+    """
+    identifier_quotes = _IDENTIFIER_QUOTES.get(dialect, '"')
+    if dialect not in _DOUBLE_QUOTED_STRINGS and '"' not in identifier_quotes:
+        identifier_quotes += '"'
+    tokens = []
+    position, line, length = 0, 1, len(sql)
+    while position < length:
+        char = sql[position]
+        if char.isspace():
+            line += char == "\n"
+            position += 1
+        elif sql.startswith("--", position) or (char == "#" and dialect in _HASH_COMMENTS):
+            end = sql.find("\n", position)
+            position = length if end < 0 else end
+        elif sql.startswith("/*", position):
+            end = sql.find("*/", position + 2)
+            if end < 0:
+                raise SQLSyntaxError("Unterminated comment", line)
+            line += sql.count("\n", position, end)
+            position = end + 2
+        elif char == "'" or (char == '"' and dialect in _DOUBLE_QUOTED_STRINGS):
+            value, end = _quoted(sql, position, char, line)
+            tokens.append(Token("string", value, line))
+            line += sql.count("\n", position, end)
+            position = end
+        elif char in "Nn" and sql.startswith("'", position + 1) and dialect == "tsql":
+            # Unicode string literal
+            value, end = _quoted(sql, position + 1, "'", line)
+            tokens.append(Token("string", value, line))
+            position = end
+        elif char in identifier_quotes:
+            value, end = _quoted(sql, position, "]" if char == "[" else char, line)
+            tokens.append(Token("quoted", value, line))
+            position = end
+        elif char.isdigit() or (char == "." and position + 1 < length and sql[position + 1].isdigit()):
+            match = _NUMBER.match(sql, position)
+            tokens.append(Token("number", match.group(), line))
+            position = match.end()
+        elif char == "@" and _VARIABLE.match(sql, position):
+            match = _VARIABLE.match(sql, position)
+            tokens.append(Token("variable", match.group(), line))
+            position = match.end()
+        elif _WORD.match(sql, position):
+            word = _WORD.match(sql, position).group()
+            upper = word.upper()
+            if upper in KEYWORDS:
+                tokens.append(Token("keyword", upper, line))
+            else:
+                tokens.append(Token("name", word, line))
+            position += len(word)
+        else:
+            for operator in _OPERATORS:
+                if sql.startswith(operator, position):
+                    tokens.append(Token("op", operator, line))
+                    position += len(operator)
+                    break
+            else:
+                raise SQLSyntaxError(f"Unexpected character {char!r}", line)
+    return tokens
+
+
+def split_statements(tokens, dialect="ansi"):
+    """
+    Statements of a snippet, split on semicolons and on the GO batch
+    separator of SQL Server
+        :param tokens: Result of ``tokenize``
+        :type tokens: list
+        :param dialect: Value of ``DIALECTS``
+        :type dialect: str
+        :return: Tokens of every non-empty statement
+        :rtype: list
+    """
+    statements, current = [], []
+    for token in tokens:
+        if (token.kind == "op" and token.value == ";") or (
+                dialect == "tsql" and token.kind == "name" and token.value.upper() == "GO"):
+            if current:
+                statements.append(current)
+            current = []
+        else:
+            current.append(token)
+    if current:
+        statements.append(current)
+    return statements
@@ -0,0 +1,231 @@
+"""Translation of parsed queries to the SQL of a local engine.
+
+The queries are printed back from their tokens, and only the nodes the
+local engine doesn't understand are rewritten: TOP and FETCH become LIMIT,
+the variables become bound parameters, the tables of other schemas become
+quoted names, and the functions and casts of the dialect become those of
+SQLite or DuckDB. What can't be translated (ARRAY, UNNEST of structures...)
+is left as is, for the engine to report.
+"""
+from sqlcheck.tokens import split_statements, tokenize
+
+ENGINES = ("duckdb", "sqlite")
+# Value bound to a variable that isn't declared in the snippet
+DEFAULT_PARAMETER = 1
+
+_RENAMED = {
+    "sqlite": {"NVL": "COALESCE", "ISNULL": "IFNULL", "GREATEST": "MAX", "LEAST": "MIN", "LEN": "LENGTH",
+               "CHAR_LENGTH": "LENGTH", "CHARACTER_LENGTH": "LENGTH"},
+    "duckdb": {"NVL": "COALESCE", "ISNULL": "IFNULL", "LEN": "LENGTH"},
+}
+_CURRENT_TIMESTAMP = frozenset(("GETDATE", "SYSDATETIME", "SYSDATE", "NOW", "GETUTCDATE"))
+# SQLite strftime format of the date part functions
+_DATE_PARTS = {"YEAR": "%Y", "MONTH": "%m", "DAY": "%d"}
+_NO_SPACE_BEFORE = frozenset((",", ")", ".", "]", "::"))
+_NO_SPACE_AFTER = frozenset(("(", ".", "[", "::"))
+
+
+def quote(name):
+    """
+    Name quoted for the local engines
+        :rtype: str
+    """
+    return '"' + name.replace('"', '""') + '"'
+
+
+def declared_values(sql, dialect="ansi"):
+    """
+    Values given to the variables of a snippet by its DECLARE and SET statements
+        :param sql: SQL snippet
+        :type sql: str
+        :param dialect: Value of ``DIALECTS``
+        :type dialect: str
+        :return: Values by lower case variable name, e.g. {"@emp_id": 9}
+        :rtype: dict
+    """
+    values = {}
+    try:
+        statements = split_statements(tokenize(sql, dialect), dialect)
+    except ValueError:
+        return values
+    for tokens in statements:
+        if tokens[0].kind != "name" or tokens[0].value.upper() not in ("DECLARE", "SET"):
+            continue
+        variable, sign = None, 1
+        for token in tokens[1:]:
+            if token.kind == "variable":
+                variable, sign = token.value.lower(), 1
+            elif variable is None:
+                continue
+            elif token.kind == "op" and token.value == "-":
+                sign = -sign
+            elif token.kind == "number":
+                number = float(token.value)
+                values[variable] = sign * (int(number) if number.is_integer() and "." not in token.value else number)
+                variable = None
+            elif token.kind == "string":
+                values[variable] = token.value
+                variable = None
+    return values
+
+
+class _Printer:
+    """Text of the nodes of a query for an engine, with the values of its parameters in order"""
+    def __init__(self, engine, parameters):
+        self.engine = engine
+        self.parameters = parameters
+        self.values = []
+
+    def rule(self, node):
+        """Method rewriting a node for the engine, None when its tokens are kept"""
+        kind = node.kind
+        if kind == "query" and (node.limit is not None or node.offset is not None or (
+                node.body.kind == "select" and node.body.top is not None)):
+            return self.query
+        if kind in ("table", "parameter"):
+            return getattr(self, kind)
+        if kind == "function" and node.window is None and not node.distinct and not node.order:
+            if node.name in _CURRENT_TIMESTAMP or (node.name == "ISNULL" and len(node.arguments) == 2):
+                return self.function
+            if node.name in _RENAMED[self.engine] and node.name != "ISNULL":
+                return self.function
+            if self.engine == "sqlite" and (node.name == "CONCAT" or (
+                    node.name in _DATE_PARTS and len(node.arguments) == 1)):
+                return self.function
+        if self.engine == "sqlite":
+            if kind == "cast" and node.function is None:
+                return self.cast
+            if kind == "literal" and len(node.tokens) == 2:
+                # DATE '2024-01-01'
+                return lambda node: node.tokens[1].text()
+            if kind == "like" and node.operator == "ILIKE":
+                return self.like
+        return None
+
+    def text(self, node):
+        rule = self.rule(node)
+        return rule(node) if rule is not None else self.render(node)
+
+    def targets(self, node):
+        """Outermost descendants of a node that are rewritten, by their first token"""
+        targets = {}
+        for child in node.children():
+            if not child.tokens:
+                continue
+            if self.rule(child) is not None:
+                targets.setdefault(id(child.tokens[0]), child)
+            else:
+                targets.update(self.targets(child))
+        return targets
+
+    def render(self, node, stop=None, skip=()):
+        """
+        Tokens of a node with its rewritten descendants
+            :param stop: Index of the first token left out
+            :param skip: Ids of the tokens left out
+        """
+        targets = self.targets(node)
+        tokens = node.tokens if stop is None else node.tokens[:stop]
+        parts = []
+        i = 0
+        while i < len(tokens):
+            token = tokens[i]
+            if id(token) in skip:
+                i += 1
+                continue
+            target = targets.get(id(token))
+            if target is not None:
+                parts.append((self.text(target), "rewritten"))
+                i += len(target.tokens)
+            else:
+                parts.append((token.text(), token.kind))
+                i += 1
+        return _join(parts)
+
+    # Rewrites
+    ####################################################
+    def query(self, node):
+        # TOP n, LIMIT offset, n and OFFSET ... FETCH become LIMIT ... OFFSET
+        last = node.order[-1].tokens[-1] if node.order else node.body.tokens[-1]
+        stop = next(i for i, token in enumerate(node.tokens) if token is last) + 1
+        skip = set()
+        limit = node.limit
+        if node.body.kind == "select" and node.body.top is not None:
+            select = node.body
+            skip = {id(token) for token in select.top.tokens}
+            skip.add(id(select.tokens[select.tokens.index(select.top.tokens[0]) - 1]))
+            limit = select.top
+        text = self.render(node, stop, skip)
+        if limit is not None:
+            text += " LIMIT " + self.text(limit)
+        elif self.engine == "sqlite":
+            text += " LIMIT -1"
+        if node.offset is not None:
+            text += " OFFSET " + self.text(node.offset)
+        return text
+
+    def table(self, node):
+        if len(node.parts) > 1:
+            text = quote(".".join(node.parts))
+            alias = node.alias or node.parts[-1]
+        else:
+            text = node.tokens[0].text()
+            alias = node.alias
+        if alias:
+            text += " AS " + quote(alias)
+        if node.columns and self.engine == "duckdb":
+            text += "(" + ", ".join(quote(column) for column in node.columns) + ")"
+        return text
+
+    def parameter(self, node):
+        self.values.append(self.parameters.get(node.name.lower(), DEFAULT_PARAMETER))
+        return "?"
+
+    def function(self, node):
+        name = node.name
+        if name in _CURRENT_TIMESTAMP:
+            return "CURRENT_TIMESTAMP"
+        arguments = [self.text(argument) for argument in node.arguments]
+        if self.engine == "sqlite" and name in _DATE_PARTS:
+            return f"CAST(strftime('{_DATE_PARTS[name]}', {arguments[0]}) AS INTEGER)"
+        if self.engine == "sqlite" and name == "CONCAT":
+            return "(" + " || ".join(arguments) + ")"
+        return f"{_RENAMED[self.engine][name]}({', '.join(arguments)})"
+
+    def cast(self, node):
+        return f"CAST({self.text(node.expression)} AS {node.data_type})"
+
+    def like(self, node):
+        negated = "NOT " if node.negated else ""
+        return f"{self.text(node.expression)} {negated}LIKE {self.text(node.pattern)}"
+
+
+def _join(parts):
+    text = []
+    previous = None
+    for part, kind in parts:
+        if previous is not None and part not in _NO_SPACE_BEFORE and previous[0] not in _NO_SPACE_AFTER \
+                and not (part == "(" and previous[1] in ("name", "quoted")):
+            text.append(" ")
+        text.append(part)
+        previous = (part, kind)
+    return "".join(text)
+
+
+def translate_query(query, engine, parameters=None):
+    """
+    SQL of a parsed query for a local engine
+        :param query: "query" node, see ``parse_sql``
+        :type query: Node
+        :param engine: "sqlite" or "duckdb"
+        :type engine: str
+        :param parameters: Values of the variables by lower case name, see
+            ``declared_values``
+        :type parameters: dict
+        :return: SQL and the values of its parameters
+        :rtype: tuple
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine {engine}, use one of {ENGINES}")
+    printer = _Printer(engine, parameters or {})
+    return printer.text(query), printer.values
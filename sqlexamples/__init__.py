@@ -16,7 +16,7 @@ GROUP BY
     WHEN salary > 100000 THEN 'high'
 END
 """
-    self.sql_postgres = """- Replace this text with your code:
+    self.sql_postgres = """-- Replace this text with your code:
 SELECT
   product,
   grp_name,
@@ -0,0 +1,11 @@
+"""Offline settings of the test session, read by the modules when they are imported"""
+import os
+import tempfile
+
+_directory = tempfile.mkdtemp(prefix="data-insight-tests-")
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+os.environ.setdefault("DATA_INSIGHT_LLM_BACKEND", "fake")
+os.environ.setdefault("DATA_INSIGHT_FAKE_LATENCY", "fixed:0.5")
+os.environ.setdefault("DATA_INSIGHT_CACHE_DIR", os.path.join(_directory, "analysis"))
+os.environ.setdefault("DATA_INSIGHT_LLM_CACHE", os.path.join(_directory, "llm_responses.sqlite3"))
+os.environ.setdefault("DATA_INSIGHT_LLM_LOCKS", os.path.join(_directory, "llm_locks"))
@@ -0,0 +1,17 @@
+from dataprep import analysis_key, section_key
+
+
+def test_analysis_key_options():
+    data = b"a,b\n1,2\n"
+    assert analysis_key(data, "CSV") == analysis_key(data, "CSV", True, True)
+    assert analysis_key(data, "CSV", compact=False) != analysis_key(data, "CSV")
+    assert analysis_key(data, "CSV", header=False) != analysis_key(data, "CSV")
+    # The other formats are profiled the same way with or without compaction
+    assert analysis_key(data, "JSON Lines", compact=False) == analysis_key(data, "JSON Lines")
+    assert analysis_key(data, "Apache Parquet", compact=False) == analysis_key(data, "Apache Parquet")
+
+
+def test_section_key():
+    assert section_key("analysis") == "analysis"
+    assert section_key("analysis", "city") == "analysis"
+    assert section_key("visualization", "city") == "visualization:city"
@@ -0,0 +1,16 @@
+import pandas as pd
+
+from dataprep import compact_frame
+
+
+def test_compact_leaves_nested_columns():
+    df = pd.DataFrame({
+        "a": [1, 2, 3, 4],
+        "tags": [["x"], ["x", "y"], None, ["x"]],
+        "kind": ["a", "b", "a", "a"],
+    })
+    compacted = compact_frame(df)
+    assert compacted["a"].dtype == "int8"
+    assert compacted["tags"].dtype == object
+    assert compacted["tags"].tolist() == df["tags"].tolist()
+    assert isinstance(compacted["kind"].dtype, pd.CategoricalDtype)
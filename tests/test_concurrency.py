@@ -0,0 +1,32 @@
+import os
+import time
+
+from streamlit.testing.v1 import AppTest
+
+from dataprep import get_tokenizer
+from llmclient import get_fake_backend
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LATENCY = get_fake_backend().sample_latency()
+
+
+def test_file_analysis_sections_run_concurrently(monkeypatch):
+    monkeypatch.chdir(ROOT)
+    # Loaded once per process, keep it out of the measured run
+    get_tokenizer()
+    backend = get_fake_backend()
+    backend.reset()
+
+    at = AppTest.from_file("pages/01_Analysing_data_files_with_LLM.py", default_timeout=60)
+    at.run()
+    at.toggle[0].set_value(True)
+    start = time.perf_counter()
+    at.run()
+    elapsed = time.perf_counter() - start
+
+    assert not at.exception, at.exception
+    # The security section is answered without the LLM when the file has no personal data
+    sections = backend.calls["create"]
+    assert sections >= 2
+    # Sequential sections would take a latency each
+    assert elapsed < 1.5 * LATENCY, f"{elapsed:.2f}s for {sections} sections of {LATENCY:.2f}s"
@@ -0,0 +1,71 @@
+import os
+from io import BytesIO, StringIO
+
+import pandas as pd
+import pytest
+
+from dataprep import ENGINES, read_data, read_data_file
+
+DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+SAMPLES = {
+    "CSV": "country_codes.csv",
+    "Apache Parquet": "house_price.parquet",
+    "JSON": "sample_data.json",
+    "JSON Lines": "sample_data.jsonl",
+}
+
+
+def legacy_read(bytes_data, option_format, header=True):
+    """Parsing path used by the page before the ingestion layer"""
+    if option_format == "Apache Parquet":
+        return pd.read_parquet(os.path.join(DATA, SAMPLES[option_format]))
+    text = StringIO(str(bytes_data, "utf-8"))
+    if option_format == "CSV":
+        return pd.read_csv(text) if header else pd.read_csv(text, header=None)
+    return pd.read_json(text, lines=option_format == "JSON Lines")
+
+
+def assert_same_values(parsed, expected):
+    # Arrow-backed and NumPy dtypes hold the same values
+    pd.testing.assert_frame_equal(
+        parsed.convert_dtypes(dtype_backend="numpy_nullable"),
+        expected.convert_dtypes(dtype_backend="numpy_nullable"),
+        check_dtype=False, check_column_type=False,
+    )
+
+
+@pytest.mark.parametrize("engine", list(ENGINES))
+@pytest.mark.parametrize("option_format", list(SAMPLES))
+def test_sample_parity(option_format, engine):
+    path = os.path.join(DATA, SAMPLES[option_format])
+    with open(path, "rb") as f:
+        bytes_data = f.read()
+    assert_same_values(read_data_file(path, option_format, engine=engine), legacy_read(bytes_data, option_format))
+
+
+@pytest.mark.parametrize("engine", list(ENGINES))
+def test_csv_without_header_parity(engine):
+    with open(os.path.join(DATA, SAMPLES["CSV"]), "rb") as f:
+        bytes_data = f.read()
+    parsed = read_data(bytes_data, "CSV", header=False, engine=engine)
+    assert_same_values(parsed, legacy_read(bytes_data, "CSV", header=False))
+
+
+@pytest.mark.parametrize("engine", list(ENGINES))
+@pytest.mark.parametrize("bytes_data", [
+    b"a,a,b\n1,2,3\n4,5,6\n",
+    b"a,b\n1,2\n3\n",
+    b"a,b,c\n1,2\n3,4,5\n",
+], ids=["duplicate_headers", "ragged_rows", "short_first_row"])
+def test_irregular_csv_parity(bytes_data, engine):
+    parsed = read_data(bytes_data, "CSV", engine=engine)
+    assert_same_values(parsed, legacy_read(bytes_data, "CSV"))
+
+
+@pytest.mark.parametrize("engine", list(ENGINES))
+def test_latin1_csv(engine):
+    bytes_data = "name,city\nJosé,Logroño\nAnaïs,Orléans\n".encode("latin-1")
+    parsed = read_data(bytes_data, "CSV", engine=engine)
+    assert list(parsed.columns) == ["name", "city"]
+    assert parsed["city"].tolist() == ["Logroño", "Orléans"]
+    assert_same_values(parsed, pd.read_csv(BytesIO(bytes_data), encoding="latin-1"))
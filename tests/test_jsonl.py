@@ -0,0 +1,34 @@
+import json
+from io import BytesIO
+
+from dataprep import read_json_lines
+
+EVENTS = [
+    {"id": 1, "code": 10, "tags": ["a", "b"], "user": {"k": 1}},
+    {"id": 2, "code": 11, "tags": ["a", "b"], "user": {"k": 2}},
+    {"id": 3, "code": "X1", "tags": ["c"], "user": {"k": 1}},
+    {"id": 4, "code": "X1", "tags": [], "user": None},
+]
+
+
+def test_read_json_lines_conflicting_and_nested_fields():
+    payload = "".join(json.dumps(event) + "\n" for event in EVENTS).encode("utf-8")
+    # One line per block, the code field is an integer then a string
+    df, data_profile = read_json_lines(BytesIO(payload), chunk_bytes=16)
+    assert len(df) == len(EVENTS)
+    assert df["code"].astype(str).tolist() == ["10", "11", "X1", "X1"]
+    assert df["tags"].map(list).tolist() == [event["tags"] for event in EVENTS]
+
+    profile = {column["column"]: column for column in data_profile.profile()}
+    assert "mean" not in profile["code"] and "min" not in profile["code"]
+    assert profile["code"]["top"][0] == ("X1", 2)
+    assert profile["tags"]["top"][0] == ('["a", "b"]', 2)
+    assert profile["id"]["mean"] == 2.5
+
+
+def test_read_json_lines_conflict_inside_a_block():
+    payload = b'{"a": 1, "b": [1]}\n{"a": "s", "b": {"k": 1}}\n{"a": 2.5, "b": null}\n'
+    df, data_profile = read_json_lines(BytesIO(payload))
+    assert df["a"].astype(str).tolist() == ["1", "s", "2.5"]
+    assert df["b"].astype(object).where(df["b"].notna(), None).tolist() == ["[1]", '{"k": 1}', None]
+    assert data_profile.n_rows == 3
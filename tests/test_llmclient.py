@@ -0,0 +1,146 @@
+import multiprocessing
+import threading
+import time
+import uuid
+
+from llmclient import (BATCH, INTERACTIVE, ResponseCache, Scheduler, cancel_prediction, generate_llm_data,
+                       get_fake_backend, prediction_stats, wait_prediction)
+
+
+class Prediction:
+    """Prediction running for ``latency`` seconds, forever when None"""
+    def __init__(self, latency=None):
+        self.latency = latency
+        self.created = time.monotonic()
+        self.status = "starting"
+        self.canceled = False
+
+    def reload(self):
+        if self.canceled:
+            self.status = "canceled"
+        elif self.latency is not None and time.monotonic() - self.created >= self.latency:
+            self.status = "succeeded"
+        else:
+            self.status = "processing"
+
+    def cancel(self):
+        self.canceled = True
+
+
+def test_response_cache_hits_and_misses(tmp_path):
+    cache = ResponseCache(str(tmp_path / "responses.sqlite3"), max_bytes=10)
+    assert cache.get("a") is None
+    cache.set("a", "12345", "model")
+    assert cache.get("a") == "12345"
+    # Not counted, e.g. a check after waiting for another process
+    assert cache.get("a", count=False) == "12345"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # Least recently used first once the size limit is exceeded
+    cache.set("b", "12345", "model")
+    cache.get("a")
+    cache.set("c", "12345", "model")
+    assert cache.get("b", count=False) is None
+    assert cache.get("a", count=False) == "12345"
+
+    cache.set("d", "1", "model", ttl=-1)
+    assert cache.get("d") is None
+    cache.invalidate("a")
+    assert cache.get("a") is None
+    assert (cache.hits, cache.misses) == (2, 3)
+
+
+def call_in_thread(input, results):
+    # The response cache connections of the parent can't be used after the fork
+    def call():
+        status, output = generate_llm_data(input, "token", session="process")
+        results.put((status, "".join(output or []), get_fake_backend().calls["create"]))
+
+    caller = threading.Thread(target=call)
+    caller.start()
+    caller.join()
+
+
+def test_processes_coalesce_with_lock_files():
+    get_fake_backend().reset()
+    input = {"prompt": f"Explain this SQL snippet {uuid.uuid4()}"}
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    processes = [context.Process(target=call_in_thread, args=(input, results)) for _ in range(3)]
+    for process in processes:
+        process.start()
+    outcomes = [results.get(timeout=30) for _ in processes]
+    for process in processes:
+        process.join()
+
+    assert [(status, text) for status, text, _ in outcomes] == [("succeeded", get_fake_backend().default_output)] * 3
+    # The first process holding the lock file creates the prediction, the others read the cache
+    assert sum(creates for _, _, creates in outcomes) == 1
+
+
+def test_scheduler_fair_share():
+    scheduler = Scheduler(max_concurrent=1, rate=1000, burst=1000)
+    order = []
+    lock = threading.Lock()
+
+    def request(session, priority=INTERACTIVE):
+        with scheduler.slot("token", session, priority):
+            with lock:
+                order.append(session)
+
+    callers = []
+    with scheduler.slot("token", "first"):
+        # A batch job, then a session queueing three requests before another queues one
+        for session, priority in [("batch", BATCH), ("a", INTERACTIVE), ("a", INTERACTIVE), ("a", INTERACTIVE),
+                                  ("b", INTERACTIVE)]:
+            caller = threading.Thread(target=request, args=(session, priority))
+            caller.start()
+            callers.append(caller)
+            while scheduler.queue_status("token")["queued"] < len(callers):
+                time.sleep(0.01)
+    for caller in callers:
+        caller.join()
+
+    assert order == ["a", "b", "a", "a", "batch"]
+    stats = scheduler.stats()
+    assert (stats["running"], stats["queued"]) == (0, 0)
+
+
+def test_scheduler_abandoned_request_leaves_queue():
+    scheduler = Scheduler(max_concurrent=1)
+    with scheduler.slot("token", "first"):
+        with scheduler.slot("token", "second", abandoned=lambda: True) as granted:
+            assert granted is False
+        assert scheduler.queue_status("token")["queued"] == 0
+
+
+def test_polling_returns_when_done():
+    prediction = Prediction(latency=0.3)
+    assert wait_prediction(prediction, deadline=5) == "succeeded"
+    assert not prediction.canceled
+
+
+def test_polling_cancels_at_deadline():
+    stats = prediction_stats()
+    prediction = Prediction()
+    start = time.monotonic()
+    assert wait_prediction(prediction, deadline=0.6) == "canceled"
+    assert prediction.canceled
+    assert time.monotonic() - start < 1.5
+    assert prediction_stats()["canceled_deadline"] == stats["canceled_deadline"] + 1
+
+
+def test_polling_cancels_abandoned_prediction():
+    stats = prediction_stats()
+    prediction = Prediction()
+    assert wait_prediction(prediction, deadline=60, abandoned=lambda: True) == "canceled"
+    assert prediction.canceled
+    assert prediction_stats()["canceled_abandoned"] == stats["canceled_abandoned"] + 1
+
+
+def test_cancel_prediction_is_best_effort():
+    class Ended(Prediction):
+        def cancel(self):
+            raise RuntimeError("Prediction already ended")
+
+    cancel_prediction(Ended(), "error")
@@ -0,0 +1,33 @@
+from io import BytesIO
+
+import pandas as pd
+
+from dataprep import ParquetReader, load_sections
+
+
+def parquet_bytes(df):
+    buffer = BytesIO()
+    df.to_parquet(buffer)
+    return buffer.getvalue()
+
+
+def test_columns_of_indexed_parquet():
+    df = pd.DataFrame({"idx": [3, 1, 2], "email": ["a@b.com", "c@d.org", None]}).set_index("idx")
+    reader = ParquetReader(parquet_bytes(df))
+    columns = {series.name: series for series in reader.iter_columns()}
+    assert list(columns) == ["email", "idx"]
+    assert columns["idx"].tolist() == [3, 1, 2]
+    assert [column["column"] for column in reader.profile()] == ["email", "idx"]
+
+
+def test_unnamed_index_is_skipped():
+    df = pd.DataFrame({"value": [1.5, 2.5]}, index=[10, 20])
+    reader = ParquetReader(parquet_bytes(df))
+    assert [series.name for series in reader.iter_columns()] == ["value"]
+
+
+def test_load_sections_of_indexed_parquet():
+    df = pd.DataFrame({"idx": range(20), "email": ["x@y.com"] * 20}).set_index("idx")
+    inputs, tokens, n_rows = load_sections(parquet_bytes(df), "Apache Parquet")
+    assert n_rows == 20
+    assert not isinstance(inputs["security"], str)
@@ -0,0 +1,30 @@
+import pandas as pd
+
+from dataprep import scan_frame
+from dataprep.pii import luhn_valid
+
+
+def detectors(findings):
+    return {(row.column, row.detector): row.hits for row in findings.itertuples()}
+
+
+def test_every_candidate_of_a_cell_is_validated():
+    df = pd.DataFrame({"note": [
+        "id 1234567890123, 4111111111111111",
+        "ref 1234567890123 paid with 4111 1111 1111 1111",
+        "call 555-123-4567 or mail x@y.com",
+    ]})
+    found = detectors(scan_frame(df))
+    assert found[("note", "card_number")] == 2
+    assert found[("note", "email")] == 1
+    assert found[("note", "phone")] == 1
+
+
+def test_non_ascii_digits_are_ignored():
+    df = pd.DataFrame({"note": ["１２３４ ５６７８ ９０１２ ３４５６", "٤١١١١١١١١١١١١١١١", "4111 1111 1111 1111"]})
+    found = detectors(scan_frame(df))
+    assert found == {("note", "card_number"): 1}
+
+
+def test_luhn_ignores_non_ascii_digits():
+    assert luhn_valid(pd.Series(["4111-1111-1111-1111", "4111 1111 1111 １１１１"])).tolist() == [True, False]
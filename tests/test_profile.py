@@ -0,0 +1,39 @@
+import json
+
+import pandas as pd
+
+from dataprep import StreamingProfile, read_data, profile_frame, format_profile
+
+NESTED_JSON = json.dumps([
+    {"a": 1, "tags": ["x", "y"], "o": {"k": 1}},
+    {"a": 2, "tags": ["x", "y"], "o": {"k": 2}},
+    {"a": 3, "tags": None, "o": {"k": 2}},
+]).encode("utf-8")
+
+
+def test_profile_nested_json():
+    for engine in ("pandas", "pyarrow"):
+        df = read_data(NESTED_JSON, "JSON", engine=engine)
+        profile = {column["column"]: column for column in profile_frame(df)}
+        assert profile["tags"]["distinct"] == 1
+        assert profile["tags"]["top"] == [('["x", "y"]', 2)]
+        assert profile["o"]["top"][0] == ('{"k": 2}', 2)
+        assert "tags" in format_profile(list(profile.values()), len(df))
+
+
+def test_streaming_profile_nested_json():
+    df = read_data(NESTED_JSON, "JSON", engine="pandas")
+    streaming_profile = StreamingProfile()
+    streaming_profile.update(df.iloc[:2])
+    streaming_profile.update(df.iloc[2:])
+    profile = {column["column"]: column for column in streaming_profile.profile()}
+    assert profile["tags"]["top"] == [('["x", "y"]', 2)]
+    assert profile["o"]["top"][0] == ('{"k": 2}', 2)
+    assert profile["a"]["mean"] == 2.0
+
+
+def test_profile_scalar_columns_unchanged():
+    df = pd.DataFrame({"name": ["a", "b", "a"], "value": [1, 2, 3]})
+    profile = {column["column"]: column for column in profile_frame(df)}
+    assert profile["name"]["top"][0] == ("a", 2)
+    assert profile["value"]["mean"] == 2.0
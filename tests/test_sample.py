@@ -0,0 +1,23 @@
+import pandas as pd
+
+from dataprep import detect_strata_column, sample_rows, section_key
+
+
+def test_strata_skips_nested_columns():
+    df = pd.DataFrame({
+        "tags": [["x"], ["y"], ["x"], ["z"]],
+        "kind": ["a", "b", "a", "a"],
+    })
+    assert detect_strata_column(df) == "kind"
+
+
+def test_visualization_key_follows_strata():
+    assert section_key("visualization") == "visualization"
+    assert section_key("visualization", "kind") != section_key("visualization", "None (uniform sample)")
+    assert section_key("analysis", "kind") == "analysis"
+
+
+def test_sample_stratified_on_nested_column():
+    df = pd.DataFrame({"tags": [["x"], ["y"], ["x"], {"k": 1}] * 10, "value": range(40)})
+    sample = sample_rows(df, k=3, strata="tags")
+    assert sorted(map(str, sample["tags"].tolist())) == ["['x']", "['y']", "{'k': 1}"]
@@ -0,0 +1,34 @@
+import threading
+import uuid
+
+from llmclient import LLMStream, generate_llm_data, get_fake_backend, flight_stats
+
+CALLERS = 10
+
+
+def test_identical_requests_create_one_prediction():
+    backend = get_fake_backend()
+    backend.reset()
+    # Not in the response cache of the session
+    input = {"prompt": f"Explain this SQL snippet {uuid.uuid4()}", "temperature": 0.2}
+    results = [None] * CALLERS
+    coalesced = flight_stats()["coalesced"]
+
+    def call(i):
+        if i % 2:
+            llm_stream = LLMStream(input, "token")
+            text = "".join(llm_stream)
+            results[i] = llm_stream.status, text
+        else:
+            status, output = generate_llm_data(input, "token")
+            results[i] = status, "".join(output)
+
+    callers = [threading.Thread(target=call, args=(i,)) for i in range(CALLERS)]
+    for caller in callers:
+        caller.start()
+    for caller in callers:
+        caller.join()
+
+    assert backend.calls["create"] == 1
+    assert results == [("succeeded", backend.default_output)] * CALLERS
+    assert flight_stats()["coalesced"] - coalesced == CALLERS - 1
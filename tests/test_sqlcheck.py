@@ -0,0 +1,116 @@
+import pytest
+
+from sqlcheck import DIALECTS, RULES, SQLSyntaxError, check_sql, format_sql_findings, parse_sql, split_statements, tokenize
+
+# Code flagged by every rule, and code it must leave alone
+RULE_CASES = {
+    "select_star": (
+        "SELECT * FROM orders",
+        "SELECT id, total FROM orders",
+    ),
+    "non_sargable": (
+        "SELECT id FROM orders WHERE YEAR(created_at) = 2024",
+        "SELECT id FROM orders WHERE created_at >= '2024-01-01' AND created_at < '2025-01-01'",
+    ),
+    "correlated_subquery": (
+        "SELECT o.id, (SELECT MAX(p.amount) FROM payments p WHERE p.order_id = o.id) AS paid FROM orders o",
+        "SELECT o.id, (SELECT MAX(p.amount) FROM payments p) AS paid FROM orders o",
+    ),
+    "repeated_expression": (
+        "SELECT UPPER(TRIM(c.first_name)) || ' ' || c.last_name AS name, COUNT(*) FROM customers c "
+        "GROUP BY UPPER(TRIM(c.first_name)) || ' ' || c.last_name",
+        "SELECT c.first_name, COUNT(*) FROM customers c GROUP BY c.first_name",
+    ),
+    "count_distinct_derived": (
+        "SELECT COUNT(DISTINCT t.customer_id) FROM (SELECT customer_id FROM orders WHERE total > 10) t",
+        "SELECT COUNT(DISTINCT customer_id) FROM orders",
+    ),
+    "missing_join_predicate": (
+        "SELECT a.id, b.id FROM a, b WHERE a.x = 1",
+        "SELECT a.id, b.id FROM a JOIN b ON a.id = b.a_id",
+    ),
+    "unbounded_window": (
+        "SELECT id, SUM(total) OVER (ORDER BY created_at ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING) "
+        "FROM orders",
+        "SELECT id, SUM(total) OVER (PARTITION BY customer_id ORDER BY created_at "
+        "ROWS BETWEEN 2 PRECEDING AND CURRENT ROW) FROM orders",
+    ),
+}
+# Identifiers and comments of a single dialect, a syntax error in the others
+DIALECT_SYNTAX = {
+    "SELECT `order id` FROM t": ("mysql", "bigquery"),
+    "SELECT [order id] FROM t": ("tsql",),
+    "SELECT id FROM t # comment": ("mysql",),
+}
+
+
+def rules(sql, dialect):
+    return [finding["rule"] for finding in check_sql(sql, dialect)]
+
+
+def test_tokenize_quotes_per_dialect():
+    tokens = tokenize("SELECT [order id] FROM t -- comment\nWHERE a = N'é' /* x */ AND b = @p", "tsql")
+    assert [(token.kind, token.value) for token in tokens] == [
+        ("keyword", "SELECT"), ("quoted", "order id"), ("keyword", "FROM"), ("name", "t"), ("keyword", "WHERE"),
+        ("name", "a"), ("op", "="), ("string", "é"), ("keyword", "AND"), ("name", "b"), ("op", "="),
+        ("variable", "@p"),
+    ]
+    assert tokens[4].line == 2
+
+    tokens = tokenize("SELECT `order id`, \"text\" FROM t # comment", "mysql")
+    assert [(token.kind, token.value) for token in tokens][1:4] == [
+        ("quoted", "order id"), ("op", ","), ("string", "text")]
+    tokens = tokenize('SELECT "order id", x::int FROM t', "postgres")
+    assert [(token.kind, token.value) for token in tokens][1:6] == [
+        ("quoted", "order id"), ("op", ","), ("name", "x"), ("op", "::"), ("name", "int")]
+    assert tokenize("SELECT 'it''s'", "ansi")[1].value == "it's"
+
+
+@pytest.mark.parametrize("sql", ["SELECT 'abc", "SELECT a /* comment", "SELECT a ~~ `b`"])
+def test_tokenize_errors(sql):
+    with pytest.raises(SQLSyntaxError):
+        tokenize(sql, "postgres")
+
+
+def test_split_statements():
+    assert len(split_statements(tokenize("SELECT 1; SELECT 2;;", "ansi"))) == 2
+    assert len(split_statements(tokenize("SELECT 1;SELECT 2\nGO\nSELECT 3", "tsql"), "tsql")) == 3
+
+
+@pytest.mark.parametrize("dialect", DIALECTS.values())
+def test_parse_statements(dialect):
+    parsed = parse_sql("WITH t AS (SELECT id, total FROM orders) SELECT id FROM t WHERE total > 1;\n"
+                       "UPDATE orders SET total = 0;\n"
+                       "SELECT a.id FROM a UNION ALL SELECT b.id FROM b ORDER BY 1", dialect)
+    assert parsed.errors == []
+    assert parsed.skipped == 1
+    assert [query.line for query in parsed.queries] == [1, 3]
+    assert parsed.queries[1].body.kind == "setop"
+
+
+@pytest.mark.parametrize("sql, dialects", DIALECT_SYNTAX.items())
+def test_parse_dialect_syntax(sql, dialects):
+    for dialect in DIALECTS.values():
+        parsed = parse_sql(sql, dialect)
+        if dialect in dialects:
+            assert parsed.errors == [] and len(parsed.queries) == 1, dialect
+        else:
+            assert len(parsed.errors) == 1 and parsed.queries == [], dialect
+
+
+@pytest.mark.parametrize("dialect", DIALECTS.values())
+@pytest.mark.parametrize("rule", RULE_CASES)
+def test_rule(rule, dialect):
+    flagged, clean = RULE_CASES[rule]
+    assert rule in rules(flagged, dialect)
+    assert rules(clean, dialect) == []
+
+
+@pytest.mark.parametrize("dialect", DIALECTS.values())
+def test_syntax_error_finding(dialect):
+    findings = check_sql("SELECT * FROM orders;\nSELECT FROM WHERE (", dialect)
+    assert [(finding["rule"], finding["line"]) for finding in findings] == [("select_star", 1), ("syntax_error", 2)]
+    assert rules("SELECT 'unterminated", dialect) == ["syntax_error"]
+    # Statements that couldn't be parsed are left out of the prompt
+    assert format_sql_findings(findings).startswith(f"- Line 1, {RULES['select_star']} (")
+    assert "\n" not in format_sql_findings(findings)
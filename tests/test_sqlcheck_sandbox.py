@@ -0,0 +1,93 @@
+import pytest
+
+from sqlcheck import (benchmark_queries, compare_results, declared_values, extract_sql, generate_tables,
+                      infer_schema, parse_sql, translate_query)
+
+JOIN = ("SELECT o.id, c.name FROM orders o JOIN customers c ON c.id = o.customer_id "
+        "WHERE o.total > 100.5 AND o.created_at >= '2024-01-01'")
+
+
+def test_infer_schema():
+    schema = infer_schema(parse_sql(JOIN, "ansi").queries)
+    columns = {(column["table"], column["column"]): (column["type"], column["key"]) for column in schema.describe()}
+    assert columns == {
+        ("orders", "id"): ("integer", False),
+        ("orders", "total"): ("real", False),
+        ("orders", "created_at"): ("date", False),
+        ("orders", "customer_id"): ("integer", True),
+        ("customers", "name"): ("text", False),
+        ("customers", "id"): ("integer", True),
+    }
+    # Join keys and columns compared to a literal
+    assert set(schema.indexed_columns()) >= {("orders", "customer_id"), ("customers", "id"), ("orders", "total")}
+    # A table that is only counted still gets a column
+    assert infer_schema(parse_sql("SELECT COUNT(*) FROM events", "ansi").queries).describe()[0]["table"] == "events"
+
+
+def test_generate_tables():
+    schema = infer_schema(parse_sql(JOIN, "ansi").queries)
+    tables = generate_tables(schema, 50, seed=1)
+    columns, values = tables["orders"]
+    assert columns == [("id", "integer"), ("total", "real"), ("created_at", "date"), ("customer_id", "integer")]
+    assert [len(column) for column in values] == [50] * 4
+    # The same seed gives the same rows
+    assert list(generate_tables(schema, 50, seed=1)["orders"][1][0]) == list(values[0])
+
+
+def test_translate_query():
+    query = parse_sql("SELECT TOP 5 o.id, YEAR(o.created_at) FROM orders o WHERE o.customer_id = @id "
+                      "AND o.created_at > GETDATE() AND LEN(o.note) > 2 ORDER BY o.id", "tsql").queries[0]
+    sql, values = translate_query(query, "sqlite", {"@id": 9})
+    assert sql == ("SELECT o.id, CAST(strftime('%Y', o.created_at) AS INTEGER) FROM orders AS \"o\" "
+                   "WHERE o.customer_id = ? AND o.created_at > CURRENT_TIMESTAMP AND LENGTH(o.note) > 2 "
+                   "ORDER BY o.id LIMIT 5")
+    assert values == [9]
+    sql, values = translate_query(query, "duckdb")
+    assert "YEAR(o.created_at)" in sql and sql.endswith("LIMIT 5")
+    # Variables that aren't declared get a default value
+    assert values == [1]
+    with pytest.raises(ValueError):
+        translate_query(query, "oracle")
+
+
+def test_declared_values():
+    assert declared_values("DECLARE @id INT = -9; SET @name = 'x'; SELECT 1", "tsql") == {"@id": -9, "@name": "x"}
+    assert declared_values("SELECT 'unterminated", "tsql") == {}
+
+
+def test_extract_sql_and_compare_results():
+    answer = "Use this:\n```sql\nSELECT id FROM t\n```\nor\n```\nSELECT id FROM u\n```\n```python\nselect()\n```"
+    assert extract_sql(answer) == "SELECT id FROM u"
+    assert extract_sql("No code") is None
+    assert compare_results([(1, 2.0), (2, None)], [(2, None), (1, 2.0000000001)]) == (True, [], [])
+    assert compare_results([(1,), (1,)], [(1,), (2,)]) == (False, [(1.0,)], [(2.0,)])
+
+
+def test_benchmark_equivalent_queries():
+    report = benchmark_queries(
+        "SELECT id, total FROM orders WHERE YEAR(created_at) = 2024",
+        "SELECT id, total FROM orders WHERE created_at >= '2024-01-01' AND created_at < '2025-01-01'",
+        "tsql", rows=1000, repeat=1)
+    assert report["engine"] == "sqlite"
+    assert report["original"]["error"] is None and report["proposed"]["error"] is None
+    assert report["original"]["rows"] == report["proposed"]["rows"] > 0
+    assert report["equivalent"] is True
+    assert len(report["original"]["seconds"]) == 1 and report["original"]["plan"]
+
+
+def test_benchmark_not_in_is_not_not_exists():
+    # NOT IN finds nothing once the subquery returns a NULL, NOT EXISTS ignores it
+    report = benchmark_queries(
+        "SELECT c.id FROM customers c WHERE c.id NOT IN (SELECT o.customer_id FROM orders o)",
+        "SELECT c.id FROM customers c WHERE NOT EXISTS (SELECT 1 FROM orders o WHERE o.customer_id = c.id)",
+        "postgres", rows=1000, repeat=1)
+    assert report["equivalent"] is False
+    assert report["original"]["rows"] == 0 and report["proposed"]["rows"] > 0
+    assert report["only_original"] == [] and report["only_proposed"]
+
+
+def test_benchmark_unparsed_code():
+    report = benchmark_queries("SELECT id FROM orders", "SELECT FROM (", "tsql", rows=10, repeat=1)
+    assert report["equivalent"] is None
+    assert report["proposed"]["error"].startswith("The code couldn't be parsed")
+    assert report["original"]["rows"] == 10
@@ -0,0 +1,59 @@
+import json
+import time
+
+import httpx
+
+import llmclient.client
+from llmclient.webhook import WEBHOOK_PATH, WebhookReceiver, sign, verify_signature
+
+SECRET = "whsec_c2VjcmV0LWtleQ=="
+PAYLOAD = {"id": "unknown", "status": "succeeded", "input": {"prompt": "Explain this SQL"}, "output": ["Forged"]}
+
+
+def signed_headers(body, secret=SECRET, timestamp=None):
+    timestamp = str(int(time.time()) if timestamp is None else timestamp)
+    return {"webhook-id": "msg_1", "webhook-timestamp": timestamp,
+            "webhook-signature": sign("msg_1", timestamp, body, secret)}
+
+
+def test_signature_accepted_and_rejected():
+    body = json.dumps(PAYLOAD).encode("utf-8")
+    assert verify_signature(signed_headers(body), body, SECRET)
+    assert not verify_signature(signed_headers(body, "whsec_b3RoZXI="), body, SECRET)
+    assert not verify_signature(signed_headers(body), body + b" ", SECRET)
+    assert not verify_signature(signed_headers(body, timestamp=time.time() - 3600), body, SECRET)
+    assert not verify_signature({}, body, SECRET)
+
+
+def post(receiver, body, headers=None):
+    return httpx.post(f"http://127.0.0.1:{receiver.port}{WEBHOOK_PATH}", content=body, headers=headers or {})
+
+
+def test_orphans_only_stored_from_signed_requests():
+    orphans = []
+    body = json.dumps(PAYLOAD).encode("utf-8")
+
+    unsigned = WebhookReceiver(port=0, secret=None, orphaned=orphans.append)
+    unsigned.start()
+    assert post(unsigned, body).status_code == 200
+    assert orphans == []
+
+    signed = WebhookReceiver(port=0, secret=SECRET, orphaned=orphans.append)
+    signed.start()
+    assert post(signed, body).status_code == 401
+    assert post(signed, body, signed_headers(body)).status_code == 200
+    assert orphans == [PAYLOAD]
+
+
+def test_webhooks_need_a_public_url_and_a_secret(monkeypatch):
+    monkeypatch.setattr(llmclient.client, "COMPLETION", "webhook")
+    monkeypatch.setattr(llmclient.client, "BACKEND", "replicate")
+    monkeypatch.setattr(llmclient.client, "WEBHOOK_URL", None)
+    monkeypatch.setattr(llmclient.client, "WEBHOOK_SECRET", SECRET)
+    assert not llmclient.client.use_webhooks()
+    monkeypatch.setattr(llmclient.client, "WEBHOOK_URL", "https://example.com/webhook")
+    assert llmclient.client.use_webhooks()
+    monkeypatch.setattr(llmclient.client, "WEBHOOK_SECRET", None)
+    assert not llmclient.client.use_webhooks()
+    monkeypatch.setattr(llmclient.client, "BACKEND", "fake")
+    assert llmclient.client.use_webhooks()